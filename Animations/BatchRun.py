@@ -0,0 +1,202 @@
+#Headless batch runner
+#Runs a scenario without any GUI and writes state snapshots to disk
+#Only numpy and Utils are imported here, never matplotlib / PyQt6 / pyqtgraph
+#
+#Examples:
+#   python BatchRun.py run cluster --bodies 2000 --duration 10 --snapshot-every 1 --output runs/cluster
+#   python BatchRun.py run two_body --duration 100 --record runs/two_body.traj
+#   python BatchRun.py run cluster --duration 1000 --checkpoint runs/cluster.ckpt --checkpoint-every 10
+#   python BatchRun.py resume runs/cluster.ckpt
+#   python BatchRun.py sweep --grid m2=500:1500:11 --grid v1x=0,3.5,7 --duration 20 --table sweep.csv
+#   python BatchRun.py sweep --random v1x=-15:15 --random v1y=-15:15 --samples 500 --duration 20
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from Utils import Checkpoint, Integrators, Scenarios, Sweep
+from Utils.Recorder import TrajectoryRecorder
+
+
+#Write one snapshot of the full state
+def WriteSnapshot(directory, index, system):
+    path = os.path.join(directory, f"snapshot_{index:06d}.npz")
+    np.savez(path, time=system.sim_time, positions=system.positions, velocities=system.velocities,
+             masses=system.masses, G=system.G)
+    return path
+
+#Build the scenario selected on the command line
+def BuildSystem(args):
+    settings = {'backend': args.backend, 'theta': args.theta, 'integrator': args.integrator, 'softening': args.softening}
+    if args.scenario == 'cluster':
+        settings.update(bodies=args.bodies, dim=args.dim, seed=args.seed)
+    system, dt = Scenarios.build(args.scenario, **settings)
+    return system, (args.dt if args.dt is not None else dt)
+
+#Integrate for the requested duration, writing a snapshot every snapshot_every sim seconds
+#An optional TrajectoryRecorder also gets every recorder.every-th step
+#With a checkpoint path the full state is saved atomically every checkpoint_every sim seconds,
+#progress is the "run/..." part of a checkpoint to continue from
+def Run(system, dt, duration, snapshot_every, output, log=print, recorder=None, checkpoint=None, checkpoint_every=None, progress=None):
+    os.makedirs(output, exist_ok=True)
+
+    totalSteps = int(round(duration / dt))
+    snapshotSteps = max(1, int(round(snapshot_every / dt))) if snapshot_every else max(1, totalSteps)
+    checkpointSteps = max(1, int(round(checkpoint_every / dt))) if checkpoint and checkpoint_every else None
+
+    if progress is None:
+        E0 = system.total_energy()
+        WriteSnapshot(output, 0, system)
+        if recorder is not None:
+            recorder.record(system)
+        index, done = 1, 0
+    else:
+        E0, index, done = progress['E0'], progress['index'], progress['done']
+
+    start = time.perf_counter()
+    while done < totalSteps:
+        #Run to the next snapshot, checkpoint or the end, whichever comes first
+        steps = min(snapshotSteps - done % snapshotSteps, totalSteps - done)
+        if checkpointSteps:
+            steps = min(steps, checkpointSteps - done % checkpointSteps)
+        system.advance(dt, steps, recorder)
+        done += steps
+        if recorder is not None:
+            recorder.flush()
+
+        if done % snapshotSteps == 0 or done == totalSteps:
+            WriteSnapshot(output, index, system)
+            index += 1
+            drift = abs((system.total_energy() - E0) / E0) if E0 != 0 else 0.0
+            log(f"t = {system.sim_time:.6g} | steps {done}/{totalSteps} | |dE/E| = {drift:.3e} | {time.perf_counter() - start:.2f} s")
+
+        if checkpointSteps and done % checkpointSteps == 0:
+            Checkpoint.save_checkpoint(checkpoint, system, duration=duration, dt=dt, snapshot_every=snapshot_every or 0.0,
+                                       output=os.path.abspath(output), checkpoint_every=checkpoint_every, E0=E0, index=index, done=done)
+
+    return index
+
+#Parse "name=start:stop:num" (linspace) or "name=a,b,c" grid axes
+def ParseGrid(items):
+    values = {}
+    for item in items:
+        name, spec = item.split('=', 1)
+        if ':' in spec:
+            start, stop, num = spec.split(':')
+            values[name] = list(np.linspace(float(start), float(stop), int(num)))
+        else:
+            values[name] = [float(value) for value in spec.split(',')]
+    return values
+
+#Parse "name=low:high" sampling ranges
+def ParseRanges(items):
+    ranges = {}
+    for item in items:
+        name, spec = item.split('=', 1)
+        low, high = spec.split(':')
+        ranges[name] = (float(low), float(high))
+    return ranges
+
+def ParseArgs(argv):
+    parser = argparse.ArgumentParser(description="Run a gravity scenario without a GUI")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help="integrate a scenario and write snapshots")
+    run.add_argument('scenario', choices=sorted(Scenarios.SCENARIOS))
+    run.add_argument('--duration', type=float, required=True, help="simulated time to run")
+    run.add_argument('--dt', type=float, default=None, help="fixed step, defaults to the scenario's")
+    run.add_argument('--snapshot-every', type=float, default=None, help="sim time between snapshots (default: start and end only)")
+    run.add_argument('--output', default='snapshots', help="directory for snapshot_*.npz files")
+    run.add_argument('--backend', default='direct', choices=['direct', 'barneshut'])
+    run.add_argument('--theta', type=float, default=0.5, help="Barnes-Hut opening angle")
+    run.add_argument('--integrator', default='verlet', choices=list(Integrators.INTEGRATORS),
+                     help="time integrator, adaptive ones substep inside each dt")
+    run.add_argument('--softening', type=float, default=0.0, help="Plummer softening length")
+    run.add_argument('--bodies', type=int, default=1000, help="cluster: number of bodies")
+    run.add_argument('--dim', type=int, default=3, choices=[2, 3], help="cluster: dimensions")
+    run.add_argument('--seed', type=int, default=0, help="cluster: random seed")
+    run.add_argument('--record', default=None, metavar='PATH', help="also stream the trajectory to this file")
+    run.add_argument('--record-every', type=int, default=1, help="integration steps between recorded states")
+    run.add_argument('--checkpoint', default=None, metavar='PATH', help="file for periodic full state checkpoints")
+    run.add_argument('--checkpoint-every', type=float, default=None, help="sim time between checkpoints")
+    run.add_argument('--quiet', action='store_true')
+
+    resume = commands.add_parser('resume', help="continue a run from its checkpoint")
+    resume.add_argument('checkpoint', help="checkpoint written by run --checkpoint")
+    resume.add_argument('--duration', type=float, default=None, help="new total sim time, defaults to the original")
+    resume.add_argument('--quiet', action='store_true')
+
+    sweep = commands.add_parser('sweep', help="run many two body configurations across a process pool")
+    sweep.add_argument('--grid', action='append', default=[], metavar='NAME=START:STOP:NUM|A,B,C',
+                       help=f"grid axis over one of {', '.join(Sweep.TWO_BODY_DEFAULTS)}")
+    sweep.add_argument('--random', action='append', default=[], metavar='NAME=LOW:HIGH', help="uniform sampling range")
+    sweep.add_argument('--samples', type=int, default=100, help="number of random samples")
+    sweep.add_argument('--seed', type=int, default=0)
+    sweep.add_argument('--duration', type=float, required=True)
+    sweep.add_argument('--dt', type=float, default=0.001)
+    sweep.add_argument('--escape-radius', type=float, default=1000.0)
+    sweep.add_argument('--collision-radius', type=float, default=0.5)
+    sweep.add_argument('--workers', type=int, default=None, help="process count, defaults to the CPU count")
+    sweep.add_argument('--ensemble', action='store_true', help="integrate all runs as one vectorized ensemble instead of a process pool")
+    sweep.add_argument('--table', default='sweep.csv', help="output CSV")
+    sweep.add_argument('--quiet', action='store_true')
+
+    args = parser.parse_args(argv)
+    if args.command == 'run' and args.checkpoint and not args.checkpoint_every:
+        parser.error("--checkpoint needs --checkpoint-every")
+    if args.command == 'sweep' and bool(args.grid) == bool(args.random):
+        parser.error("sweep needs either --grid or --random axes")
+    return args
+
+def main(argv=None):
+    args = ParseArgs(argv)
+    log = (lambda message: None) if args.quiet else print
+
+    if args.command == 'run':
+        system, dt = BuildSystem(args)
+        log(f"{args.scenario}: {len(system)} bodies, dt = {dt}, duration = {args.duration}")
+        recorder = TrajectoryRecorder(args.record, system, args.record_every) if args.record else None
+        try:
+            count = Run(system, dt, args.duration, args.snapshot_every, args.output, log, recorder,
+                        args.checkpoint, args.checkpoint_every)
+        finally:
+            if recorder is not None:
+                recorder.close()
+        log(f"Wrote {count} snapshots to {args.output}")
+        if recorder is not None:
+            log(f"Recorded {len(recorder)} states to {args.record}")
+
+    elif args.command == 'resume':
+        checkpoint = Checkpoint.load_checkpoint(args.checkpoint)
+        system = Checkpoint.restore_system(checkpoint)
+        progress = Checkpoint.run_settings(checkpoint)
+        duration = args.duration if args.duration is not None else progress['duration']
+        log(f"Resuming {args.checkpoint}: {len(system)} bodies at t = {system.sim_time:.6g}, duration = {duration}")
+        count = Run(system, progress['dt'], duration, progress['snapshot_every'], progress['output'], log,
+                    checkpoint=args.checkpoint, checkpoint_every=progress['checkpoint_every'], progress=progress)
+        log(f"Snapshots up to {count - 1} in {progress['output']}")
+
+    elif args.command == 'sweep':
+        if args.grid:
+            configs = Sweep.grid_configs(ParseGrid(args.grid))
+        else:
+            configs = Sweep.random_configs(ParseRanges(args.random), args.samples, args.seed)
+
+        start = time.perf_counter()
+        settings = {'escape_radius': args.escape_radius, 'collision_radius': args.collision_radius}
+        if args.ensemble:
+            rows = Sweep.run_sweep_ensemble(configs, args.duration, args.dt, **settings)
+        else:
+            rows = Sweep.run_sweep(configs, args.duration, args.dt, args.workers, **settings)
+        Sweep.write_table(rows, args.table)
+
+        escaped = sum(row['escaped'] for row in rows)
+        collided = sum(row['collided'] for row in rows)
+        log(f"{len(rows)} runs in {time.perf_counter() - start:.2f} s | escaped {escaped} | collided {collided} | table {args.table}")
+
+
+if __name__ == "__main__":
+    main()
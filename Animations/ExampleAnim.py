@@ -1,13 +1,25 @@
 import pyqtgraph as pg
 from pyqtgraph.Qt import QtWidgets, QtCore
 import numpy as np
+from Utils.NBody import NBodySystem
+from Utils.Trails import TrailManager
+from Utils.Diagnostics import Diagnostics
+from Utils.Profiler import FrameProfiler
+from Utils.Recorder import TrajectoryRecorder, TrajectoryPlayer
 
 # -------------------------------
 # Physical parameters
 # -------------------------------
 G = 6.67430e-11  # gravitational constant
-time_speed = 5000  # speed-up factor
+time_speed = 5000  # speed-up factor, steps of dt per frame
 dt = 10  # simulation timestep in seconds
+integrator = 'verlet'  # 'yoshida4', 'yoshida6' or 'forest_ruth' hold energy at a much larger dt (raise dt, lower time_speed)
+
+# Recording
+record_path = None  # set to a file path to stream the trajectory to disk
+record_every = 100  # steps between records, every step would be ~20 MB/s at time_speed 5000
+playback_path = None  # set to a recorded file to replay it instead of integrating
+playback_time = 0.0
 
 # Masses
 m_earth = 5.972e24
@@ -26,6 +38,18 @@ v_com = (m_earth * v_earth + m_moon * v_moon) / (m_earth + m_moon)
 v_earth -= v_com
 v_moon -= v_com
 
+# Physics engine, body arrays become views into its state
+system = NBodySystem([r_earth, r_moon], [v_earth, v_moon], [m_earth, m_moon], G=G, integrator=integrator)
+r_earth, r_moon = system.positions
+v_earth, v_moon = system.velocities
+
+# Trajectory file, written while running or read through a memory map for playback
+recorder = TrajectoryRecorder(record_path, system, every=record_every) if record_path else None
+player = TrajectoryPlayer(playback_path) if playback_path else None
+if player is not None:
+    start_time, start_positions, start_velocities = player.frame(0)
+    system.set_state(start_positions, start_velocities, masses=player.masses, sim_time=start_time)
+
 # Save initial states for reset
 init_r_earth = r_earth.copy()
 init_v_earth = v_earth.copy()
@@ -34,14 +58,30 @@ init_v_moon = v_moon.copy()
 
 # Trails
 trail_length = 500
-trail_earth = [r_earth.copy()]
-trail_moon = [r_moon.copy()]
+trailManager = TrailManager(max_length=trail_length)
+trailManager.add_body('earth', r_earth)
+trailManager.add_body('moon', r_moon)
+
+# Conserved quantity history, log_interval (wall clock seconds) turns on console logging
+diagnostics = Diagnostics(system.dim, capacity=10000, every=1, pair=(0, 1), log_interval=None)
+
+# Frame time split by stage of update()
+show_profiler = False  # on screen FPS, steps per second and per stage timings
+profile_path = None  # export the frame timings here (.csv per frame, .json summary) when the window closes
+profiler = FrameProfiler(['physics', 'trails', 'plots', 'diagnostics', 'draw'])
 
 # -------------------------------
 # PyQtGraph setup
 # -------------------------------
 app = QtWidgets.QApplication([])
-win = pg.GraphicsLayoutWidget(show=True, title="Earth-Moon Orbit")
+
+# The view times its own paint as the 'draw' stage of the frame whose update() ran before it
+class TimedLayoutWidget(pg.GraphicsLayoutWidget):
+    def paintEvent(self, event):
+        with profiler.stage('draw'):
+            super().paintEvent(event)
+
+win = TimedLayoutWidget(show=True, title="Earth-Moon Orbit")
 plot = win.addPlot(title="Orbit")
 plot.setAspectLocked(True)
 plot.setXRange(-500, 500)
@@ -61,18 +101,21 @@ plot.addItem(energy_text)
 plot.addItem(momentum_text)
 energy_text.setPos(-500, 500)
 momentum_text.setPos(-500, 450)
+profiler_text = pg.TextItem(text="", anchor=(1,1))
+plot.addItem(profiler_text)
+profiler_text.setPos(500, 500)
 
 # -------------------------------
 # Reset button
 # -------------------------------
 def reset():
-    global r_earth, r_moon, v_earth, v_moon, trail_earth, trail_moon
-    r_earth[:] = init_r_earth
-    v_earth[:] = init_v_earth
-    r_moon[:] = init_r_moon
-    v_moon[:] = init_v_moon
-    trail_earth = [r_earth.copy()]
-    trail_moon = [r_moon.copy()]
+    global playback_time
+    playback_time = 0.0
+    system.set_state([init_r_earth, init_r_moon], [init_v_earth, init_v_moon], sim_time=player.times[0] if player is not None else 0.0)
+    trailManager.clear()
+    trailManager.update('earth', r_earth)
+    trailManager.update('moon', r_moon)
+    diagnostics.clear()
 
 reset_btn = QtWidgets.QPushButton("Reset")
 proxy = pg.QtWidgets.QGraphicsProxyWidget()
@@ -84,53 +127,47 @@ reset_btn.clicked.connect(reset)
 # Update function
 # -------------------------------
 def update():
-    global r_earth, r_moon, v_earth, v_moon, trail_earth, trail_moon
-
-    # Compute gravitational force
-    r_vec = r_moon - r_earth
-    r_mag = np.linalg.norm(r_vec)
-    F = G * m_earth * m_moon * r_vec / r_mag**3
-    a_earth = F / m_earth
-    a_moon = -F / m_moon
-
-    # Velocity Verlet integration
-    v_half_earth = v_earth + 0.5 * a_earth * dt * time_speed
-    v_half_moon = v_moon + 0.5 * a_moon * dt * time_speed
-
-    r_earth += v_half_earth * dt * time_speed
-    r_moon += v_half_moon * dt * time_speed
-
-    r_vec_new = r_moon - r_earth
-    r_mag_new = np.linalg.norm(r_vec_new)
-    a_earth_new = G * m_moon * r_vec_new / r_mag_new**3
-    a_moon_new = -G * m_earth * r_vec_new / r_mag_new**3
-
-    v_earth[:] = v_half_earth + 0.5 * a_earth_new * dt * time_speed
-    v_moon[:] = v_half_moon + 0.5 * a_moon_new * dt * time_speed
+    global playback_time
+    profiler.begin_frame()
+
+    # Velocity Verlet integration, all of the frame's steps in one batch call (or the recorded state at the new playback time)
+    with profiler.stage('physics'):
+        if player is not None:
+            playback_time += time_speed * dt
+            t, positions, velocities = player.frame(player.index_at(player.times[0] + playback_time))
+            system.set_state(positions, velocities, sim_time=t)
+        else:
+            system.advance(dt, time_speed, recorder)
 
     # Update trails
-    trail_earth.append(r_earth.copy())
-    trail_moon.append(r_moon.copy())
-    trail_earth = trail_earth[-trail_length:]
-    trail_moon = trail_moon[-trail_length:]
+    with profiler.stage('trails'):
+        trailManager.update('earth', r_earth)
+        trailManager.update('moon', r_moon)
 
     # Update plots (scaled for visualization)
-    scale = 1e6
-    earth_curve.setData([r_earth[0]/scale], [r_earth[1]/scale])
-    moon_curve.setData([r_moon[0]/scale], [r_moon[1]/scale])
-    trail_earth_curve.setData(np.array(trail_earth)[:,0]/scale, np.array(trail_earth)[:,1]/scale)
-    trail_moon_curve.setData(np.array(trail_moon)[:,0]/scale, np.array(trail_moon)[:,1]/scale)
-
-    # Compute specific orbital energy and angular momentum
-    v_rel = v_moon - v_earth
-    r_rel = r_moon - r_earth
-    mu = G * (m_earth + m_moon)
-    E = 0.5 * np.linalg.norm(v_rel)**2 - mu / np.linalg.norm(r_rel)   # specific orbital energy
-    h = np.cross(r_rel, v_rel)                                         # specific angular momentum
-
-    # Update text
-    energy_text.setText(f"E: {E:.2e}")
-    momentum_text.setText(f"h: {h:.2e}")
+    with profiler.stage('plots'):
+        scale = 1e6
+        earth_curve.setData([r_earth[0]/scale], [r_earth[1]/scale])
+        moon_curve.setData([r_moon[0]/scale], [r_moon[1]/scale])
+        trail_x, trail_y = trailManager.get_trail('earth')
+        trail_earth_curve.setData(trail_x / scale, trail_y / scale)
+        trail_x, trail_y = trailManager.get_trail('moon')
+        trail_moon_curve.setData(trail_x / scale, trail_y / scale)
+
+    # Store specific orbital energy and angular momentum (and total drift)
+    with profiler.stage('diagnostics'):
+        diagnostics.sample(system)
+        diagnostics.maybe_log()
+        latest = diagnostics.latest()
+
+        # Update text
+        energy_text.setText(f"E: {latest['pair_E']:.2e}")
+        momentum_text.setText(f"h: {latest['pair_h']:.2e}")
+
+    # Frame timings, the repaint after this returns is timed as 'draw'
+    profiler.end_frame(time_speed)
+    if show_profiler:
+        profiler_text.setText(profiler.overlay_text())
 
 # -------------------------------
 # Timer
@@ -141,6 +178,10 @@ timer.start(10)  # ~100 FPS
 
 # Run the Qt event loop
 QtWidgets.QApplication.instance().exec()
+if recorder is not None:
+    recorder.close()
+if profile_path:
+    profiler.export(profile_path)
 
 
 
@@ -1,76 +1,343 @@
 import sys
+import time
 from PyQt6 import QtWidgets, QtCore
 import pyqtgraph as pg
 import numpy as np
+from Utils import Scenarios
+from Utils.Trails import BodyTrails
+from Utils.Scheduler import FixedStepScheduler
+from Utils.Diagnostics import Diagnostics
+from Utils.Profiler import FrameProfiler
+from Utils.Worker import PhysicsWorker
+from Utils.Collisions import CollisionHandler
 
-#Instantiate pyqtgraph
-app = QtWidgets.QApplication(sys.argv)
-window = QtWidgets.QWidget()
 
-#Add Orbital Space
-layout = QtWidgets.QHBoxLayout(window)                      #Hbox to hold all elements
-orbitalSpace = pg.PlotWidget()
-orbitalSpace.setAspectLocked(True)
-orbitalSpace.enableAutoRange(False)
-layout.addWidget(orbitalSpace)
+##### Simulation Settings Start #####
+#Scene, any builder from Utils.Scenarios ('cluster' takes a body count)
+scenario = 'cluster'
+bodies = 1000             #The direct sum (Numba) takes ~7 ms a step at 1000, Barnes-Hut ~100 ms at 2000, so larger clusters need a lower Time Speed
+engine = {}               #NBodySystem settings, e.g. {'backend': 'barneshut'}, {'integrator': 'yoshida4'}, {'use_numba': False} or {'softening': 0.01}
+collisionRadius = 1e-3    #Radius of the lightest body (others scale with mass^(1/3)), touching bodies merge, None lets them pass through
 
-#RightPanel
-rightWidget = QtWidgets.QWidget()
-rightPanel = QtWidgets.QVBoxLayout(rightWidget)
-layout.addWidget(rightWidget)
+#Time settings per scenario, sized so the default engine keeps up (the statistics panel says when it doesn't)
+timeSpeeds = {'two_body': 1.0, 'earth_moon': 1e5, 'cluster': 0.05}     #Sim seconds per wall clock second
+maxStepsPerFrame = {'two_body': 100, 'earth_moon': 500, 'cluster': 4}  #Step budget per frame (per snapshot with a worker), time beyond this is dropped
+timeSpeed = timeSpeeds[scenario]
+workerMode = 'thread'     #Physics on a 'thread' or 'process' (Barnes-Hut holds the GIL, give it a process), None steps inside update()
+running = True            #For Start/Pause
+lastUpdateTime = None
 
-#Add Controls
-controls = QtWidgets.QWidget()
-controlsLayout = QtWidgets.QVBoxLayout(controls)            #Vbox to contain all controls
-textBoxes = []
-for i in range(5):
-    label = QtWidgets.QLabel(f"Label {i+1}")                #Labels
-    tbox = QtWidgets.QLineEdit()
-    tbox.setPlaceholderText(f"Box {i+1}")
-    controlsLayout.addWidget(label)
-    controlsLayout.addWidget(tbox)
-    textBoxes.append(tbox)
-rightPanel.addWidget(controls)
+#Drawing
+trailLength = 10          #Points per trail, every body's trail is drawn in one polyline (10k bodies x 10 points paints in ~6 ms)
+bodySize = 3              #Pixels for the lightest body, heavier bodies grow with log(mass)
+statsInterval = 0.25      #Wall clock seconds between statistics panel updates
+lastStatsUpdate = 0.0
 
-#Controls Setup
-#****************
+#Total energy is an O(N^2) sum, only tracked up to this many bodies
+diagnosticsMaxBodies = 300
+##### Simulation Settings End #####
 
-#Add Statistics
-statistics = QtWidgets.QWidget()
-statisticsLayout = QtWidgets.QVBoxLayout(statistics)
-statNumbers = []
-for i in range(5):
-    label = QtWidgets.QLabel(f"Label {i+1}")                #Labels
-    statisticsLayout.addWidget(label)
-    statNumbers.append(label)
-rightPanel.addWidget(statistics)
 
-#Statistics Setup
-#****************
 
-#Add Bodies
-body1 = pg.ScatterPlotItem([0], [0], size=30, brush='r')
-body2 = pg.ScatterPlotItem([0], [5], size=10, brush='b')
-orbitalSpace.addItem(body1)
-orbitalSpace.addItem(body2)
 
 
+#Build the system and everything sized by its body count
+def BuildScene():
+    global system, scheduler, trails, trailIds, diagnostics, sizes, worker, lightest, timeSpeed
 
+    settings = dict(engine)
+    if scenario == 'cluster':
+        settings.update(bodies=bodies, dim=2)
+    system, dt = Scenarios.build(scenario, **settings)
+    lightest = system.masses.min()
+    if collisionRadius:
+        system.collisions = CollisionHandler(collisionRadius * (system.masses / lightest) ** (1.0 / 3.0))
 
+    timeSpeed = timeSpeeds[scenario]
+    scheduler = FixedStepScheduler(dt, maxStepsPerFrame[scenario])
 
-#Animation
-def update():
-    pass
+    #The worker steps its own copy, system becomes a mirror refreshed from its snapshots
+    if worker is not None:
+        worker.close()
+    worker = PhysicsWorker(system, dt, timeSpeed, workerMode, maxStepsPerFrame[scenario]) if workerMode else None
+    if worker is not None and not running:
+        worker.set_running(False)
 
+    trails = BodyTrails(trailLength, system.positions)
+    trailIds = np.arange(len(system))       #Body of each trail, in the collision handler's ids
+    diagnostics = Diagnostics(system.dim, capacity=1000) if len(system) <= diagnosticsMaxBodies else None
+    if diagnostics is not None:
+        diagnostics.sample(system)
 
+    #Marker sizes from the masses, computed once per scene (and after mergers)
+    sizes = bodySize * (1.0 + np.log10(system.masses / lightest))
 
+#Mergers changed the body count: drop the trails of the bodies that were absorbed, size the merged
+#bodies, and measure drift from the merged system on (a merger loses energy on purpose)
+def BodiesMerged():
+    global trailIds, sizes
+    ids = system.collisions.ids
+    trails.compact(np.isin(trailIds, ids))
+    trailIds = ids
+    sizes = bodySize * (1.0 + np.log10(system.masses / lightest))
+    if diagnostics is not None:
+        diagnostics.rebase()
 
+#Everything from here builds the window and starts the physics, guarded so a worker process started
+#with spawn (which imports this script) doesn't run it again
+if __name__ == "__main__":
+    system = scheduler = trails = trailIds = diagnostics = sizes = worker = lightest = None
+    BuildScene()
 
-#Animation Timer
-timer = QtCore.QTimer()
-timer.timeout.connect(update)
-timer.start(16)  # ~60 FPS
 
-#Run Graph
-window.show()
-sys.exit(app.exec())
\ No newline at end of file
+    #Instantiate pyqtgraph
+    app = QtWidgets.QApplication(sys.argv)
+    window = QtWidgets.QWidget()
+
+    #Add Orbital Space
+    layout = QtWidgets.QHBoxLayout(window)                      #Hbox to hold all elements
+    #The view times its own paint as the 'draw' stage of the frame whose update() ran before it
+    class TimedPlotWidget(pg.PlotWidget):
+        def paintEvent(self, event):
+            with profiler.stage('draw'):
+                super().paintEvent(event)
+
+    orbitalSpace = TimedPlotWidget()
+    orbitalSpace.setAspectLocked(True)
+    orbitalSpace.enableAutoRange(False)
+    layout.addWidget(orbitalSpace, stretch=1)
+
+    #RightPanel
+    rightWidget = QtWidgets.QWidget()
+    rightPanel = QtWidgets.QVBoxLayout(rightWidget)
+    layout.addWidget(rightWidget)
+
+    #Add Controls
+    controls = QtWidgets.QWidget()
+    controlsLayout = QtWidgets.QVBoxLayout(controls)            #Vbox to contain all controls
+    textBoxes = []
+    controlLabels = []
+    for i in range(5):
+        label = QtWidgets.QLabel(f"Label {i+1}")                #Labels
+        tbox = QtWidgets.QLineEdit()
+        tbox.setPlaceholderText(f"Box {i+1}")
+        controlsLayout.addWidget(label)
+        controlsLayout.addWidget(tbox)
+        textBoxes.append(tbox)
+        controlLabels.append(label)
+    buttons = QtWidgets.QHBoxLayout()
+    startButton = QtWidgets.QPushButton("Start")
+    pauseButton = QtWidgets.QPushButton("Pause")
+    resetButton = QtWidgets.QPushButton("Reset")
+    for button in (startButton, pauseButton, resetButton):
+        buttons.addWidget(button)
+    controlsLayout.addLayout(buttons)
+    rightPanel.addWidget(controls)
+
+    #Controls Setup
+    #****************
+    #(label, current value as text, apply(text) which raises ValueError on bad input)
+    def SetScenario(text):
+        global scenario
+        if text not in Scenarios.SCENARIOS:
+            raise ValueError(text)
+        scenario = text
+        Reset()
+
+    def SetBodies(text):
+        global bodies
+        value = int(text)
+        if value < 2:
+            raise ValueError(text)
+        bodies = value
+        if scenario == 'cluster':
+            Reset()
+
+    def SetTimeSpeed(text):
+        global timeSpeed
+        value = float(text)
+        if value <= 0:
+            raise ValueError(text)
+        timeSpeed = timeSpeeds[scenario] = value
+        if worker is not None:
+            worker.set_speed(timeSpeed)
+
+    def SetDt(text):
+        value = float(text)
+        if value <= 0:
+            raise ValueError(text)
+        scheduler.set_dt(value)
+        if worker is not None:
+            worker.set_dt(value)
+
+    def SetTrailLength(text):
+        global trailLength
+        value = int(text)
+        if value < 1:
+            raise ValueError(text)
+        trailLength = value
+        trails.set_max_length(trailLength)
+
+    controlSettings = [
+        ("Scenario", lambda: scenario, SetScenario),
+        ("Bodies (cluster)", lambda: str(bodies), SetBodies),
+        ("Time Speed", lambda: f"{timeSpeed:g}", SetTimeSpeed),
+        ("Physics dt", lambda: f"{scheduler.dt:g}", SetDt),
+        ("Trail Length", lambda: str(trailLength), SetTrailLength),
+    ]
+
+    #Apply the box on enter, bad input puts the current value back
+    def ConnectControl(tbox, current, apply):
+        def submitted():
+            try:
+                apply(tbox.text().strip())
+            except ValueError:
+                pass
+            tbox.setText(current())
+        tbox.editingFinished.connect(submitted)
+
+    for label, tbox, (name, current, apply) in zip(controlLabels, textBoxes, controlSettings):
+        label.setText(name)
+        tbox.setPlaceholderText(name)
+        tbox.setText(current())
+        ConnectControl(tbox, current, apply)
+
+    #Add Statistics
+    statistics = QtWidgets.QWidget()
+    statisticsLayout = QtWidgets.QVBoxLayout(statistics)
+    statNumbers = []
+    for i in range(5):
+        label = QtWidgets.QLabel(f"Label {i+1}")                #Labels
+        statisticsLayout.addWidget(label)
+        statNumbers.append(label)
+    rightPanel.addWidget(statistics)
+    rightPanel.addStretch()
+
+    #Statistics Setup
+    #****************
+    #Frame time split by stage of update(), plus the view's paint
+    profiler = FrameProfiler(['physics', 'trails', 'render', 'diagnostics', 'draw'])
+
+    def UpdateStatistics():
+        summary = profiler.summary()
+        if summary is None:
+            return
+        statNumbers[0].setText(f"FPS: {summary['fps']:.0f} ({summary['interval_ms']:.1f} ms)")
+        #Physics falling short of the requested Time Speed (steps dropped past the budget, or a worker that can't keep up)
+        wanted = timeSpeed / scheduler.dt
+        behind = f", behind: {summary['steps_per_second'] / wanted:.0%} of Time Speed" if running and summary['steps_per_second'] < 0.9 * wanted else ""
+        statNumbers[1].setText(f"Steps/s: {summary['steps_per_second']:.3g} (physics {summary['physics_ms']:.1f} ms{behind})")
+        statNumbers[2].setText(f"Sim Time: {system.sim_time:.3f}")
+        statNumbers[3].setText(f"Bodies: {len(system)} (render {summary['render_ms'] + summary['trails_ms']:.1f} ms, paint {summary['draw_ms']:.1f} ms)")
+        drift = diagnostics.drift() if diagnostics is not None else None
+        statNumbers[4].setText(f"|dE/E|: {drift['energy']:.2e}" if drift is not None else "|dE/E|: n/a")
+
+    #Add Bodies
+    #One scatter item for every body and one curve for every trail, both fed straight from the engine arrays
+    bodyScatter = pg.ScatterPlotItem(pen=None, brush=pg.mkBrush(255, 220, 120), pxMode=True)
+    trailCurve = pg.PlotCurveItem(pen=pg.mkPen(120, 160, 255, 90, width=1), skipFiniteCheck=True)
+    orbitalSpace.addItem(trailCurve)
+    orbitalSpace.addItem(bodyScatter)
+
+    #Fit the view to the bulk of the bodies, ignoring far outliers
+    def FitView():
+        extent = 1.2 * np.percentile(np.abs(system.positions[:, :2]), 99)
+        orbitalSpace.setXRange(-extent, extent)
+        orbitalSpace.setYRange(-extent, extent)
+
+    #setData rebuilds every point's record, ~1.3 ms at 1000 bodies (~22 ms at 10k)
+    def MoveBodies():
+        bodyScatter.setData(pos=system.positions[:, :2], size=sizes)
+
+    def Draw():
+        MoveBodies()
+        x, y, connect = trails.segments()
+        trailCurve.setData(x, y, connect=connect)
+
+    #Rebuild the scene from the current settings
+    def Reset():
+        global lastUpdateTime
+        BuildScene()
+        for tbox, (name, current, apply) in zip(textBoxes, controlSettings):
+            tbox.setText(current())
+        profiler.clear()
+        lastUpdateTime = None
+        FitView()
+        Draw()
+
+    def Start():
+        global running
+        running = True
+        if worker is not None:
+            worker.set_running(True)
+
+    def Pause():
+        global running
+        running = False
+        if worker is not None:
+            worker.set_running(False)
+
+    startButton.clicked.connect(Start)
+    pauseButton.clicked.connect(Pause)
+    resetButton.clicked.connect(Reset)
+    FitView()
+    Draw()
+
+
+
+
+
+    #Animation
+    def update():
+        global lastUpdateTime, lastStatsUpdate
+
+        #Calculate Time Elapsed
+        profiler.begin_frame()
+        now = time.time()
+        if lastUpdateTime is None:
+            lastUpdateTime = now
+        true_dt = now - lastUpdateTime
+        lastUpdateTime = now
+
+        #Run Sim, or pick up whatever the worker has stepped since the last frame
+        if worker is not None:
+            with profiler.stage('physics'):
+                steps = worker.read_into(system)
+        else:
+            steps = scheduler.advance(true_dt * timeSpeed) if running else 0
+            if steps > 0:
+                with profiler.stage('physics'):
+                    system.advance(scheduler.dt, steps)
+
+        if steps > 0:
+            if len(system) != trails.bodies:
+                BodiesMerged()
+            with profiler.stage('trails'):
+                trails.update(system.positions)
+            with profiler.stage('render'):
+                Draw()
+            if diagnostics is not None:
+                with profiler.stage('diagnostics'):
+                    diagnostics.sample(system)
+
+        #Frame timings, the repaint after this returns is timed as 'draw'
+        profiler.end_frame(steps)
+        if now - lastStatsUpdate >= statsInterval:
+            UpdateStatistics()
+            lastStatsUpdate = now
+
+
+
+
+
+    #Animation Timer
+    timer = QtCore.QTimer()
+    timer.timeout.connect(update)
+    timer.start(16)  # ~60 FPS
+
+    #Run Graph
+    window.show()
+    exitCode = app.exec()
+    if worker is not None:
+        worker.close()
+    sys.exit(exitCode)
@@ -5,6 +5,17 @@ from matplotlib.animation import FuncAnimation
 from matplotlib.widgets import Button, TextBox, CheckButtons
 import matplotlib.gridspec as gridspec
 from Utils.Trails import TrailManager
+from Utils.NBody import NBodySystem
+from Utils.Scheduler import FixedStepScheduler
+from Utils.Recorder import TrajectoryRecorder, TrajectoryPlayer
+from Utils.Checkpoint import save_checkpoint, load_checkpoint, restore_trails, run_settings
+from Utils.Kepler import TwoBodyPropagator
+from Utils.Diagnostics import Diagnostics
+from Utils.Profiler import FrameProfiler
+from Utils.TimeSeries import TimeSeriesBuffer
+from Utils.Worker import PhysicsWorker
+from Utils.Collisions import CollisionHandler
+import os
 import time
 
 
@@ -15,13 +26,43 @@ simTime = 0.0           #simulation time in seconds
 running = True          #For Start/Pause
 lastUpdateTime = None
 
-update_interval = 0.5   # seconds between text box updates
+physicsDt = 0.001         #Fixed integration step in sim seconds, independent of frame rate
+maxStepsPerFrame = 2000   #Step budget per frame, time beyond this is dropped
+predictionWindow = 0.0    #Sim seconds of analytic Kepler orbit drawn ahead of the bodies, 0 turns it off
+physicsWorker = None      #'thread' or 'process' steps the physics off the GUI thread (recording and playback stay inline, process mode needs an if __name__ == '__main__' guard where processes spawn)
+integrator = 'verlet'     #'verlet', 'yoshida4' / 'yoshida6' / 'forest_ruth', 'rk45' / 'block' to substep close approaches, or 'logh' (time transformed leapfrog, exact orbit through any periapsis)
+
+#Recording
+recordPath = None         #Set to a file path to stream every integration step to disk
+playbackPath = None       #Set to a recorded file to replay it instead of integrating
+playbackTime = 0.0
+
+#Checkpoints, saved every checkpointEvery wall clock seconds and resumed from at start up when the file exists
+checkpointPath = None
+checkpointEvery = 60.0
+lastCheckpoint = time.time()
+
+update_interval = 0.5   # wall clock seconds between text box updates
 last_text_update = 0.0
 last_E_display = None
 last_h_display = None
 
+#Diagnostics
+diagnosticsCapacity = 10000   #Rows of conserved quantity history kept
+diagnosticsEvery = 1          #Frames between stored rows
+logInterval = None            #Wall clock seconds between console diagnostics lines, None keeps the console quiet
+diagnosticsPath = None        #Export the history here (.csv or .npz) when the window closes
+
+#Profiling
+showProfiler = False          #On screen FPS, steps per second and per stage timings
+profilePath = None            #Export the frame timings here (.csv per frame, .json summary) when the window closes
+
 #Constants
 G = 50.0   #Gravitational Constant
+softening = 0.0   #Plummer softening length, caps the pull of close passes (0 is exact point mass gravity)
+
+#Collisions, the run pauses when the bodies touch (a merger would end the two body problem)
+bodyRadii = (1.0, 3.0)     #None lets the bodies pass through each other
 
 #Bodies
     #Body1
@@ -33,6 +74,28 @@ m1 = 100.0                    # Mass of body 1
 r2 = np.array([20.0, -20.0])   # Initial position of body 2
 v2 = np.array([-10.0, -4.0])# Initial velocity of body 2
 m2 = 1000.0                    # Mass of body 2
+
+#Physics engine, r1/r2/v1/v2 become views into its state arrays
+system = NBodySystem([r1, r2], [v1, v2], [m1, m2], G=G, integrator=integrator, softening=softening,
+                     collisions=CollisionHandler(bodyRadii, merge=False) if bodyRadii else None)
+r1, r2 = system.positions
+v1, v2 = system.velocities
+
+#Converts wall clock time into whole fixed steps
+scheduler = FixedStepScheduler(physicsDt, maxStepsPerFrame)
+
+#Energy, angular momentum and momentum history, plus E and h of the pair
+diagnostics = Diagnostics(system.dim, diagnosticsCapacity, diagnosticsEvery, pair=(0, 1), log_interval=logInterval)
+
+#Frame time split by stage of UpdateFrame, plus the draw after it
+profiler = FrameProfiler(['physics', 'diagnostics', 'trails', 'velocity', 'rescale', 'prediction', 'draw'])
+
+#Trajectory file, written while running or read through a memory map for playback
+recorder = TrajectoryRecorder(recordPath, system) if recordPath else None
+player = TrajectoryPlayer(playbackPath) if playbackPath else None
+if player is not None:
+    startTime, startPositions, startVelocities = player.frame(0)
+    system.set_state(startPositions, startVelocities, masses=player.masses, sim_time=startTime)
 ##### Simulation Settings End #####
 
 
@@ -66,6 +129,16 @@ body2Plot, = axis.plot([], [], marker='o', linestyle='', markersize=6, color='bl
 trail1Plot, = axis.plot([], [], color='red', linewidth=1)
 trail2Plot, = axis.plot([], [], color='blue', linewidth=1)
 
+#Predicted Paths
+prediction1Plot, = axis.plot([], [], color='red', linewidth=1, linestyle=':')
+prediction2Plot, = axis.plot([], [], color='blue', linewidth=1, linestyle=':')
+
+#Profiler Overlay
+profilerText = axis.text(0.02, 0.98, "", transform=axis.transAxes, va='top', fontsize=8, family='monospace')
+
+#Status Line, says why the run stopped
+statusText = axis.text(0.5, 0.02, "", transform=axis.transAxes, ha='center', va='bottom', fontsize=10, color='darkred')
+
 #Velocities
 body1VelPlot, = axis2.plot([], [], color='red', linewidth=1)
 body2VelPlot, = axis2.plot([], [], color='blue', linewidth=1)
@@ -77,15 +150,30 @@ body2VelPlot, = axis2.plot([], [], color='blue', linewidth=1)
 
 ##### Additional Features Start #####
 #Trails
-trailManager = TrailManager(max_length=1000)
+trailManager = TrailManager(max_length=1000, decimate=True, max_deviation=0.05)   #Level of detail kicks in past 1000 points, drawn within 0.2 of the path
 trailManager.add_body('body1', r1)
 trailManager.add_body('body2', r2)
 
-#Velocity
+#Resume from the last checkpoint
+resumed = None
+if checkpointPath and os.path.exists(checkpointPath) and player is None:
+    checkpoint = load_checkpoint(checkpointPath)
+    system.set_state(checkpoint['positions'], checkpoint['velocities'], masses=checkpoint['masses'], sim_time=float(checkpoint['time']))
+    restore_trails(checkpoint, trailManager)
+    resumed = run_settings(checkpoint)
+    m1, m2 = system.masses
+    simTime = system.sim_time
+
+#Physics worker, started once the state is final, system then mirrors its snapshots every frame
+worker = None
+if physicsWorker and recorder is None and player is None:
+    worker = PhysicsWorker(system, physicsDt, timeSpeedMultiplier, physicsWorker, maxStepsPerFrame)
+
+#Velocity, speeds of both bodies over the last maxVelHistory frames (running max kept incrementally)
 maxVelHistory = 500
-vel1History = [np.linalg.norm(v1)]
-vel2History = [np.linalg.norm(v2)]
-timeHistory = [0] 
+velHistory = TimeSeriesBuffer(maxVelHistory, channels=2)
+velHistory.append(simTime, np.linalg.norm(v1), np.linalg.norm(v2))
+velTop = None       #Current upper y limit of the velocity plot
 ##### Additional Features End #####
 
 
@@ -94,109 +182,124 @@ timeHistory = [0]
 
 #Changes to make every frame
 def UpdateFrame(frame):
-    global r1, r2, v1, v2 
-    global trail1Plot, trail2Plot, trailManager
-    global vel1History, vel2History, timeHistory
+    global velTop
     global simTime, lastUpdateTime, last_text_update, last_E_display, last_h_display
+    global playbackTime, lastCheckpoint
 
     #Calculate Time Elapsed
+    profiler.begin_frame()
     now = time.time()
     if lastUpdateTime is None:
         lastUpdateTime = now
     true_dt = now - lastUpdateTime
     lastUpdateTime = now
 
-    #Control Sim Time
-    if running:
-        sim_dt = true_dt * timeSpeedMultiplier
-        simTime += sim_dt
-
+    #Control Sim Time, with a worker the steps are whatever it took since the last frame
+    if worker is not None:
+        with profiler.stage('physics'):
+            steps = worker.read_into(system)
+    elif running:
+        steps = scheduler.advance(true_dt * timeSpeedMultiplier)
     else:
-        sim_dt = 0
+        steps = 0
 
     #Run Sim
-    if sim_dt > 0:
-        #Calculate Force vectors Fg
-        r12 = r2 - r1                                           #Vector from body 1 to body 2
-        Fg = ((G * m1 * m2) * (r12)) / (np.linalg.norm(r12) ** 3)    #This is relative to body 1
-
-        #Calculate acceleration vectors
-        a1 = Fg / m1
-        a2 = -Fg / m2
-
-        ## Velocity Verlot Integration Start
-        vHalf1 = v1 + 0.5 * a1 * sim_dt                      #Calculate Half Time Step
-        vHalf2 = v2 + 0.5 * a2 * sim_dt                      #Calculate Half Time Step
-
-        r1 = r1 + vHalf1 * sim_dt                            #Calculate new position
-        r2 = r2 + vHalf2 * sim_dt                            #Calculate new position
-
-        r12 = r2 - r1
-        newA1 = ((G * m2) * (r12)) / (np.linalg.norm(r12) ** 3)      #Recalculate accerlation with new position
-        newA2 = -((G * m1) * (r12)) / (np.linalg.norm(r12) ** 3)     #Recalculate accerlation with new position
-
-        v1 = vHalf1 + 0.5 * newA1 * sim_dt                   #Calcualate new vel
-        v2 = vHalf2 + 0.5 * newA2 * sim_dt                   #Calcualate new vel
-
-        #Calulate Specfic Momentum and Specific Energy
-        v12 = v2 - v1
-        mu = G * (m1 + m2)
-        h = np.cross(r12, v12)                                         #Specific angular momentum
-        E = (0.5 * np.linalg.norm(v12)**2) - (mu/np.linalg.norm(r12))  #Specific orbital energy
-        print(f"Time: {simTime:.2f} | E: {E:.2f}, h: {h:.2f}")
+    if steps > 0:
+        with profiler.stage('physics'):
+            if player is not None:
+                #Scrub to the recorded state at the new playback time
+                playbackTime += steps * physicsDt
+                t, positions, velocities = player.frame(player.index_at(player.times[0] + playbackTime))
+                system.set_state(positions, velocities, sim_time=t)
+            elif worker is None:
+                system.advance(physicsDt, steps, recorder)
+            simTime = system.sim_time
+
+            #Stop at contact instead of integrating through the 1 / r^2 singularity
+            if running and system.collisions is not None and len(system.collisions.contacts(system)):
+                pause(None)
+                statusText.set_text(f"Bodies collided at time {simTime:.3f}, paused (Reset to start again)")
+
+            #Periodic checkpoint of the state, trails and the initial conditions used by reset
+            if checkpointPath and player is None and now - lastCheckpoint >= checkpointEvery:
+                save_checkpoint(checkpointPath, system, trailManager,
+                                initial_positions=[initial_r1, initial_r2], initial_velocities=[initial_v1, initial_v2])
+                lastCheckpoint = now
+
+        with profiler.stage('diagnostics'):
+            #Store Specific Energy and Specific Momentum (and total drift), logged at most every logInterval
+            diagnostics.sample(system)
+            diagnostics.maybe_log(now)
 
             #Update displays
-        #if simTime - last_text_update >= update_interval:
-        #    tolerance = 0.01
-        #    if last_E_display is not None and abs(E - last_E_display) > tolerance:
-        #        energyText.set_val(f"{E:.2f}")
-        #    last_E_display = E
-        #    if  last_h_display is not None and abs(h - last_h_display) > tolerance:
-        #        angMomText.set_val(f"{h:.2f}")
-        #    last_h_display = h
-        #    last_text_update = simTime
+            if now - last_text_update >= update_interval:
+                latest = diagnostics.latest()
+                E, h = latest['pair_E'], latest['pair_h']
+                tolerance = 0.01
+                if last_E_display is None or abs(E - last_E_display) > tolerance:
+                    energyText.set_val(f"{E:.2f}")
+                    last_E_display = E
+                if last_h_display is None or abs(h - last_h_display) > tolerance:
+                    angMomText.set_val(f"{h:.2f}")
+                    last_h_display = h
+                last_text_update = now
 
 
         #Update Trails
-        trailManager.update('body1', r1)
-        trailManager.update('body2', r2)
+        with profiler.stage('trails'):
+            trailManager.update('body1', r1)
+            trailManager.update('body2', r2)
 
         #Update Velocities
-        vel1History.append(np.linalg.norm(v1))
-        vel2History.append(np.linalg.norm(v2))
-        timeHistory.append(simTime)
-        vel1History = vel1History[-maxVelHistory:]
-        vel2History = vel2History[-maxVelHistory:]
-        timeHistory = timeHistory[-maxVelHistory:]
+        with profiler.stage('velocity'):
+            velHistory.append(simTime, np.linalg.norm(v1), np.linalg.norm(v2))
 
 
         #Update Plots
         body1Plot.set_data([r1[0]], [r1[1]])
         body2Plot.set_data([r2[0]], [r2[1]])
 
-        body1VelPlot.set_data(timeHistory, vel1History)
-        body2VelPlot.set_data(timeHistory, vel2History)
+        with profiler.stage('velocity'):
+            times = velHistory.times()
+            body1VelPlot.set_data(times, velHistory.values(0))
+            body2VelPlot.set_data(times, velHistory.values(1))
 
         #Sliding Window for Vel
-        velWindow = 10
-        max_velocity = max(max(vel1History, default=0), max(vel2History, default=0))
-        axis2.set_xlim(simTime - velWindow, simTime + velWindow*0.1)
-        axis2.set_ylim(bottom=0, top=max_velocity*1.1)  # add 10% margin
+        with profiler.stage('rescale'):
+            velWindow = 10
+            axis2.set_xlim(simTime - velWindow, simTime + velWindow*0.1)
+            top = velHistory.max() * 1.1        #add 10% margin
+            if top != velTop:
+                axis2.set_ylim(bottom=0, top=top)
+                velTop = top
 
 
 
-        if show_trails[0]:
-            trail1_data = trailManager.get_trail('body1')
-            trail2_data = trailManager.get_trail('body2')
-            if trail1_data:
-                trail1Plot.set_data(*zip(*trail1_data))
-            if trail2_data:
-                trail2Plot.set_data(*zip(*trail2_data))
-        else:
-            trail1Plot.set_data([], [])
-            trail2Plot.set_data([], [])
+        with profiler.stage('trails'):
+            if show_trails[0]:
+                trail1Plot.set_data(*trailManager.get_trail('body1'))
+                trail2Plot.set_data(*trailManager.get_trail('body2'))
+            else:
+                trail1Plot.set_data([], [])
+                trail2Plot.set_data([], [])
 
-    return body1Plot, body2Plot, trail1Plot, trail2Plot, body1VelPlot, body2VelPlot
+        #Closed form two body prediction, one call for every point of the path
+        if predictionWindow > 0:
+            with profiler.stage('prediction'):
+                try:
+                    predicted, _ = TwoBodyPropagator.from_system(system).state(simTime + np.linspace(0.0, predictionWindow, 200))
+                    prediction1Plot.set_data(predicted[:, 0, 0], predicted[:, 0, 1])
+                    prediction2Plot.set_data(predicted[:, 1, 0], predicted[:, 1, 1])
+                except ValueError:
+                    prediction1Plot.set_data([], [])
+                    prediction2Plot.set_data([], [])
+
+    #Frame timings, the draw after this returns is marked as 'draw' (see the animation setup)
+    profiler.end_frame(steps)
+    if showProfiler:
+        profilerText.set_text(profiler.overlay_text())
+
+    return body1Plot, body2Plot, trail1Plot, trail2Plot, body1VelPlot, body2VelPlot, prediction1Plot, prediction2Plot, profilerText, statusText
 
 
 
@@ -233,15 +336,20 @@ resetButton = Button(plt.axes([0.82, 0.05, 0.075, 0.05]), 'Reset')
 
 #Reset Button Logic
 def reset(event):
-    global r1, r2, v1, v2, body1Plot, body2Plot, trail1Plot, trail2Plot, trailManager, vel1History, timeHistory
+    global playbackTime
 
-    # reset positions
-    r1[:] = initial_r1
-    r2[:] = initial_r2
-    
-    # reset velocities
-    v1[:] = initial_v1
-    v2[:] = initial_v2
+    # reset positions and velocities
+    if player is None:
+        system.set_state([initial_r1, initial_r2], [initial_v1, initial_v2], sim_time=system.sim_time)
+    else:
+        playbackTime = 0.0
+        t, positions, velocities = player.frame(0)
+        system.set_state(positions, velocities, sim_time=t)
+
+    scheduler.reset()
+    if worker is not None:
+        worker.push(system)
+    diagnostics.clear()
 
     #reset trails
     trailManager.clear("body1")
@@ -252,38 +360,44 @@ def reset(event):
     body2Plot.set_data([r2[0]], [r2[1]])
     trail1Plot.set_data([], [])
     trail2Plot.set_data([], [])
+    statusText.set_text("")
     plt.draw()
 
     #reset histories
-    vel1History.clear()
-    vel1History.append(np.linalg.norm(v1))
-    vel2History.clear()
-    vel2History.append(np.linalg.norm(v2))
-    timeHistory.clear()
-    timeHistory = [0]
+    velHistory.clear()
+    velHistory.append(system.sim_time, np.linalg.norm(v1), np.linalg.norm(v2))
 
 initial_r1 = r1.copy()
 initial_r2 = r2.copy()
 initial_v1 = v1.copy()
 initial_v2 = v2.copy()
+if resumed is not None:
+    initial_r1[:], initial_r2[:] = resumed['initial_positions']
+    initial_v1[:], initial_v2[:] = resumed['initial_velocities']
 resetButton.on_clicked(reset)
 
 #Pause Button Logic
 def pause(event):
     global running
     running = False
+    if worker is not None:
+        worker.set_running(False)
 pauseButton.on_clicked(pause)
 
 #Start Button Logic
 def start(event):
     global running
     running = True
+    if worker is not None:
+        worker.set_running(True)
 startButton.on_clicked(start)
 
 #Slowdown
 def slower(event):
     global timeSpeedMultiplier
     timeSpeedMultiplier = max(timeSpeedMultiplier * 0.5, 0.0001)
+    if worker is not None:
+        worker.set_speed(timeSpeedMultiplier)
     timeText.set_val(f"{timeSpeedMultiplier:.4f}")
 slowerButton.on_clicked(slower)
 
@@ -291,6 +405,8 @@ slowerButton.on_clicked(slower)
 def faster(event):
     global timeSpeedMultiplier
     timeSpeedMultiplier *= 2
+    if worker is not None:
+        worker.set_speed(timeSpeedMultiplier)
     timeText.set_val(f"{timeSpeedMultiplier:.4f}")
 fasterButton.on_clicked(faster)
 
@@ -301,6 +417,8 @@ def update_time_multiplier(text):
         val = float(text)
         if val > 0:
             timeSpeedMultiplier = val
+            if worker is not None:
+                worker.set_speed(timeSpeedMultiplier)
         else:
             timeText.set_val(str(timeSpeedMultiplier))
     except:
@@ -309,21 +427,19 @@ timeText.on_submit(update_time_multiplier)
 
 #Trails
 def toggle_trails(label):
-    global show_trails
     show_trails[0] = not show_trails[0]  # toggle boolean
 trailCheck.on_clicked(toggle_trails)
 show_trails = [True]
 
 def update_trail_length(text):
-    global max_trail_length
     try:
         val = int(text)
         if val > 0:
-            max_trail_length = val
+            trailManager.set_max_length(val)
         else:
-            trailLengthBox.set_val(str(max_trail_length))
+            trailLengthBox.set_val(str(trailManager.get_max_length()))
     except:
-        trailLengthBox.set_val(str(max_trail_length))
+        trailLengthBox.set_val(str(trailManager.get_max_length()))
 
 trailLengthBox.on_submit(update_trail_length)
 
@@ -334,6 +450,10 @@ def update_body1_mass(text):
         val = float(text)
         if val > 0:
             m1 = val
+            system.masses[0] = m1
+            system.refresh()
+            if worker is not None:
+                worker.push(system)
         body1MassText.set_val(f"{m1:.1f}")
     except:
         body1MassText.set_val(f"{m1:.1f}")
@@ -366,6 +486,10 @@ def update_body2_mass(text):
         val = float(text)
         if val > 0:
             m2 = val
+            system.masses[1] = m2
+            system.refresh()
+            if worker is not None:
+                worker.push(system)
         body2MassText.set_val(f"{m2:.1f}")
     except:
         body2MassText.set_val(f"{m2:.1f}")
@@ -406,5 +530,21 @@ animation = FuncAnimation(
     blit = True
 )
 
+#Draw time, from UpdateFrame returning until the frame is drawn: a blitted frame is on screen when the
+#animation timer's next callback runs (canvases without blit support redraw in full), a full redraw
+#ends with draw_event
+if fig.canvas.supports_blit:
+    animation.event_source.add_callback(profiler.mark, 'draw')
+fig.canvas.mpl_connect('draw_event', lambda event: profiler.mark('draw'))
+
 plt.show()
+
+if worker is not None:
+    worker.close()
+if recorder is not None:
+    recorder.close()
+if diagnosticsPath:
+    diagnostics.export(diagnosticsPath)
+if profilePath:
+    profiler.export(profilePath)
 #####  Plots End #####
\ No newline at end of file
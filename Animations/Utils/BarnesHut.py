@@ -0,0 +1,175 @@
+import numpy as np
+
+#Deepest subdivision allowed, only reached by (nearly) coincident bodies
+MAX_DEPTH = 48
+
+
+class BarnesHutTree:
+    #Quadtree (2D) or octree (3D) built level by level with array operations
+    #Nodes are stored flat, every per-node quantity is an array indexed by node id
+    def __init__(self, positions, masses):
+        positions = np.asarray(positions, dtype=float)
+        masses = np.asarray(masses, dtype=float)
+        N, dim = positions.shape
+        nChild = 2 ** dim
+        bits = 1 << np.arange(dim)                                #Octant bit for each axis
+
+        #Root cell, a cube around every body
+        lo = positions.min(axis=0)
+        hi = positions.max(axis=0)
+        rootHalf = max(0.5 * np.max(hi - lo), 1e-12) * (1.0 + 1e-9)
+
+        centers = [(0.5 * (lo + hi))[np.newaxis, :]]
+        halves = [np.array([rootHalf])]
+        nodeMasses = []
+        nodeComs = []
+        nodeBodies = []
+        nodeChildren = []
+
+        #Bodies still being subdivided and the node (local to the level) they sit in
+        active = np.arange(N)
+        local = np.zeros(N, dtype=np.intp)
+        levelStart = 0
+        depth = 0
+
+        while True:
+            center = centers[-1]
+            half = halves[-1]
+            levelSize = center.shape[0]
+
+            #Mass and centre of mass of every node on this level
+            count = np.bincount(local, minlength=levelSize)
+            mass = np.bincount(local, weights=masses[active], minlength=levelSize)
+            com = np.empty((levelSize, dim))
+            for k in range(dim):
+                com[:, k] = np.bincount(local, weights=masses[active] * positions[active, k], minlength=levelSize)
+            hasMass = mass > 0
+            com[hasMass] /= mass[hasMass, np.newaxis]
+            com[~hasMass] = center[~hasMass]
+
+            #Single body nodes keep the body id and its exact position, so the
+            #tree walk can skip self interaction without relying on rounding
+            body = np.full(levelSize, -1, dtype=np.intp)
+            alone = count[local] == 1
+            body[local[alone]] = active[alone]
+            com[local[alone]] = positions[active[alone]]
+
+            nodeMasses.append(mass)
+            nodeComs.append(com)
+            nodeBodies.append(body)
+
+            children = np.full((levelSize, nChild), -1, dtype=np.intp)
+            nodeChildren.append(children)
+
+            #Split every node holding more than one body
+            split = (count > 1)[local] if depth < MAX_DEPTH else np.zeros(active.size, dtype=bool)
+            if not np.any(split):
+                #Leaves still holding several bodies (at MAX_DEPTH) keep their members, grouped by node,
+                #so the walk can sum them one by one and leave the target itself out
+                crowded = count[local] > 1
+                order = np.argsort(local[crowded], kind='stable')
+                members = active[crowded][order]
+                memberCount = np.zeros(levelStart + levelSize, dtype=np.intp)
+                memberCount[levelStart:] = count * (count > 1)
+                break
+
+            active = active[split]
+            parent = local[split]
+            octant = (positions[active] > center[parent]) @ bits
+            childKey, local = np.unique(parent * nChild + octant, return_inverse=True)
+            childParent, childOctant = np.divmod(childKey, nChild)
+
+            #Child ids are numbered after every node of this level
+            levelEnd = levelStart + levelSize
+            children[childParent, childOctant] = levelEnd + np.arange(childKey.size)
+
+            #Child cell geometry
+            signs = np.where((childOctant[:, np.newaxis] & bits) != 0, 1.0, -1.0)
+            childHalf = 0.5 * half[childParent]
+            centers.append(center[childParent] + signs * childHalf[:, np.newaxis])
+            halves.append(childHalf)
+
+            levelStart = levelEnd
+            depth += 1
+
+        self.center = np.concatenate(centers)
+        self.half = np.concatenate(halves)
+        self.mass = np.concatenate(nodeMasses)
+        self.com = np.concatenate(nodeComs)
+        self.body = np.concatenate(nodeBodies)
+        self.children = np.concatenate(nodeChildren)
+        self.is_leaf = np.all(self.children < 0, axis=1)
+        self.depth = depth
+
+        #Bodies of the crowded leaves, members[member_start[n]:member_start[n] + member_count[n]] for node n
+        self.members = members
+        self.member_masses = masses[members]
+        self.member_count = memberCount
+        self.member_start = np.cumsum(memberCount) - memberCount
+
+    def __len__(self):
+        return self.mass.shape[0]
+
+    def accelerations(self, positions, G, theta=0.5, targets=None, softening=0.0):
+        #Walk the tree for every target body at once
+        #A node is used as a point mass when it is a leaf, or when the target is outside
+        #the cell and the cell width over the distance to its centre of mass is below theta
+        #Point masses are Plummer softened like the direct sum, the opening test uses the true distance
+        positions = np.asarray(positions, dtype=float)
+        if targets is None:
+            targets = np.arange(positions.shape[0])
+        nTargets = targets.shape[0]
+        dim = positions.shape[1]
+
+        acc = np.zeros((nTargets, dim))
+        slot = np.arange(nTargets)                                  #Row in acc for each pair
+        node = np.zeros(nTargets, dtype=np.intp)                    #Start everyone at the root
+        theta2 = theta * theta
+        eps2 = float(softening) ** 2
+
+        while slot.size:
+            targetPos = positions[targets[slot]]
+            d = self.com[node] - targetPos
+            r2 = np.einsum('ij,ij->i', d, d)
+
+            width = 2.0 * self.half[node]
+            inside = np.all(np.abs(targetPos - self.center[node]) <= self.half[node, np.newaxis], axis=1)
+            accept = self.is_leaf[node] | (~inside & (width * width < theta2 * r2))
+
+            #Point mass contribution of every accepted node except the target's own leaf
+            crowd = accept & (self.member_count[node] > 0)
+            use = accept & ~crowd & (self.body[node] != targets[slot]) & (r2 > 0)
+            if np.any(use):
+                contrib = (G * self.mass[node[use]] * (r2[use] + eps2) ** -1.5)[:, np.newaxis] * d[use]
+                for k in range(dim):
+                    acc[:, k] += np.bincount(slot[use], weights=contrib[:, k], minlength=nTargets)
+
+            #Crowded leaves are summed body by body, leaving out the target
+            if np.any(crowd):
+                counts = self.member_count[node[crowd]]
+                pairSlot = np.repeat(slot[crowd], counts)
+                offset = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+                member = np.repeat(self.member_start[node[crowd]], counts) + offset
+                body = self.members[member]
+                dm = positions[body] - positions[targets[pairSlot]]
+                rm2 = np.einsum('ij,ij->i', dm, dm)
+                other = (body != targets[pairSlot]) & (rm2 > 0)
+                contrib = (G * self.member_masses[member[other]] * (rm2[other] + eps2) ** -1.5)[:, np.newaxis] * dm[other]
+                for k in range(dim):
+                    acc[:, k] += np.bincount(pairSlot[other], weights=contrib[:, k], minlength=nTargets)
+
+            #Open the rest and descend into their children
+            opened = ~accept
+            kids = self.children[node[opened]]
+            exists = kids >= 0
+            slot = np.repeat(slot[opened], np.count_nonzero(exists, axis=1))
+            node = kids[exists]
+
+        return acc
+
+
+#Approximate gravitational acceleration on every body using a Barnes-Hut tree
+#theta = 0 reproduces the direct sum, larger values trade accuracy for speed
+def barnes_hut_accelerations(positions, masses, G, theta=0.5, targets=None, softening=0.0):
+    tree = BarnesHutTree(positions, masses)
+    return tree.accelerations(positions, G, theta, targets, softening)
@@ -0,0 +1,99 @@
+import os
+import numpy as np
+from Utils.NBody import NBodySystem
+from Utils.Collisions import CollisionHandler
+
+#Full simulation state in one .npz file
+#Keys: state (time, positions, velocities, masses, G, backend, theta, softening, integrator), "collisions/..."
+#for a collision handler (radii, merge, cell_size, ids), "trails/..." for a TrailManager and "run/..." for
+#anything the caller needs to continue (step counters, settings)
+#softening, integrator and collisions came later within version 1, older files restore with no softening,
+#Verlet and no collision handler
+CHECKPOINT_VERSION = 1
+
+
+#Write a checkpoint atomically: the file at path is always either the old or the new checkpoint
+#The data goes to a temporary file in the same directory, is fsynced, then renamed over path
+def save_checkpoint(path, system, trails=None, **run):
+    arrays = {
+        'version': np.array(CHECKPOINT_VERSION),
+        'time': np.array(system.sim_time),
+        'positions': system.positions,
+        'velocities': system.velocities,
+        'masses': system.masses,
+        'G': np.array(system.G),
+        'backend': np.array(system.backend),
+        'theta': np.array(system.theta),
+        'softening': np.array(system.softening),
+        'integrator': np.array(system.integrator.name),
+    }
+    handler = system.collisions
+    if handler is not None:
+        arrays.update({
+            'collisions/radii': handler.radii,
+            'collisions/merge': np.array(handler.merge),
+            'collisions/cell_size': np.array(np.nan if handler.cell_size is None else handler.cell_size),
+            'collisions/ids': np.arange(len(system)) if handler.ids is None else handler.ids,
+        })
+    if trails is not None:
+        arrays.update((f'trails/{key}', value) for key, value in trails.get_state().items())
+    arrays.update((f'run/{key}', np.asarray(value)) for key, value in run.items())
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    temporary = f"{path}.tmp"
+    with open(temporary, 'wb') as file:
+        np.savez(file, **arrays)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+
+    #Persist the rename itself, not possible (or needed) on Windows
+    if hasattr(os, 'O_DIRECTORY'):
+        handle = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(handle)
+        finally:
+            os.close(handle)
+    return path
+
+#Read a checkpoint into a plain dictionary of arrays
+def load_checkpoint(path):
+    with np.load(path) as data:
+        checkpoint = {key: data[key] for key in data.files}
+    if int(checkpoint['version']) != CHECKPOINT_VERSION:
+        raise ValueError(f"unsupported checkpoint version {int(checkpoint['version'])}")
+    return checkpoint
+
+#Rebuild the NBodySystem, engine settings override the saved backend / theta / softening / integrator / collisions
+#Integrator settings other than the name (tolerances, eta) are not saved, nor are past collision events
+def restore_system(checkpoint, **engine):
+    settings = {'backend': str(checkpoint['backend']), 'theta': float(checkpoint['theta']),
+                'softening': float(checkpoint.get('softening', 0.0)), 'integrator': str(checkpoint.get('integrator', 'verlet')),
+                'collisions': restore_collisions(checkpoint)}
+    settings.update(engine)
+    system = NBodySystem(checkpoint['positions'], checkpoint['velocities'], checkpoint['masses'], G=float(checkpoint['G']), **settings)
+    system.sim_time = float(checkpoint['time'])
+    return system
+
+#The saved collision handler with its merged radii and body ids, None when the checkpoint has none
+def restore_collisions(checkpoint):
+    if 'collisions/radii' not in checkpoint:
+        return None
+    cellSize = float(checkpoint['collisions/cell_size'])
+    handler = CollisionHandler(checkpoint['collisions/radii'], merge=bool(checkpoint['collisions/merge']),
+                               cell_size=None if np.isnan(cellSize) else cellSize)
+    handler.ids = checkpoint['collisions/ids'].astype(np.int64)
+    return handler
+
+#Load the saved trails into an existing TrailManager, False when the checkpoint has none
+def restore_trails(checkpoint, trails):
+    state = {key[len('trails/'):]: value for key, value in checkpoint.items() if key.startswith('trails/')}
+    if not state:
+        return False
+    trails.set_state(state)
+    return True
+
+#The "run/..." entries as a dictionary, scalars come back as Python numbers and strings
+def run_settings(checkpoint):
+    return {key[len('run/'):]: value.item() if value.ndim == 0 else value for key, value in checkpoint.items() if key.startswith('run/')}
@@ -0,0 +1,198 @@
+from functools import lru_cache
+import numpy as np
+
+#Collision detection and mergers for NBodySystem
+#Bodies are spheres of given radii. Candidate pairs come from a uniform grid spatial hash: every
+#body goes into the cell of side cell_size it sits in, cells are hashed into a table of about 2N
+#buckets, and only bodies in the same or a neighbouring cell's bucket are compared. With cell_size
+#at least the largest contact distance every touching pair is found, and the work stays near O(N)
+#as long as the bodies aren't all packed into a few cells. Hash clashes only add candidates, the
+#exact distance test removes them. Scenes of a few bodies skip the hash and test every pair.
+
+#Large odd primes for the cell hash (Teschner et al. 2003)
+HASH_PRIMES = np.array([73856093, 19349663, 83492791], dtype=np.int64)
+
+#Up to this many bodies every pair is tested directly, the hash costs more than it saves
+DIRECT_PAIRS_MAX_BODIES = 64
+
+
+#Bucket of every cell, cells is (n, dim) integer coordinates, mask is table size - 1
+def hash_cells(cells, mask):
+    keys = cells[:, 0] * HASH_PRIMES[0]
+    for k in range(1, cells.shape[1]):
+        keys = np.bitwise_xor(keys, cells[:, k] * HASH_PRIMES[k])
+    return np.bitwise_and(keys, mask)
+
+#(0, ..., 0) followed by half of the 3^dim - 1 offsets to the neighbouring cells, one of each
+#opposite pair, so every pair of neighbouring cells is visited from one side only
+def neighbour_offsets(dim):
+    offsets = np.stack(np.meshgrid(*([np.arange(-1, 2)] * dim), indexing='ij'), axis=-1).reshape(-1, dim)
+    return offsets[len(offsets) // 2:]
+
+
+#Pairs (i < j) of bodies closer than radii[i] + radii[j], shape (P, 2), sorted
+#cell_size defaults to twice the largest radius
+def find_collisions(positions, radii, cell_size=None):
+    positions = np.asarray(positions, dtype=float)
+    radii = np.broadcast_to(np.asarray(radii, dtype=float), positions.shape[:1])
+    N = positions.shape[0]
+    if N < 2:
+        return np.empty((0, 2), dtype=np.int64)
+    if N <= DIRECT_PAIRS_MAX_BODIES:
+        pairs = all_pairs(N)
+    else:
+        pairs = candidate_pairs(positions, radii, cell_size)
+
+    #Exact test
+    diff = positions[pairs[:, 1]] - positions[pairs[:, 0]]
+    reach = radii[pairs[:, 0]] + radii[pairs[:, 1]]
+    return pairs[np.einsum('ij,ij->i', diff, diff) < reach * reach]
+
+#Every pair (i < j) of N bodies, shape (N (N - 1) / 2, 2), sorted and read only
+#Cached, a two body scene asks for the same single pair after every step
+@lru_cache(maxsize=None)
+def all_pairs(N):
+    pairs = np.stack(np.triu_indices(N, k=1), axis=1).astype(np.int64)
+    pairs.setflags(write=False)
+    return pairs
+
+#Pairs (i < j) sharing a bucket of the spatial hash or a neighbouring cell's bucket, shape (P, 2), sorted
+def candidate_pairs(positions, radii, cell_size=None):
+    N, dim = positions.shape
+    cell_size = 2.0 * radii.max() if cell_size is None else float(cell_size)
+    if cell_size <= 0:
+        return np.empty((0, 2), dtype=np.int64)
+
+    #Hash table of the bodies, sorted by bucket so each bucket is a contiguous run of order
+    tableSize = 1 << int(2 * N - 1).bit_length()
+    cells = np.floor(positions / cell_size).astype(np.int64)
+    buckets = hash_cells(cells, tableSize - 1)
+    order = np.argsort(buckets, kind='stable')
+    bucketCounts = np.bincount(buckets, minlength=tableSize)
+    bucketStarts = np.cumsum(bucketCounts) - bucketCounts
+
+    candidates = []
+    for offset in neighbour_offsets(dim):
+        #Run of bodies in the bucket of each body's neighbouring cell
+        query = hash_cells(cells + offset, tableSize - 1)
+        start = bucketStarts[query]
+        counts = bucketCounts[query]
+        total = int(counts.sum())
+        if total == 0:
+            continue
+
+        #Expand to one (i, j) per body in that run, within a cell each pair once
+        i = np.repeat(np.arange(N), counts)
+        within = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        j = order[np.repeat(start, counts) + within]
+        keep = i < j if not offset.any() else i != j
+        i, j = i[keep], j[keep]
+        candidates.append(np.minimum(i, j) * N + np.maximum(i, j))
+
+    #Pairs found through more than one offset (hash clashes) are counted once
+    keys = np.unique(np.concatenate(candidates)) if candidates else np.empty(0, dtype=np.int64)
+    return np.stack([keys // N, keys % N], axis=1)
+
+#Acceleration of every point from the given source bodies alone, the points must not sit on a source
+def source_accelerations(points, sources, masses, G, softening=0.0):
+    diff = sources[np.newaxis, :, :] - points[:, np.newaxis, :]
+    dist2 = np.einsum('ijk,ijk->ij', diff, diff) + float(softening) ** 2
+    return G * np.einsum('ij,ijk->ik', masses[np.newaxis, :] * dist2 ** -1.5, diff)
+
+#Connected groups of bodies from colliding pairs (a touching b touching c is one group)
+def collision_groups(pairs):
+    parent = {}
+    def root(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in pairs.tolist():
+        parent.setdefault(i, i)
+        parent.setdefault(j, j)
+        a, b = root(i), root(j)
+        if a != b:
+            parent[max(a, b)] = min(a, b)
+
+    groups = {}
+    for i in parent:
+        groups.setdefault(root(i), []).append(i)
+    return [np.array(sorted(group)) for group in sorted(groups.values())]
+
+
+class CollisionHandler:
+    #Checks an NBodySystem for touching bodies after every step (NBodySystem(collisions=...))
+    #merge=True replaces every group of touching bodies by one body at the group's centre of mass with
+    #its total mass and momentum (a perfectly inelastic merger, kinetic energy of the relative motion is
+    #lost), its radius keeps the total volume. merge=False stops the run at the first contact instead,
+    #for scenes where a merger ends the problem (two bodies).
+    def __init__(self, radii, merge=True, cell_size=None):
+        self.radii = np.array(radii, dtype=float, ndmin=1)
+        self.merge = bool(merge)
+        self.cell_size = cell_size
+
+        #(time, group of body indices at that moment) for every merger or contact
+        self.events = []
+
+        #Index every current body had before the first merger, None until then
+        #Mergers keep the bodies in order, so views keyed by the old indices (trails) can follow them
+        self.ids = None
+
+    def contacts(self, system):
+        #Touching pairs at the system's current positions
+        radii = np.broadcast_to(self.radii, (len(system),)) if self.radii.size == 1 else self.radii
+        return find_collisions(system.positions, radii, self.cell_size)
+
+    def resolve(self, system):
+        #Handle contacts after a step, True when the run has to stop at this step
+        pairs = self.contacts(system)
+        if pairs.shape[0] == 0:
+            return False
+
+        groups = collision_groups(pairs)
+        self.events += [(system.sim_time, group) for group in groups]
+        if not self.merge:
+            return True
+        self.merge_groups(system, groups)
+        return False
+
+    def merge_groups(self, system, groups):
+        #Momentum conserving merger of every group into its lowest index body, returns the mask of kept bodies
+        #The step before already evaluated the forces at these positions, so instead of a full refresh the
+        #other bodies swap the pull of each group's members for the merged body's, and only the merged
+        #bodies get a new force evaluation
+        before, beforeMasses = system.positions, system.masses
+        positions = system.positions.copy()
+        velocities = system.velocities.copy()
+        masses = system.masses.copy()
+        radii = np.broadcast_to(self.radii, (len(system),)).copy()
+        keep = np.ones(len(system), dtype=bool)
+        ids = np.arange(len(system)) if self.ids is None else self.ids
+
+        for group in groups:
+            m = masses[group]
+            total = m.sum()
+            first = group[0]
+            positions[first] = m @ positions[group] / total
+            velocities[first] = m @ velocities[group] / total
+            masses[first] = total
+            radii[first] = np.sum(radii[group] ** 3) ** (1.0 / 3.0)
+            keep[group[1:]] = False
+
+        merged = np.array([group[0] for group in groups])
+        members = np.concatenate(groups)
+        others = keep.copy()
+        others[merged] = False
+        accelerations = system.accelerations.copy()
+        accelerations[others] += (source_accelerations(before[others], positions[merged], masses[merged], system.G, system.softening)
+                                  - source_accelerations(before[others], before[members], beforeMasses[members], system.G, system.softening))
+
+        system.set_bodies(positions[keep], velocities[keep], masses[keep], sim_time=system.sim_time, refresh=False)
+        system.accelerations = accelerations[keep]
+        merged = np.cumsum(keep)[merged] - 1
+        system.accelerations[merged] = system.compute_accelerations(system.positions, merged)
+        system.integrator.reset()
+        self.radii = radii[keep]
+        self.ids = ids[keep]
+        return keep
@@ -0,0 +1,123 @@
+import csv
+import time
+import numpy as np
+from Utils.RingBuffer import RingBuffer
+
+#Conserved quantity history of an NBodySystem
+#Every every-th sample() call stores one row (time, total energy, angular momentum, momentum and
+#optionally the specific E / h of one pair) in a fixed size ring buffer, so the history costs the
+#same memory however long the run is. Drift is measured against the first stored row.
+
+
+class Diagnostics:
+    def __init__(self, dim, capacity=10000, every=1, pair=None, log_interval=None, log=print):
+        self.dim = int(dim)
+        self.every = max(1, int(every))
+        self.pair = pair
+
+        #Column names, angular momentum is a scalar (z) in 2D and a vector in 3D
+        self.columns = ['time', 'energy'] + (['Lx', 'Ly', 'Lz'] if self.dim == 3 else ['Lz'])
+        self.columns += ['px', 'py', 'pz'][:self.dim]
+        if pair is not None:
+            self.columns += ['pair_E', 'pair_h']
+        self.index = {name: i for i, name in enumerate(self.columns)}
+
+        self.history = RingBuffer(capacity, len(self.columns))
+        self.reference = None       #First stored row
+        self.calls = 0
+
+        #Rate limited logging, log_interval is in wall clock seconds (None never logs)
+        self.log_interval = log_interval
+        self.log = log
+        self.last_log = None
+
+    def __len__(self):
+        return len(self.history)
+
+    def sample(self, system):
+        #Store a row on every every-th call, returns it (None when skipped)
+        self.calls += 1
+        if (self.calls - 1) % self.every:
+            return None
+
+        row = np.empty(len(self.columns))
+        row[0] = system.sim_time
+        row[1] = system.total_energy()
+        L = system.angular_momentum()
+        end = 3 if self.dim == 3 else 1
+        row[2:2 + end] = L
+        row[2 + end:2 + end + self.dim] = system.momentum()
+        if self.pair is not None:
+            h = system.specific_angular_momentum(*self.pair)
+            row[-2] = system.specific_energy(*self.pair)
+            row[-1] = np.linalg.norm(h) if np.ndim(h) else h
+
+        self.history.append(row)
+        if self.reference is None:
+            self.reference = row.copy()
+        return row
+
+    ##### Queries #####
+    def series(self, name):
+        #One column over the stored history, oldest first (a view, valid until the next sample)
+        return self.history.view()[self.index[name]]
+
+    def latest(self):
+        #Newest row as a dictionary, None before the first sample
+        row = self.history.last()
+        if row is None:
+            return None
+        return dict(zip(self.columns, row.tolist()))
+
+    def drift(self):
+        #Change since the first row: relative for energy, absolute norms for angular momentum and momentum
+        row = self.history.last()
+        if row is None or self.reference is None:
+            return None
+        change = row - self.reference
+        E0 = self.reference[1]
+        end = 3 if self.dim == 3 else 1
+        return {
+            'energy': float(abs(change[1] / E0) if E0 != 0 else abs(change[1])),
+            'angular_momentum': float(np.linalg.norm(change[2:2 + end])),
+            'momentum': float(np.linalg.norm(change[2 + end:2 + end + self.dim])),
+        }
+
+    def maybe_log(self, now=None):
+        #Log one summary line when log_interval has passed since the last one
+        if self.log_interval is None or len(self) == 0:
+            return False
+        now = time.time() if now is None else now
+        if self.last_log is not None and now - self.last_log < self.log_interval:
+            return False
+        self.last_log = now
+
+        latest, drift = self.latest(), self.drift()
+        message = f"Time: {latest['time']:.2f} | |dE/E|: {drift['energy']:.2e}, |dL|: {drift['angular_momentum']:.2e}, |dP|: {drift['momentum']:.2e}"
+        if self.pair is not None:
+            message += f" | E: {latest['pair_E']:.2f}, h: {latest['pair_h']:.2f}"
+        self.log(message)
+        return True
+
+    ##### Export #####
+    def export(self, path):
+        #Stored history to .npz (one array per column) or CSV (anything else)
+        data = self.history.view()
+        if path.endswith('.npz'):
+            np.savez(path, **{name: data[i] for i, name in enumerate(self.columns)})
+            return path
+        with open(path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(self.columns)
+            writer.writerows(data.T.tolist())
+        return path
+
+    def rebase(self):
+        #Measure drift from the next stored row on, keeping the history (after a merger or an edit
+        #changed the conserved quantities on purpose)
+        self.reference = None
+
+    def clear(self):
+        self.history.clear()
+        self.reference = None
+        self.calls = 0
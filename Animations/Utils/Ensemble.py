@@ -0,0 +1,81 @@
+import numpy as np
+from Utils.NBody import cross
+
+class TwoBodyEnsemble:
+    #Many independent two body systems integrated together
+    #positions and velocities are (M, 2, dim), masses (M, 2), G a scalar or (M,)
+    #Each velocity Verlet step is a handful of whole-array operations over all M members
+    def __init__(self, positions, velocities, masses, G=1.0):
+        self.positions = np.array(positions, dtype=float, order='C')
+        self.velocities = np.array(velocities, dtype=float, order='C')
+        self.masses = np.array(masses, dtype=float)
+        self.G = np.broadcast_to(np.asarray(G, dtype=float), self.masses.shape[:1]).copy()
+
+        if self.positions.ndim != 3 or self.positions.shape[1] != 2:
+            raise ValueError("positions must be (M, 2, dim)")
+        if self.positions.shape != self.velocities.shape:
+            raise ValueError("positions and velocities must have the same shape")
+        if self.masses.shape != self.positions.shape[:2]:
+            raise ValueError("masses must be (M, 2)")
+
+        M, _, dim = self.positions.shape
+        self.sim_time = 0.0
+
+        #G * m of the other body in each pair, signed so a = coefficient * r12 / |r12|^3
+        self.pull = self.G[:, np.newaxis] * self.masses[:, ::-1] * np.array([1.0, -1.0])
+
+        #Work buffers
+        self.r12 = np.empty((M, dim))
+        self.dist2 = np.empty(M)
+        self.invDist3 = np.empty(M)
+        self.kick = np.empty((M, 2, dim))
+        self.accelerations = np.empty((M, 2, dim))
+        self.compute_accelerations()
+
+    def __len__(self):
+        return self.positions.shape[0]
+
+    @classmethod
+    def from_arrays(cls, r1, v1, m1, r2, v2, m2, G=1.0):
+        #Build from per-body arrays, r and v are (M, dim), m is (M,)
+        return cls(np.stack([r1, r2], axis=1), np.stack([v1, v2], axis=1), np.stack([m1, m2], axis=1), G)
+
+    def compute_accelerations(self):
+        #Accelerations of both bodies in every member, written into self.accelerations
+        np.subtract(self.positions[:, 1], self.positions[:, 0], out=self.r12)
+        np.einsum('ij,ij->i', self.r12, self.r12, out=self.dist2)
+        np.power(self.dist2, -1.5, out=self.invDist3)
+        np.multiply(self.pull[:, :, np.newaxis], self.r12[:, np.newaxis, :], out=self.accelerations)
+        self.accelerations *= self.invDist3[:, np.newaxis, np.newaxis]
+        return self.accelerations
+
+    def step(self, dt):
+        #Velocity Verlet over the whole ensemble, in place
+        np.multiply(self.accelerations, 0.5 * dt, out=self.kick)
+        self.velocities += self.kick
+        np.multiply(self.velocities, dt, out=self.kick)
+        self.positions += self.kick
+        self.compute_accelerations()
+        np.multiply(self.accelerations, 0.5 * dt, out=self.kick)
+        self.velocities += self.kick
+        self.sim_time += dt
+
+    def advance(self, dt, steps):
+        for _ in range(int(steps)):
+            self.step(dt)
+
+    ##### Diagnostics, one value per member #####
+    def relative_state(self):
+        return self.positions[:, 1] - self.positions[:, 0], self.velocities[:, 1] - self.velocities[:, 0]
+
+    def separation(self):
+        return np.linalg.norm(self.positions[:, 1] - self.positions[:, 0], axis=1)
+
+    def specific_energy(self):
+        r12, v12 = self.relative_state()
+        mu = self.G * np.sum(self.masses, axis=1)
+        return 0.5 * np.einsum('ij,ij->i', v12, v12) - mu / np.linalg.norm(r12, axis=1)
+
+    def specific_angular_momentum(self):
+        r12, v12 = self.relative_state()
+        return cross(r12, v12)
@@ -0,0 +1,337 @@
+from functools import partial
+import numpy as np
+
+#Integrators for NBodySystem
+#Every integrator advances a system by exactly dt per step(system, dt) call, adaptive ones split
+#that interval into as many substeps as they need. Forces always come from
+#system.compute_accelerations(positions, targets=None), so any force backend works with any integrator.
+#An integrator may keep state between calls (step size, timescales), reset() drops it after the
+#system state was edited by hand.
+
+
+class VelocityVerlet:
+    #Second order kick-drift-kick leapfrog, one force evaluation per step
+    name = 'verlet'
+
+    def reset(self):
+        pass
+
+    def step(self, system, dt):
+        system.velocities += (0.5 * dt) * system.accelerations          #Half kick
+        system.positions += dt * system.velocities                       #Drift
+        system.accelerations = system.compute_accelerations(system.positions)
+        system.velocities += (0.5 * dt) * system.accelerations          #Half kick
+
+
+class SymplecticComposition:
+    #Higher order symplectic scheme built from Verlet substeps of weight w * dt (Yoshida 1990)
+    #Negative weights step backwards in time, the error terms of the substeps cancel to the
+    #order of the composition. One force evaluation per substep.
+    def __init__(self, name, weights):
+        self.name = name
+        self.weights = tuple(float(w) for w in weights)
+
+    def reset(self):
+        pass
+
+    def step(self, system, dt):
+        for w in self.weights:
+            h = w * dt
+            system.velocities += (0.5 * h) * system.accelerations
+            system.positions += h * system.velocities
+            system.accelerations = system.compute_accelerations(system.positions)
+            system.velocities += (0.5 * h) * system.accelerations
+
+
+class ForestRuth:
+    #Fourth order Forest-Ruth scheme in its kick first (velocity) form
+    #The first kick uses system.accelerations and the force at the end of the step carries over to the
+    #next one like in Verlet, so a step costs three force evaluations (the drift first form needs four
+    #to leave system.accelerations valid). The same update as 'yoshida4', written out as one step.
+    name = 'forest_ruth'
+
+    THETA = 1.0 / (2.0 - 2.0 ** (1.0 / 3.0))
+    KICKS = (THETA / 2, (1 - THETA) / 2, (1 - THETA) / 2, THETA / 2)
+    DRIFTS = (THETA, 1 - 2 * THETA, THETA)
+
+    def reset(self):
+        pass
+
+    def step(self, system, dt):
+        system.velocities += (self.KICKS[0] * dt) * system.accelerations
+        for drift, kick in zip(self.DRIFTS, self.KICKS[1:]):
+            system.positions += (drift * dt) * system.velocities
+            system.accelerations = system.compute_accelerations(system.positions)
+            system.velocities += (kick * dt) * system.accelerations
+
+
+#Triple jump weights for 4th order, and Yoshida's solution A for 6th order
+CBRT2 = 2.0 ** (1.0 / 3.0)
+YOSHIDA4_WEIGHTS = (1 / (2 - CBRT2), -CBRT2 / (2 - CBRT2), 1 / (2 - CBRT2))
+YOSHIDA6_OUTER = (0.784513610477560, 0.235573213359357, -1.17767998417887)
+YOSHIDA6_WEIGHTS = YOSHIDA6_OUTER + (1 - 2 * sum(YOSHIDA6_OUTER),) + YOSHIDA6_OUTER[::-1]
+
+
+class DormandPrince:
+    #Adaptive Runge-Kutta 5(4) with the embedded error estimate of Dormand and Prince
+    #The error of each substep is measured against rtol * the largest position / velocity component
+    #(plus atol), substeps above tolerance are retried with a smaller size. The last stage is the
+    #acceleration at the new positions, so accepted substeps cost six force evaluations.
+    name = 'rk45'
+
+    C = np.array([0.0, 1 / 5, 3 / 10, 4 / 5, 8 / 9, 1.0, 1.0])
+    A = np.array([
+        [0.0, 0.0, 0.0, 0.0, 0.0, 0.0],
+        [1 / 5, 0.0, 0.0, 0.0, 0.0, 0.0],
+        [3 / 40, 9 / 40, 0.0, 0.0, 0.0, 0.0],
+        [44 / 45, -56 / 15, 32 / 9, 0.0, 0.0, 0.0],
+        [19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729, 0.0, 0.0],
+        [9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656, 0.0],
+        [35 / 384, 0.0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84],
+    ])
+    #Fifth order weights minus the embedded fourth order weights
+    E = np.array([71 / 57600, 0.0, -71 / 16695, 71 / 1920, -17253 / 339200, 22 / 525, -1 / 40])
+
+    def __init__(self, rtol=1e-9, atol=1e-12, safety=0.9, min_factor=0.2, max_factor=5.0, max_substeps=1000000):
+        self.rtol = float(rtol)
+        self.atol = float(atol)
+        self.safety = float(safety)
+        self.min_factor = float(min_factor)
+        self.max_factor = float(max_factor)
+        self.max_substeps = int(max_substeps)
+        self.reset()
+
+        #Counters
+        self.accepted = 0
+        self.rejected = 0
+
+    def reset(self):
+        self.h = None           #Substep size carried over to the next call
+
+    def _attempt(self, system, h, kx, kv):
+        #One trial substep from the current state, returns (positions, velocities, error ratio)
+        x0, v0 = system.positions, system.velocities
+        kx[0] = v0
+        kv[0] = system.accelerations
+        for stage in range(1, 7):
+            weights = h * self.A[stage, :stage]
+            kx[stage] = v0 + np.tensordot(weights, kv[:stage], axes=1)
+            positions = x0 + np.tensordot(weights, kx[:stage], axes=1)
+            kv[stage] = system.compute_accelerations(positions)
+
+        #Stage 7 sits at the fifth order solution
+        velocities = kx[6]
+        errorX = h * np.tensordot(self.E, kx, axes=1)
+        errorV = h * np.tensordot(self.E, kv, axes=1)
+        scaleX = self.atol + self.rtol * max(np.max(np.abs(x0)), np.max(np.abs(positions)))
+        scaleV = self.atol + self.rtol * max(np.max(np.abs(v0)), np.max(np.abs(velocities)))
+        error = max(np.max(np.abs(errorX)) / scaleX, np.max(np.abs(errorV)) / scaleV)
+        return positions, velocities, error
+
+    def step(self, system, dt):
+        kx = np.empty((7,) + system.positions.shape)
+        kv = np.empty_like(kx)
+
+        remaining = dt
+        substeps = 0
+        h = self.h if self.h is not None else dt
+        while remaining > 0:
+            clipped = h >= remaining
+            trial = remaining if clipped else h
+            positions, velocities, error = self._attempt(system, trial, kx, kv)
+
+            #Step size controller, fifth order error scales as h^5
+            factor = self.safety * error ** -0.2 if error > 0 else self.max_factor
+            factor = min(self.max_factor, max(self.min_factor, factor))
+
+            if error <= 1.0:
+                system.positions[:] = positions
+                system.velocities[:] = velocities
+                system.accelerations = kv[6].copy()
+                remaining = remaining - trial if not clipped else 0.0
+                self.accepted += 1
+                #A clipped final substep says little about the size to use next time
+                h = max(h, trial * factor) if clipped else trial * factor
+            else:
+                self.rejected += 1
+                h = trial * factor
+
+            substeps += 1
+            if substeps > self.max_substeps:
+                raise RuntimeError(f"rk45 needed more than {self.max_substeps} substeps, the orbit is probably singular")
+        self.h = h
+
+
+class BlockTimestep:
+    #Hierarchical block time steps with kick-drift-kick leapfrog
+    #Each body steps with dt / 2^level, levels come from its acceleration timescale |a| / |da/dt|
+    #(eta times that is the wanted step). Bodies move to a longer step only where the block boundaries
+    #line up, so every step ends exactly at the end of dt. Only the bodies finishing a step get their
+    #accelerations evaluated, so close pairs take many small steps while the rest take few.
+    name = 'block'
+
+    def __init__(self, eta=0.02, max_level=20):
+        self.eta = float(eta)
+        self.max_level = int(max_level)
+        self.reset()
+
+        #Counters
+        self.evaluations = 0        #Single body force evaluations
+
+    def reset(self):
+        self.timescale = None       #|a| / |da/dt| per body from the last step
+
+    def _levels(self, dt, timescale):
+        #Smallest level whose step is at most eta * timescale
+        with np.errstate(divide='ignore', invalid='ignore'):
+            wanted = np.ceil(np.log2(dt / (self.eta * timescale)))
+        return np.clip(np.nan_to_num(wanted, nan=0.0, posinf=self.max_level, neginf=0.0), 0, self.max_level).astype(np.int64)
+
+    def _probe(self, system, dt):
+        #Acceleration timescale from the change of a along a short drift, da/dt = grad(a) . v
+        h = 1e-6 * dt
+        change = system.compute_accelerations(system.positions + h * system.velocities) - system.accelerations
+        return timescale(system.accelerations, change / h)
+
+    def step(self, system, dt):
+        L = self.max_level
+        ticks = 1 << L                                                #Finest step is dt / 2^L
+        tick = dt / ticks
+
+        if self.timescale is None:
+            self.timescale = self._probe(system, dt)
+        level = self._levels(dt, self.timescale)
+        length = np.left_shift(1, L - level)                          #Step length of every body in ticks
+        end = length.copy()                                           #Tick where each body's step ends
+        startAcc = system.accelerations.copy()
+
+        #Opening half kicks
+        system.velocities += (0.5 * tick * length)[:, np.newaxis] * system.accelerations
+
+        now = 0
+        while now < ticks:
+            nextTick = int(end.min())
+            system.positions += ((nextTick - now) * tick) * system.velocities
+            now = nextTick
+
+            #Closing half kick for the bodies finishing a step
+            active = np.flatnonzero(end == now)
+            acc = system.compute_accelerations(system.positions, active)
+            self.evaluations += active.size
+            system.velocities[active] += (0.5 * tick * length[active])[:, np.newaxis] * acc
+            self.timescale[active] = timescale(acc, (acc - startAcc[active]) / (tick * length[active])[:, np.newaxis])
+            system.accelerations[active] = acc
+            if now == ticks:
+                break
+
+            #New levels, a longer step only when this tick is a boundary of it
+            newLevel = self._levels(dt, self.timescale[active])
+            aligned = now % np.left_shift(1, L - newLevel) == 0
+            while not np.all(aligned):
+                newLevel[~aligned] += 1
+                aligned = now % np.left_shift(1, L - newLevel) == 0
+            length[active] = np.left_shift(1, L - newLevel)
+            end[active] = now + length[active]
+            startAcc[active] = acc
+
+            #Opening half kick of the next step
+            system.velocities[active] += (0.5 * tick * length[active])[:, np.newaxis] * acc
+
+
+#|a| / |da/dt| per body, infinite where the acceleration does not change
+def timescale(acc, jerk):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.linalg.norm(acc, axis=-1) / np.linalg.norm(jerk, axis=-1)
+
+
+class LogHLeapfrog:
+    #Time transformed leapfrog of the logarithmic Hamiltonian (Mikkola & Tanikawa 1999, Preto & Tremaine 1999)
+    #Drift-kick-drift substeps are equal in a fictitious time s with dt = ds / U, U the (positive) potential
+    #energy, so the physical substep shrinks as bodies close in and grows again after, without a global
+    #dt reduction. For two bodies every substep lands on the exact Kepler orbit whatever its size (only
+    #the timing along it has an error), so very eccentric or tight binaries pass periapsis without an
+    #energy blowup. The last substep of a call is shortened in s so it ends exactly at dt.
+    #Each substep costs a force evaluation and an O(N^2) potential sum, plus one force evaluation per call
+    #for system.accelerations, so this is meant for few body scenes. The fictitious step is fixed on the
+    #first call to dt * <U> / substeps and kept until reset(), <U> = -2E by the virial theorem for bound
+    #systems (U now otherwise), so substeps is the number per dt on average over an orbit.
+    name = 'logh'
+
+    def __init__(self, substeps=4, max_substeps=1000000):
+        self.substeps = int(substeps)
+        self.max_substeps = int(max_substeps)
+        self.verlet = VelocityVerlet()
+        self.reset()
+
+        #Counters
+        self.taken = 0          #Substeps over all calls
+
+    def reset(self):
+        self.ds = None          #Fictitious time step
+
+    def _substep(self, system, ds, B):
+        #One substep of size ds from the current state, returns (positions, velocities, physical length)
+        #B = -E is conserved along the flow, so T + B = U and the drifts take the time ds / (2U) each
+        first = 0.5 * ds / (system.kinetic_energy() + B)
+        positions = system.positions + first * system.velocities
+        U = -system.potential_energy(positions)
+        velocities = system.velocities + (ds / U) * system.compute_accelerations(positions)
+        kinetic = 0.5 * np.sum(system.masses * np.einsum('ij,ij->i', velocities, velocities))
+        second = 0.5 * ds / (kinetic + B)
+        return positions + second * velocities, velocities, first + second
+
+    def step(self, system, dt):
+        U = -system.potential_energy()
+        if U <= 0:
+            self.verlet.step(system, dt)                #Nothing bound, nothing to regularize
+            return
+
+        B = U - system.kinetic_energy()
+        if self.ds is None:
+            self.ds = dt * (2.0 * B if B > 0 else U) / self.substeps
+
+        remaining = dt
+        substeps = 0
+        while remaining > 0:
+            ds = self.ds
+            positions, velocities, h = self._substep(system, ds, B)
+            if h >= remaining:
+                #Last substep, the ds whose length is the time left (fixed point of ds = ds * remaining / h)
+                for _ in range(50):
+                    ds, previous = ds * remaining / h, ds
+                    positions, velocities, h = self._substep(system, ds, B)
+                    if abs(ds - previous) <= 1e-12 * ds:
+                        break
+                h = remaining
+
+            system.positions[:] = positions
+            system.velocities[:] = velocities
+            remaining -= h
+
+            substeps += 1
+            if substeps > self.max_substeps:
+                raise RuntimeError(f"logh needed more than {self.max_substeps} substeps, the orbit is probably singular")
+        self.taken += substeps
+        system.accelerations = system.compute_accelerations(system.positions)
+
+
+INTEGRATORS = {
+    'verlet': VelocityVerlet,
+    'yoshida4': partial(SymplecticComposition, 'yoshida4', YOSHIDA4_WEIGHTS),
+    'yoshida6': partial(SymplecticComposition, 'yoshida6', YOSHIDA6_WEIGHTS),
+    'forest_ruth': ForestRuth,
+    'rk45': DormandPrince,
+    'block': BlockTimestep,
+    'logh': LogHLeapfrog,
+}
+
+#Fixed step symplectic schemes, all share the force callback and cost len(weights) evaluations per step
+SYMPLECTIC = ('verlet', 'yoshida4', 'yoshida6', 'forest_ruth')
+
+#Integrator from a name (with settings) or an already built integrator
+def make_integrator(integrator='verlet', **settings):
+    if not isinstance(integrator, str):
+        return integrator
+    if integrator not in INTEGRATORS:
+        raise ValueError(f"unknown integrator '{integrator}', expected one of {tuple(INTEGRATORS)}")
+    return INTEGRATORS[integrator](**settings)
@@ -0,0 +1,166 @@
+import numpy as np
+
+#Closed form two body propagation
+#The relative orbit r = r2 - r1 is a fixed conic around the centre of mass, so its state at any time
+#follows from the orbital elements and Kepler's equation, with no integration in between
+
+#Newton iteration limits for Kepler's equation
+KEPLER_TOLERANCE = 1e-14
+KEPLER_MAX_ITERATIONS = 50
+
+#Orbits this close to parabolic are not handled (a and the anomalies blow up)
+PARABOLIC_TOLERANCE = 1e-9
+
+
+#Eccentric anomaly E from mean anomaly M, solves M = E - e sin(E) for e < 1
+#M can be any array, e a scalar or an array that broadcasts with it
+def solve_kepler(M, e):
+    M = np.asarray(M, dtype=float)
+    e = np.asarray(e, dtype=float)
+
+    #Work in [-pi, pi) and add the whole turns back at the end, keeps the anomaly continuous in time
+    turns = np.floor((M + np.pi) / (2 * np.pi))
+    m = M - 2 * np.pi * turns
+
+    #Danby's starter converges for every e < 1
+    E = m + 0.85 * e * np.sign(np.sin(m))
+    for _ in range(KEPLER_MAX_ITERATIONS):
+        correction = (E - e * np.sin(E) - m) / (1.0 - e * np.cos(E))
+        E = E - correction
+        if np.all(np.abs(correction) < KEPLER_TOLERANCE):
+            break
+    return E + 2 * np.pi * turns
+
+#Hyperbolic anomaly H from mean anomaly M, solves M = e sinh(H) - H for e > 1
+def solve_kepler_hyperbolic(M, e):
+    M = np.asarray(M, dtype=float)
+    e = np.asarray(e, dtype=float)
+
+    H = np.sign(M) * np.log(2 * np.abs(M) / e + 1.8)
+    for _ in range(KEPLER_MAX_ITERATIONS):
+        correction = (e * np.sinh(H) - H - M) / (e * np.cosh(H) - 1.0)
+        H = H - correction
+        if np.all(np.abs(correction) < KEPLER_TOLERANCE * np.maximum(1.0, np.abs(H))):
+            break
+    return H
+
+
+class KeplerOrbit:
+    #Relative orbit of a two body pair from its state (r, v) at time t0, 2D or 3D
+    #mu = G (m1 + m2). E and h are the specific energy and angular momentum, the same quantities
+    #NBodySystem.specific_energy / specific_angular_momentum report
+    def __init__(self, r, v, mu, t0=0.0):
+        r = np.array(r, dtype=float)
+        v = np.array(v, dtype=float)
+        self.mu = float(mu)
+        self.t0 = float(t0)
+        self.dim = r.shape[0]
+
+        #Conserved quantities
+        radius = np.linalg.norm(r)
+        self.E = 0.5 * (v @ v) - self.mu / radius
+        if self.dim == 3:
+            hVector = np.cross(r, v)
+            self.h = np.linalg.norm(hVector)
+        else:
+            self.h = r[0] * v[1] - r[1] * v[0]
+
+        #Eccentricity vector points at periapsis
+        eVector = ((v @ v - self.mu / radius) * r - (r @ v) * v) / self.mu
+        self.e = np.linalg.norm(eVector)
+        if abs(self.e - 1.0) < PARABOLIC_TOLERANCE or self.E == 0:
+            raise ValueError("parabolic orbits are not supported")
+        self.a = -self.mu / (2 * self.E)
+        self.elliptic = self.e < 1.0
+
+        #Perifocal frame: P towards periapsis, Q 90 degrees ahead in the direction of motion
+        self.P = eVector / self.e if self.e > 0 else r / radius
+        if self.dim == 3:
+            self.Q = np.cross(hVector / self.h, self.P)
+        else:
+            self.Q = np.sign(self.h) * np.array([-self.P[1], self.P[0]])
+
+        #Mean motion and the mean anomaly at t0, from the position in the perifocal frame
+        #(this stays consistent with P even when e is tiny and its direction is noisy)
+        self.n = np.sqrt(self.mu / abs(self.a) ** 3)
+        x0, y0 = r @ self.P, r @ self.Q
+        if self.elliptic:
+            self.b = self.a * np.sqrt(1.0 - self.e ** 2)
+            E0 = np.arctan2(y0 / self.b, x0 / self.a + self.e)
+            self.M0 = E0 - self.e * np.sin(E0)
+        else:
+            self.b = -self.a * np.sqrt(self.e ** 2 - 1.0)
+            H0 = np.arcsinh(y0 / self.b)
+            self.M0 = self.e * np.sinh(H0) - H0
+
+    @classmethod
+    def from_system(cls, system, i=0, j=1):
+        #Relative orbit of bodies i and j of an NBodySystem at its current time
+        r12, v12 = system.relative_state(i, j)
+        return cls(r12, v12, system.G * (system.masses[i] + system.masses[j]), system.sim_time)
+
+    @property
+    def period(self):
+        return 2 * np.pi / self.n if self.elliptic else np.inf
+
+    @property
+    def periapsis(self):
+        return self.a * (1.0 - self.e)
+
+    @property
+    def apoapsis(self):
+        return self.a * (1.0 + self.e) if self.elliptic else np.inf
+
+    def anomaly(self, t):
+        #Eccentric (elliptic) or hyperbolic anomaly at times t
+        M = self.M0 + self.n * (np.asarray(t, dtype=float) - self.t0)
+        if self.elliptic:
+            return solve_kepler(M, self.e)
+        return solve_kepler_hyperbolic(M, self.e)
+
+    def state(self, t):
+        #Relative position and velocity at times t, shapes t.shape + (dim,)
+        anomaly = self.anomaly(t)
+        if self.elliptic:
+            cos, sin = np.cos(anomaly), np.sin(anomaly)
+            x, y = self.a * (cos - self.e), self.b * sin
+            radius = self.a * (1.0 - self.e * cos)
+            rate = np.sqrt(self.mu * self.a) / radius
+            vx, vy = -rate * sin, rate * (self.b / self.a) * cos
+        else:
+            cosh, sinh = np.cosh(anomaly), np.sinh(anomaly)
+            x, y = self.a * (cosh - self.e), self.b * sinh
+            radius = self.a * (1.0 - self.e * cosh)
+            rate = np.sqrt(-self.mu * self.a) / radius
+            vx, vy = -rate * sinh, -rate * (self.b / self.a) * cosh
+
+        positions = x[..., np.newaxis] * self.P + y[..., np.newaxis] * self.Q
+        velocities = vx[..., np.newaxis] * self.P + vy[..., np.newaxis] * self.Q
+        return positions, velocities
+
+
+class TwoBodyPropagator:
+    #Both bodies of a two body pair: the Kepler orbit for their separation plus the centre of mass
+    #moving in a straight line
+    def __init__(self, r1, v1, m1, r2, v2, m2, G, t0=0.0):
+        r1, v1, r2, v2 = (np.asarray(x, dtype=float) for x in (r1, v1, r2, v2))
+        total = m1 + m2
+        self.fraction1 = m2 / total         #Body 1 sits -m2 / M of the separation from the centre of mass
+        self.fraction2 = m1 / total
+        self.com = (m1 * r1 + m2 * r2) / total
+        self.comVelocity = (m1 * v1 + m2 * v2) / total
+        self.orbit = KeplerOrbit(r2 - r1, v2 - v1, G * total, t0)
+
+    @classmethod
+    def from_system(cls, system, i=0, j=1):
+        return cls(system.positions[i], system.velocities[i], system.masses[i],
+                   system.positions[j], system.velocities[j], system.masses[j], system.G, system.sim_time)
+
+    def state(self, t):
+        #Positions and velocities of both bodies at times t, shapes t.shape + (2, dim)
+        t = np.asarray(t, dtype=float)
+        r12, v12 = self.orbit.state(t)
+        com = self.com + (t - self.orbit.t0)[..., np.newaxis] * self.comVelocity
+        positions = np.stack([com - self.fraction1 * r12, com + self.fraction2 * r12], axis=-2)
+        velocities = np.stack([self.comVelocity - self.fraction1 * v12, self.comVelocity + self.fraction2 * v12], axis=-2)
+        return positions, velocities
@@ -0,0 +1,97 @@
+import numpy as np
+
+#Numba is optional, the compiled kernel is only used when it is installed
+try:
+    import numba
+except ImportError:
+    numba = None
+
+HAVE_NUMBA = numba is not None
+
+
+#Direct sum accelerations written as plain loops, compiled by Numba when available
+#eps2 is the squared Plummer softening length (0 for point masses)
+def _direct_accelerations_loops(positions, masses, G, eps2, out):
+    N, dim = positions.shape
+    out[:, :] = 0.0
+    for i in range(N):
+        for j in range(i + 1, N):
+            dist2 = eps2
+            for k in range(dim):
+                d = positions[j, k] - positions[i, k]
+                dist2 += d * d
+            invDist3 = 1.0 / (dist2 * np.sqrt(dist2))
+            for k in range(dim):
+                d = (positions[j, k] - positions[i, k]) * invDist3
+                out[i, k] += G * masses[j] * d
+                out[j, k] -= G * masses[i] * d
+
+#K velocity Verlet steps in place, accelerations must hold the values at the current positions
+def _verlet_steps_loops(positions, velocities, accelerations, masses, G, eps2, dt, steps):
+    N, dim = positions.shape
+    halfDt = 0.5 * dt
+    for _ in range(steps):
+        for i in range(N):
+            for k in range(dim):
+                velocities[i, k] += halfDt * accelerations[i, k]
+                positions[i, k] += dt * velocities[i, k]
+        _direct_accelerations_loops(positions, masses, G, eps2, accelerations)
+        for i in range(N):
+            for k in range(dim):
+                velocities[i, k] += halfDt * accelerations[i, k]
+
+#nogil lets a physics worker thread run the kernel while the GUI thread keeps drawing
+if HAVE_NUMBA:
+    _direct_accelerations_loops = numba.njit(cache=True, nogil=True)(_direct_accelerations_loops)
+    _verlet_steps_loops = numba.njit(cache=True, nogil=True)(_verlet_steps_loops)
+
+
+class DirectVerletKernel:
+    #Batch velocity Verlet with the direct force sum
+    #All temporaries are allocated once for a fixed body count and reused every step
+    def __init__(self, N, dim, use_numba=None):
+        self.N = N
+        self.dim = dim
+        self.use_numba = HAVE_NUMBA if use_numba is None else (bool(use_numba) and HAVE_NUMBA)
+
+        #Work buffers for the NumPy path
+        if not self.use_numba:
+            self.diff = np.empty((N, N, dim))
+            self.dist2 = np.empty((N, N))
+            self.weights = np.empty((N, N))
+            self.kick = np.empty((N, dim))
+
+    def accelerations(self, positions, masses, G, out, softening=0.0):
+        #Direct sum into out without allocating
+        eps2 = float(softening) ** 2
+        if self.use_numba:
+            _direct_accelerations_loops(positions, masses, G, eps2, out)
+            return out
+
+        diagonal = slice(None, None, self.N + 1)
+        np.subtract(positions[np.newaxis, :, :], positions[:, np.newaxis, :], out=self.diff)
+        np.einsum('ijk,ijk->ij', self.diff, self.diff, out=self.dist2)
+        self.dist2 += eps2
+        self.dist2.flat[diagonal] = 1.0
+        np.power(self.dist2, -1.5, out=self.weights)
+        self.weights *= masses[np.newaxis, :]
+        self.weights.flat[diagonal] = 0.0
+        np.matmul(self.weights[:, np.newaxis, :], self.diff, out=out[:, np.newaxis, :])
+        out *= G
+        return out
+
+    def steps(self, positions, velocities, accelerations, masses, G, dt, steps, softening=0.0):
+        #Advance K steps in one call, state arrays are updated in place
+        if self.use_numba:
+            _verlet_steps_loops(positions, velocities, accelerations, masses, G, float(softening) ** 2, dt, int(steps))
+            return
+
+        halfDt = 0.5 * dt
+        for _ in range(int(steps)):
+            np.multiply(accelerations, halfDt, out=self.kick)
+            velocities += self.kick
+            np.multiply(velocities, dt, out=self.kick)
+            positions += self.kick
+            self.accelerations(positions, masses, G, accelerations, softening)
+            np.multiply(accelerations, halfDt, out=self.kick)
+            velocities += self.kick
@@ -0,0 +1,232 @@
+import numpy as np
+from Utils.BarnesHut import barnes_hut_accelerations
+from Utils.Kernels import DirectVerletKernel, HAVE_NUMBA
+from Utils.Integrators import make_integrator
+
+#Available force solvers
+FORCE_BACKENDS = ('direct', 'barneshut')
+
+#Rows handled per broadcast pass, keeps the (rows, N, dim) temporaries bounded for large N
+DIRECT_BLOCK_ROWS = 512
+
+#Pairwise gravitational acceleration on every body in one broadcast pass
+#positions is (N, dim), masses is (N,), returns (N, dim)
+#targets optionally limits the result to those bodies, (len(targets), dim)
+#softening is the Plummer length eps, the pull of each body is G * m_j * r_ij / (|r_ij|^2 + eps^2)^(3/2)
+def direct_accelerations(positions, masses, G, targets=None, softening=0.0):
+    N = positions.shape[0]
+    targets = np.arange(N) if targets is None else np.asarray(targets, dtype=np.intp)
+    acc = np.empty((targets.shape[0], positions.shape[1]))
+    eps2 = float(softening) ** 2
+
+    for start in range(0, targets.shape[0], DIRECT_BLOCK_ROWS):
+        stop = min(start + DIRECT_BLOCK_ROWS, targets.shape[0])
+        rows = targets[start:stop]
+        local = np.arange(stop - start)
+
+        #Separation vectors r_j - r_i for every pair, (rows, N, dim)
+        diff = positions[np.newaxis, :, :] - positions[rows, np.newaxis, :]
+
+        #Squared distances, self term set to 1 so it doesn't divide by zero
+        dist2 = np.einsum('ijk,ijk->ij', diff, diff) + eps2
+        dist2[local, rows] = 1.0
+
+        #G * m_j / |r_ij|^3 with the self term removed
+        weights = masses[np.newaxis, :] * dist2 ** -1.5
+        weights[local, rows] = 0.0
+
+        acc[start:stop] = G * np.einsum('ij,ijk->ik', weights, diff)
+
+    return acc
+
+
+class NBodySystem:
+    def __init__(self, positions, velocities, masses, G=1.0, backend='direct', theta=0.5, use_numba=None, integrator='verlet', collisions=None, softening=0.0):
+        #State arrays, contiguous (N, dim) so rows can be handed out as views
+        self.positions = np.array(positions, dtype=float, order='C', ndmin=2)
+        self.velocities = np.array(velocities, dtype=float, order='C', ndmin=2)
+        self.masses = np.array(masses, dtype=float).reshape(-1)
+
+        if self.positions.shape != self.velocities.shape:
+            raise ValueError("positions and velocities must have the same shape")
+        if self.positions.shape[0] != self.masses.shape[0]:
+            raise ValueError("need one mass per body")
+        if self.positions.shape[1] not in (2, 3):
+            raise ValueError("bodies must be 2D or 3D")
+
+        #Constants
+        self.G = float(G)
+
+        #Force solver, theta is the Barnes-Hut opening angle
+        if backend not in FORCE_BACKENDS:
+            raise ValueError(f"unknown force backend '{backend}', expected one of {FORCE_BACKENDS}")
+        self.backend = backend
+        self.theta = float(theta)
+
+        #Plummer softening length, caps the force of close passes at the cost of being wrong inside eps
+        if softening < 0:
+            raise ValueError("softening must not be negative")
+        self.softening = float(softening)
+
+        #Time integrator, a name from Integrators.INTEGRATORS or an integrator object
+        self.integrator = make_integrator(integrator)
+
+        #Collisions.CollisionHandler checked after every step, None lets bodies pass through each other
+        self.collisions = collisions
+
+        #Batch stepping kernel, built on first use (None picks Numba when it is installed)
+        self.use_numba = use_numba
+        self._kernel = None
+
+        #Simulation time in seconds
+        self.sim_time = 0.0
+
+        #Accelerations at the current positions, kept for the first Verlet half kick
+        self.accelerations = self.compute_accelerations(self.positions)
+
+    def __len__(self):
+        return self.positions.shape[0]
+
+    def __getstate__(self):
+        #Copies and pickles leave the batch kernel behind, its work buffers are rebuilt on first use
+        state = self.__dict__.copy()
+        state['_kernel'] = None
+        return state
+
+    @property
+    def dim(self):
+        return self.positions.shape[1]
+
+    def compute_accelerations(self, positions, targets=None):
+        #Force evaluation used by the integrators, targets limits it to some bodies
+        if self.backend == 'barneshut':
+            return barnes_hut_accelerations(positions, self.masses, self.G, self.theta, targets, self.softening)
+        return direct_accelerations(positions, self.masses, self.G, targets, self.softening)
+
+    def refresh(self):
+        #Recompute cached accelerations after the state or masses were edited by hand
+        self.accelerations = self.compute_accelerations(self.positions)
+        self.integrator.reset()
+
+    def set_state(self, positions, velocities, masses=None, sim_time=0.0):
+        #Overwrite state in place so existing row views stay valid
+        self.positions[:] = positions
+        self.velocities[:] = velocities
+        if masses is not None:
+            self.masses[:] = masses
+        self.sim_time = float(sim_time)
+        self.refresh()
+
+    def set_bodies(self, positions, velocities, masses, sim_time=None, refresh=True):
+        #Replace the bodies, their number may change (mergers)
+        #The state arrays are new, row views taken earlier keep pointing at the old ones
+        self.positions = np.array(positions, dtype=float, order='C', ndmin=2)
+        self.velocities = np.array(velocities, dtype=float, order='C', ndmin=2)
+        self.masses = np.array(masses, dtype=float).reshape(-1)
+        if sim_time is not None:
+            self.sim_time = float(sim_time)
+        if refresh:
+            self.refresh()
+
+    def step(self, dt):
+        #Advance by dt with the integrator, done in place on the state arrays
+        self.integrator.step(self, dt)
+        self.sim_time += dt
+
+    def advance(self, dt, steps, recorder=None):
+        #Advance a number of fixed steps, in one kernel call when the setup allows it
+        #With a recorder the batch is split wherever the recorder wants a record
+        #Returns the steps taken, fewer than asked when a collision handler stopped the run
+        steps = int(steps)
+        if recorder is not None:
+            done = 0
+            while done < steps:
+                batch = min(steps - done, recorder.steps_until_record())
+                taken = self.advance(dt, batch)
+                recorder.stepped(self, taken)
+                done += taken
+                if taken < batch:
+                    break
+            return done
+
+        kernel = self.batch_kernel()
+        if self.collisions is not None:
+            #Contacts are checked after every step, mergers change the body count (and the kernel)
+            for taken in range(1, steps + 1):
+                if kernel is None:
+                    self.step(dt)
+                else:
+                    kernel.steps(self.positions, self.velocities, self.accelerations, self.masses, self.G, dt, 1, self.softening)
+                    self.sim_time += dt
+                if self.collisions.resolve(self):
+                    return taken
+                kernel = self.batch_kernel()
+            return steps
+
+        if kernel is None:
+            for _ in range(steps):
+                self.step(dt)
+            return steps
+
+        kernel.steps(self.positions, self.velocities, self.accelerations, self.masses, self.G, dt, steps, self.softening)
+        self.sim_time += steps * dt
+        return steps
+
+    def batch_kernel(self):
+        #Kernel that runs many steps per call, None when only the generic step applies
+        if self.backend != 'direct' or self.integrator.name != 'verlet':
+            return None
+        useNumba = HAVE_NUMBA if self.use_numba is None else (self.use_numba and HAVE_NUMBA)
+        if not useNumba and len(self) > DIRECT_BLOCK_ROWS:
+            return None        #Full (N, N, dim) work buffers would be too large
+
+        if self._kernel is None or self._kernel.N != len(self) or self._kernel.use_numba != useNumba:
+            self._kernel = DirectVerletKernel(len(self), self.dim, useNumba)
+        return self._kernel
+
+    ##### Diagnostics #####
+    def kinetic_energy(self):
+        return 0.5 * np.sum(self.masses * np.einsum('ij,ij->i', self.velocities, self.velocities))
+
+    def potential_energy(self, positions=None):
+        #Softened to match the forces, -G m_i m_j / sqrt(|r_ij|^2 + eps^2), positions default to the current ones
+        positions = self.positions if positions is None else positions
+        i, j = np.triu_indices(len(self), k=1)
+        diff = positions[j] - positions[i]
+        dist = np.sqrt(np.einsum('ij,ij->i', diff, diff) + self.softening ** 2)
+        return -self.G * np.sum(self.masses[i] * self.masses[j] / dist)
+
+    def total_energy(self):
+        return self.kinetic_energy() + self.potential_energy()
+
+    def momentum(self):
+        return self.masses @ self.velocities
+
+    def angular_momentum(self):
+        #Scalar in 2D, vector in 3D
+        L = cross(self.positions, self.velocities)
+        if self.dim == 3:
+            return self.masses @ L
+        return np.sum(self.masses * L)
+
+    def relative_state(self, i=0, j=1):
+        #Position and velocity of body j relative to body i
+        return self.positions[j] - self.positions[i], self.velocities[j] - self.velocities[i]
+
+    def specific_energy(self, i=0, j=1):
+        #Specific orbital energy of the pair (i, j), j may be an array of bodies, softened like the forces
+        r12, v12 = self.relative_state(i, j)
+        mu = self.G * (self.masses[i] + self.masses[j])
+        return 0.5 * np.einsum('...k,...k->...', v12, v12) - mu / np.sqrt(np.einsum('...k,...k->...', r12, r12) + self.softening ** 2)
+
+    def specific_angular_momentum(self, i=0, j=1):
+        #Specific angular momentum of the pair (i, j)
+        r12, v12 = self.relative_state(i, j)
+        return cross(r12, v12)
+
+
+#Cross product that also handles 2D vectors (returns the z component)
+def cross(a, b):
+    if a.shape[-1] == 2:
+        return a[..., 0] * b[..., 1] - a[..., 1] * b[..., 0]
+    return np.cross(a, b)
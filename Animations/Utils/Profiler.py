@@ -0,0 +1,129 @@
+import csv
+import json
+import time
+from contextlib import contextmanager
+import numpy as np
+from Utils.RingBuffer import RingBuffer
+
+#Per frame timing for the animation loops
+#Each frame is split into named stages timed with perf_counter. A stage timed after the update
+#callback returns (the draw / repaint, through stage() in a paint handler or mark() from a GUI
+#callback) still counts for that frame, which only closes when the next one begins. Whatever the
+#stages don't cover (idle time until the next timer tick) is reported as 'other', so the stages
+#always add up to the frame interval, stored in seconds in the 'interval' column.
+
+
+class FrameProfiler:
+    def __init__(self, stages, window=240):
+        self.stages = list(stages)
+        self.columns = ['interval', 'steps'] + self.stages + ['other']
+        self.index = {name: i for i, name in enumerate(self.columns)}
+        self.history = RingBuffer(window, len(self.columns))
+
+        self.current = dict.fromkeys(self.stages, 0.0)
+        self.frame_start = None
+        self.frame_end = None       #When the update callback returned, until the first mark()
+        self.steps = 0
+        self.frames = 0
+
+        #Callbacks called with every finished frame as a dictionary
+        self.hooks = []
+
+    def __len__(self):
+        return len(self.history)
+
+    def add_hook(self, callback):
+        self.hooks.append(callback)
+
+    @contextmanager
+    def stage(self, name):
+        #Time the enclosed block as part of stage name, a stage may be entered several times per frame
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.current[name] += time.perf_counter() - start
+
+    def begin_frame(self, now=None):
+        #Closes the previous frame (its interval ends here) and starts the next one
+        now = time.perf_counter() if now is None else now
+        if self.frame_start is not None:
+            self._finish(now - self.frame_start)
+        self.frame_start = now
+
+    def end_frame(self, steps=0, now=None):
+        #Physics steps taken this frame, recorded when the next frame begins
+        self.steps = steps
+        self.frame_end = time.perf_counter() if now is None else now
+
+    def mark(self, name, now=None):
+        #Add the time since the update callback returned to stage name, for a GUI callback that runs
+        #once the frame is drawn. Only the first mark after each end_frame counts.
+        if self.frame_end is None:
+            return
+        now = time.perf_counter() if now is None else now
+        self.current[name] += now - self.frame_end
+        self.frame_end = None
+
+    def _finish(self, interval):
+        staged = sum(self.current.values())
+        row = [interval, self.steps] + [self.current[name] for name in self.stages] + [max(0.0, interval - staged)]
+        self.history.append(row)
+        self.frames += 1
+        self.current = dict.fromkeys(self.stages, 0.0)
+        self.steps = 0
+        self.frame_end = None
+
+        record = dict(zip(self.columns, row))
+        for hook in self.hooks:
+            hook(record)
+
+    ##### Queries #####
+    def series(self, name):
+        #One column over the window, oldest first, seconds (steps for 'steps')
+        return self.history.view()[self.index[name]]
+
+    def summary(self):
+        #FPS, physics steps per second and mean milliseconds per stage over the window
+        if len(self.history) == 0:
+            return None
+        data = self.history.view()
+        total = np.sum(data[0])
+        result = {
+            'frames': int(data.shape[1]),
+            'fps': float(data.shape[1] / total) if total > 0 else 0.0,
+            'steps_per_second': float(np.sum(data[1]) / total) if total > 0 else 0.0,
+            'interval_ms': 1e3 * float(np.mean(data[0])),
+        }
+        for name in self.stages + ['other']:
+            result[f'{name}_ms'] = 1e3 * float(np.mean(data[self.index[name]]))
+        return result
+
+    def overlay_text(self):
+        #Short multi line summary for an on screen overlay
+        summary = self.summary()
+        if summary is None:
+            return ""
+        lines = [f"{summary['fps']:.0f} FPS | {summary['steps_per_second']:.3g} steps/s"]
+        lines += [f"{name}: {summary[name + '_ms']:.2f} ms" for name in self.stages + ['other']]
+        return "\n".join(lines)
+
+    ##### Export #####
+    def export(self, path):
+        #Summary to .json, or the per frame window to CSV (anything else)
+        if path.endswith('.json'):
+            with open(path, 'w') as file:
+                json.dump(self.summary(), file, indent=2)
+            return path
+        with open(path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(self.columns)
+            writer.writerows(self.history.view().T.tolist())
+        return path
+
+    def clear(self):
+        self.history.clear()
+        self.current = dict.fromkeys(self.stages, 0.0)
+        self.frame_start = None
+        self.frame_end = None
+        self.steps = 0
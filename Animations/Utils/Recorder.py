@@ -0,0 +1,151 @@
+import json
+import os
+import numpy as np
+
+#Trajectory file layout
+#   8 byte magic, 4 byte little endian header length, JSON header padded with spaces to HEADER_ALIGN
+#   then fixed size records of (time, positions (N, dim), velocities (N, dim)), all little endian float64
+#Every record has the same size, so a file of any length can be opened with np.memmap
+#and a partly written last record (crash, live recording) is simply ignored
+MAGIC = b'SSIMTRJ1'
+HEADER_ALIGN = 64
+FORMAT_VERSION = 1
+
+
+def record_dtype(N, dim):
+    return np.dtype([('time', '<f8'), ('positions', '<f8', (N, dim)), ('velocities', '<f8', (N, dim))])
+
+def read_header(path):
+    #Header dictionary and the byte offset of the first record
+    with open(path, 'rb') as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a trajectory file")
+        length = int.from_bytes(file.read(4), 'little')
+        header = json.loads(file.read(length).decode('utf-8'))
+    return header, len(MAGIC) + 4 + length
+
+
+class TrajectoryRecorder:
+    #Streams the state of an NBodySystem to a trajectory file
+    #Records are gathered in a preallocated chunk and written with one call per chunk
+    #every is the number of integration steps between records (1 records every step)
+    def __init__(self, path, system, every=1, chunk_records=1024):
+        self.path = path
+        self.every = max(1, int(every))
+        self.N, self.dim = len(system), system.dim
+        self.dtype = record_dtype(self.N, self.dim)
+
+        self.chunk = np.zeros(max(1, int(chunk_records)), dtype=self.dtype)
+        self.pending = 0            #Records in the chunk not yet written
+        self.written = 0            #Records already in the file
+        self.countdown = self.every #Steps until the next record
+
+        #Header, padded so records start on an aligned offset
+        header = json.dumps({
+            'version': FORMAT_VERSION, 'N': self.N, 'dim': self.dim,
+            'G': system.G, 'masses': system.masses.tolist(), 'every': self.every,
+        }).encode('utf-8')
+        start = len(MAGIC) + 4
+        length = -(-(start + len(header)) // HEADER_ALIGN) * HEADER_ALIGN - start
+        self.file = open(path, 'wb')
+        self.file.write(MAGIC + length.to_bytes(4, 'little') + header.ljust(length))
+
+    def __len__(self):
+        return self.written + self.pending
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def record(self, system):
+        #Append the current state, the body count and masses are fixed by the header
+        #A merger changes both, so the recording stops there with a ValueError (records before it stay readable)
+        if len(system) != self.N:
+            raise ValueError(f"{self.path} records {self.N} bodies but the system now has {len(system)} (a merger?), "
+                             "start a new recording to go on")
+        row = self.chunk[self.pending]
+        row['time'] = system.sim_time
+        row['positions'] = system.positions
+        row['velocities'] = system.velocities
+        self.pending += 1
+        if self.pending == self.chunk.shape[0]:
+            self.flush()
+
+    def steps_until_record(self):
+        return self.countdown
+
+    def stepped(self, system, steps):
+        #Called after the system took steps, records when the countdown runs out
+        self.countdown -= steps
+        if self.countdown <= 0:
+            self.record(system)
+            self.countdown = self.every
+
+    def flush(self):
+        #Write the pending records, readers see them after this returns
+        if self.pending:
+            self.file.write(self.chunk[:self.pending].tobytes())
+            self.written += self.pending
+            self.pending = 0
+        self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+
+class TrajectoryPlayer:
+    #Read only view of a trajectory file through np.memmap, nothing is loaded until it is indexed
+    def __init__(self, path):
+        self.path = path
+        self.header, self.offset = read_header(path)
+        if self.header['version'] != FORMAT_VERSION:
+            raise ValueError(f"unsupported trajectory version {self.header['version']}")
+
+        self.N, self.dim = self.header['N'], self.header['dim']
+        self.G = self.header['G']
+        self.masses = np.array(self.header['masses'])
+        self.dtype = record_dtype(self.N, self.dim)
+        self.records = None
+        self.reload()
+
+    def __len__(self):
+        return 0 if self.records is None else self.records.shape[0]
+
+    def reload(self):
+        #Map every complete record, call again to follow a file that is still being written
+        #A file without a complete record gets an empty array, np.memmap can't map zero bytes
+        count = (os.path.getsize(self.path) - self.offset) // self.dtype.itemsize
+        self.records = np.memmap(self.path, dtype=self.dtype, mode='r', offset=self.offset, shape=(count,)) if count > 0 else np.zeros(0, dtype=self.dtype)
+        return len(self)
+
+    def check_records(self):
+        #Frames and scrubbing need at least one record
+        if len(self) == 0:
+            raise ValueError(f"{self.path} has no complete records to play back")
+
+    def close(self):
+        #Drop the map so the file can be moved or deleted (views handed out keep it alive)
+        self.records = None
+
+    @property
+    def times(self):
+        return self.records['time']
+
+    def frame(self, index):
+        #(time, positions, velocities) of one record, arrays are views into the map
+        self.check_records()
+        record = self.records[index]
+        return float(record['time']), record['positions'], record['velocities']
+
+    def index_at(self, t):
+        #Last record at or before sim time t, clamped to the recording
+        self.check_records()
+        return int(np.clip(np.searchsorted(self.times, t, side='right') - 1, 0, len(self) - 1))
+
+    def body(self, i, start=None, stop=None, every=1):
+        #Positions of body i over a range of records, (records, dim)
+        return self.records['positions'][start:stop:every, i]
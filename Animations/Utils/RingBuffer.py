@@ -0,0 +1,59 @@
+import numpy as np
+
+class RingBuffer:
+    #Fixed capacity circular buffer of dim-component points
+    #Every point is written twice, at slot i and slot i + capacity, so the newest
+    #count points always sit side by side and can be returned as a view without copying
+    def __init__(self, capacity, dim):
+        self.capacity = max(1, int(capacity))
+        self.dim = int(dim)
+
+        #Storage is (dim, 2 * capacity) so each component row is contiguous
+        self.data = np.empty((self.dim, 2 * self.capacity))
+
+        self.head = 0       #Next slot to write, in [0, capacity)
+        self.count = 0      #Number of valid points
+
+    def __len__(self):
+        return self.count
+
+    def append(self, point):
+        #Write the point into both halves of the storage
+        self.data[:, self.head] = point
+        self.data[:, self.head + self.capacity] = point
+
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def view(self):
+        #Oldest to newest, shape (dim, count), rows are contiguous views into the storage
+        #The view is only valid until the next append
+        end = self.head + self.capacity
+        return self.data[:, end - self.count:end]
+
+    def last(self):
+        #Newest point, None if empty
+        if self.count == 0:
+            return None
+        return self.data[:, self.head + self.capacity - 1]
+
+    def resize(self, capacity):
+        #Change capacity, keeps the newest points (all of them when growing)
+        self.load(self.view().copy(), capacity)
+
+    def load(self, points, capacity=None):
+        #Replace the contents with points (dim, n), oldest first, keeping the newest that fit
+        if capacity is not None:
+            self.capacity = max(1, int(capacity))
+        points = np.asarray(points, dtype=float).reshape(self.dim, -1)[:, -self.capacity:]
+        self.data = np.empty((self.dim, 2 * self.capacity))
+
+        n = points.shape[1]
+        self.data[:, :n] = points
+        self.data[:, self.capacity:self.capacity + n] = points
+        self.head = n % self.capacity
+        self.count = n
+
+    def clear(self):
+        self.head = 0
+        self.count = 0
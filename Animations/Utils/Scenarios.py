@@ -0,0 +1,70 @@
+import numpy as np
+from Utils.NBody import NBodySystem
+
+#Initial conditions shared by the front ends and the headless runner
+#Every builder returns (system, dt) where dt is the recommended fixed step
+
+
+#Two body setup from NewtonianOrbit_2Body.py
+def two_body(m1=100.0, m2=1000.0, r1=(-20.0, 20.0), v1=(7.0, 5.0), r2=(20.0, -20.0), v2=(-10.0, -4.0), G=50.0, **engine):
+    system = NBodySystem([r1, r2], [v1, v2], [m1, m2], G=G, **engine)
+    return system, 0.001
+
+#Earth-Moon setup from the pyqtgraph Earth-Moon script, in the centre of mass frame
+def earth_moon(**engine):
+    masses = np.array([5.972e24, 7.348e22])
+    positions = np.array([[0.0, 0.0], [384400000.0, 0.0]])
+    velocities = np.array([[0.0, 0.0], [0.0, 1022.0]])
+    velocities -= masses @ velocities / np.sum(masses)
+
+    system = NBodySystem(positions, velocities, masses, G=6.67430e-11, **engine)
+    return system, 10.0
+
+#Plummer sphere star cluster in virial equilibrium (G = total mass = scale radius = 1)
+#With dim=2 the same profile is used in the plane, which is close to but not exactly in equilibrium
+def cluster(bodies=1000, dim=3, seed=0, **engine):
+    rng = np.random.default_rng(seed)
+    N = int(bodies)
+
+    #Radii from the inverse cumulative mass profile, capped to avoid far outliers
+    massFraction = rng.uniform(0.0, 0.99, N)
+    radius = (massFraction ** (-2.0 / 3.0) - 1.0) ** -0.5
+
+    #Speeds by rejection sampling from q^2 (1 - q^2)^3.5, as a fraction of the escape speed
+    q = np.empty(N)
+    filled = 0
+    while filled < N:
+        x = rng.uniform(0.0, 1.0, N)
+        y = rng.uniform(0.0, 0.1, N)
+        accepted = x[y < x * x * (1.0 - x * x) ** 3.5][:N - filled]
+        q[filled:filled + accepted.size] = accepted
+        filled += accepted.size
+    speed = q * np.sqrt(2.0) * (1.0 + radius * radius) ** -0.25
+
+    positions = radius[:, np.newaxis] * random_directions(rng, N, dim)
+    velocities = speed[:, np.newaxis] * random_directions(rng, N, dim)
+    masses = np.full(N, 1.0 / N)
+
+    #Move to the centre of mass frame
+    positions -= masses @ positions
+    velocities -= masses @ velocities
+
+    system = NBodySystem(positions, velocities, masses, G=1.0, **engine)
+    return system, 1e-3
+
+#Uniformly distributed unit vectors
+def random_directions(rng, N, dim):
+    directions = rng.normal(size=(N, dim))
+    return directions / np.linalg.norm(directions, axis=1)[:, np.newaxis]
+
+
+SCENARIOS = {
+    'two_body': two_body,
+    'earth_moon': earth_moon,
+    'cluster': cluster,
+}
+
+def build(name, **settings):
+    if name not in SCENARIOS:
+        raise ValueError(f"unknown scenario '{name}', expected one of {tuple(SCENARIOS)}")
+    return SCENARIOS[name](**settings)
@@ -0,0 +1,47 @@
+class FixedStepScheduler:
+    #Turns elapsed simulated time into a whole number of fixed physics steps
+    #The step size never changes, so a run is reproducible no matter how frames are timed
+    def __init__(self, dt, max_steps_per_frame=1000):
+        if dt <= 0:
+            raise ValueError("dt must be positive")
+
+        #Fixed physics step
+        self.dt = float(dt)
+
+        #Step budget for a single frame, extra time is dropped instead of piling up
+        self.max_steps_per_frame = max(1, int(max_steps_per_frame))
+
+        #Simulated time requested but not yet stepped
+        self.accumulator = 0.0
+
+        #Simulated time thrown away because the step budget was hit
+        self.dropped_time = 0.0
+
+    def advance(self, elapsed):
+        #Add elapsed simulated time and return how many steps to run this frame
+        self.accumulator += max(0.0, elapsed)
+        steps = int(self.accumulator / self.dt)
+
+        #Cap the frame's work, keep only the fractional remainder
+        if steps > self.max_steps_per_frame:
+            dropped = (steps - self.max_steps_per_frame) * self.dt
+            self.dropped_time += dropped
+            self.accumulator -= dropped
+            steps = self.max_steps_per_frame
+
+        self.accumulator -= steps * self.dt
+        return steps
+
+    def alpha(self):
+        #Fraction of a step left in the accumulator, for interpolating between states
+        return self.accumulator / self.dt
+
+    def set_dt(self, dt):
+        #Change step size, the pending remainder is kept in simulated seconds
+        if dt <= 0:
+            raise ValueError("dt must be positive")
+        self.dt = float(dt)
+
+    def reset(self):
+        self.accumulator = 0.0
+        self.dropped_time = 0.0
@@ -0,0 +1,159 @@
+import csv
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import numpy as np
+from Utils import Scenarios
+from Utils.Ensemble import TwoBodyEnsemble
+
+#Initial condition parameters of the two body scenario (NewtonianOrbit_2Body.py defaults)
+TWO_BODY_DEFAULTS = {
+    'm1': 100.0, 'm2': 1000.0,
+    'r1x': -20.0, 'r1y': 20.0, 'v1x': 7.0, 'v1y': 5.0,
+    'r2x': 20.0, 'r2y': -20.0, 'v2x': -10.0, 'v2y': -4.0,
+    'G': 50.0,
+}
+
+METRIC_COLUMNS = ['E', 'h', 'min_separation', 'final_separation', 'escaped', 'collided', 'runtime']
+
+
+def check_names(names):
+    unknown = [name for name in names if name not in TWO_BODY_DEFAULTS]
+    if unknown:
+        raise ValueError(f"unknown sweep parameters {unknown}, expected some of {tuple(TWO_BODY_DEFAULTS)}")
+
+#Every combination of the listed values, other parameters keep their defaults
+def grid_configs(values, base=None):
+    check_names(values)
+    base = dict(TWO_BODY_DEFAULTS, **(base or {}))
+    names = list(values)
+    return [dict(base, **dict(zip(names, combo))) for combo in itertools.product(*(values[name] for name in names))]
+
+#Uniform random samples inside (low, high) for each listed parameter
+def random_configs(ranges, samples, seed=0, base=None):
+    check_names(ranges)
+    base = dict(TWO_BODY_DEFAULTS, **(base or {}))
+    rng = np.random.default_rng(seed)
+    draws = {name: rng.uniform(low, high, int(samples)) for name, (low, high) in ranges.items()}
+    return [dict(base, **{name: float(draws[name][i]) for name in draws}) for i in range(int(samples))]
+
+#Build the two body system for one configuration
+def build_two_body(config):
+    system, _ = Scenarios.two_body(
+        m1=config['m1'], m2=config['m2'],
+        r1=(config['r1x'], config['r1y']), v1=(config['v1x'], config['v1y']),
+        r2=(config['r2x'], config['r2y']), v2=(config['v2x'], config['v2y']),
+        G=config['G'])
+    return system
+
+#Run one configuration and return its row of the summary table
+#Separation is checked every check_every steps for the collision flag
+#escaped means the pair is unbound (E >= 0) and further apart than escape_radius at the end
+def run_two_body(config, duration, dt, escape_radius=1000.0, collision_radius=0.5, check_every=10):
+    start = time.perf_counter()
+    system = build_two_body(config)
+
+    totalSteps = int(round(duration / dt))
+    minSeparation = np.linalg.norm(system.relative_state(0, 1)[0])
+    collided = False
+    done = 0
+    while done < totalSteps and not collided:
+        steps = min(check_every, totalSteps - done)
+        system.advance(dt, steps)
+        done += steps
+
+        separation = np.linalg.norm(system.relative_state(0, 1)[0])
+        minSeparation = min(minSeparation, separation)
+        collided = not np.isfinite(separation) or separation < collision_radius
+
+    E = float(system.specific_energy(0, 1))
+    separation = float(np.linalg.norm(system.relative_state(0, 1)[0]))
+    row = dict(config)
+    row.update({
+        'E': E,
+        'h': float(system.specific_angular_momentum(0, 1)),
+        'min_separation': float(minSeparation),
+        'final_separation': separation,
+        'escaped': bool(not collided and E >= 0 and separation > escape_radius),
+        'collided': bool(collided),
+        'runtime': time.perf_counter() - start,
+    })
+    return row
+
+#Run every configuration across a process pool, rows come back in input order
+def run_sweep(configs, duration, dt, workers=None, **run_settings):
+    task = partial(run_two_body, duration=duration, dt=dt, **run_settings)
+    if workers == 1:
+        return [task(config) for config in configs]
+
+    chunk = max(1, len(configs) // (4 * (workers or os.cpu_count() or 1)))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(task, configs, chunksize=chunk))
+
+#Run every configuration at once as one vectorized ensemble, same rows as run_sweep
+def run_sweep_ensemble(configs, duration, dt, escape_radius=1000.0, collision_radius=0.5, check_every=10):
+    start = time.perf_counter()
+    column = lambda *names: np.array([[config[name] for name in names] for config in configs], dtype=float)
+    ensemble = TwoBodyEnsemble.from_arrays(
+        column('r1x', 'r1y'), column('v1x', 'v1y'), column('m1')[:, 0],
+        column('r2x', 'r2y'), column('v2x', 'v2y'), column('m2')[:, 0],
+        G=column('G')[:, 0])
+
+    totalSteps = int(round(duration / dt))
+    minSeparation = ensemble.separation()
+    collided = np.zeros(len(ensemble), dtype=bool)
+    E = np.empty(len(ensemble))
+    h = np.empty(len(ensemble))
+    separation = np.empty(len(ensemble))
+    done = 0
+    with np.errstate(all='ignore'):
+        while done < totalSteps and not np.all(collided):
+            steps = min(check_every, totalSteps - done)
+            ensemble.advance(dt, steps)
+            done += steps
+
+            current = ensemble.separation()
+            live = ~collided
+            minSeparation[live] = np.fmin(minSeparation[live], current[live])
+            hit = live & (~np.isfinite(current) | (current < collision_radius))
+            if np.any(hit):
+                #run_two_body stops at this check, so these members keep the metrics of this state
+                #(the ensemble carries on stepping them through the singularity, those states are ignored)
+                E[hit] = ensemble.specific_energy()[hit]
+                h[hit] = ensemble.specific_angular_momentum()[hit]
+                separation[hit] = current[hit]
+                collided |= hit
+
+        live = ~collided
+        E[live] = ensemble.specific_energy()[live]
+        h[live] = ensemble.specific_angular_momentum()[live]
+        separation[live] = ensemble.separation()[live]
+    runtime = (time.perf_counter() - start) / max(1, len(configs))
+
+    rows = []
+    for i, config in enumerate(configs):
+        row = dict(config)
+        row.update({
+            'E': float(E[i]),
+            'h': float(h[i]),
+            'min_separation': float(minSeparation[i]),
+            'final_separation': float(separation[i]),
+            'escaped': bool(not collided[i] and E[i] >= 0 and separation[i] > escape_radius),
+            'collided': bool(collided[i]),
+            'runtime': runtime,
+        })
+        rows.append(row)
+    return rows
+
+#Write the summary table as CSV
+def write_table(rows, path):
+    if not rows:
+        return
+    columns = list(TWO_BODY_DEFAULTS) + METRIC_COLUMNS
+    columns += [name for name in rows[0] if name not in columns]
+    with open(path, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
@@ -0,0 +1,86 @@
+from collections import deque
+import numpy as np
+from Utils.RingBuffer import RingBuffer
+
+class TimeSeriesBuffer:
+    #Last capacity samples of one or more channels against time, for scrolling plots
+    #Storage is a RingBuffer (times in row 0, one row per channel), so times() and values()
+    #are zero copy views. The running max / min of every channel over the window is kept with
+    #monotonic deques: each append is amortised O(1) and a query is O(1), however long the window.
+    def __init__(self, capacity, channels=1):
+        self.channels = int(channels)
+        self.buffer = RingBuffer(capacity, 1 + self.channels)
+        self.samples = 0        #Samples appended since the last clear, used to age out deque entries
+        self._reset_extremes()
+
+    def _reset_extremes(self):
+        #Per channel deques of (sample number, value), values decreasing for max and increasing for min
+        self.maxima = [deque() for _ in range(self.channels)]
+        self.minima = [deque() for _ in range(self.channels)]
+
+    def __len__(self):
+        return len(self.buffer)
+
+    @property
+    def capacity(self):
+        return self.buffer.capacity
+
+    def append(self, t, *values):
+        #One sample, a value per channel
+        record = np.empty(1 + self.channels)
+        record[0] = t
+        record[1:] = values
+        self.buffer.append(record)
+
+        oldest = self.samples - self.buffer.capacity + 1      #Oldest sample number still in the window
+        for channel, value in enumerate(record[1:].tolist()):
+            maxima, minima = self.maxima[channel], self.minima[channel]
+            while maxima and maxima[-1][1] <= value:
+                maxima.pop()
+            maxima.append((self.samples, value))
+            while minima and minima[-1][1] >= value:
+                minima.pop()
+            minima.append((self.samples, value))
+
+            if maxima[0][0] < oldest:
+                maxima.popleft()
+            if minima[0][0] < oldest:
+                minima.popleft()
+        self.samples += 1
+
+    def times(self):
+        #Oldest to newest, a view valid until the next append
+        return self.buffer.view()[0]
+
+    def values(self, channel=0):
+        return self.buffer.view()[1 + channel]
+
+    def max(self, channel=None):
+        #Largest value in the window, over every channel when channel is None
+        if len(self) == 0:
+            return None
+        channels = range(self.channels) if channel is None else [channel]
+        return max(self.maxima[c][0][1] for c in channels)
+
+    def min(self, channel=None):
+        if len(self) == 0:
+            return None
+        channels = range(self.channels) if channel is None else [channel]
+        return min(self.minima[c][0][1] for c in channels)
+
+    def last_time(self):
+        last = self.buffer.last()
+        return None if last is None else float(last[0])
+
+    def resize(self, capacity):
+        #Change the window, the newest samples are kept and the extremes rebuilt from them
+        data = self.buffer.view().copy()[:, -max(1, int(capacity)):]
+        self.buffer = RingBuffer(capacity, 1 + self.channels)
+        self.clear()
+        for column in data.T:
+            self.append(column[0], *column[1:])
+
+    def clear(self):
+        self.buffer.clear()
+        self.samples = 0
+        self._reset_extremes()
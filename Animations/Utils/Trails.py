@@ -1,45 +1,315 @@
 import numpy as np
+from Utils.RingBuffer import RingBuffer
+
+#Longest run of points a level drops in a row, bounds the deviation check and the gaps on straight stretches
+MAX_DROPPED_RUN = 256
+
+
+class DecimatedTrail:
+    #Level of detail trail: a full resolution head followed by progressively thinner history
+    #Points leaving the head are passed down a chain of levels. A level drops points until the path
+    #since the last kept point has turned by more than max_turn radians, so straight stretches
+    #collapse while tight curves (periapsis passes) keep their points. max_turn doubles on every
+    #level. With max_deviation a level also keeps a point whenever dropping the next one would leave
+    #any dropped point farther than max_deviation from the chord drawn in their place, so the drawn
+    #path stays within levels * max_deviation of every sample.
+    #Levels hold level_length points, except the last one, which grows rather than lose a point
+    #from the last max_length samples. Drawn points are bounded by head_length + levels * level_length
+    #unless the history is too curved to thin that far.
+    def __init__(self, max_length, dim, head_length=1000, levels=4, level_length=1000, max_turn=0.05, max_deviation=None):
+        self.dim = int(dim)
+        self.max_length = max(1, int(max_length))
+        self.head_length = max(1, int(head_length))
+        self.level_length = max(1, int(level_length))
+        self.max_turn = float(max_turn)
+        self.max_deviation = None if max_deviation is None else float(max_deviation)
+
+        #One extra row holds the sample number, used to trim points older than max_length
+        self.head = RingBuffer(min(self.head_length, self.max_length), self.dim + 1)
+        self.levels = [RingBuffer(self.level_length, self.dim + 1) for _ in range(int(levels))]
+        self._reset_levels()
+
+        self.samples = 0
+
+    def _reset_levels(self):
+        #Streaming simplifier state per level
+        count = len(self.levels)
+        self.candidates = [None] * count     #Newest point on the level, kept or dropped when the next arrives
+        self.directions = [None] * count     #Unit direction of the segment ending at the candidate
+        self.turns = [0.0] * count           #Turning accumulated since the last kept point
+        self.dropped = [[] for _ in range(count)]   #Points dropped since the last kept point
+
+    def __len__(self):
+        return self.view().shape[1]
+
+    def append(self, point):
+        record = np.empty(self.dim + 1)
+        record[:self.dim] = point
+        record[self.dim] = self.samples
+        self.samples += 1
+
+        evicted = self._oldest(self.head)
+        self.head.append(record)
+        if evicted is not None:
+            self._push(0, evicted)
+
+    def _oldest(self, ring):
+        #Point that the next append will overwrite
+        if ring.count < ring.capacity:
+            return None
+        return ring.view()[:, 0].copy()
+
+    def _push(self, level, point):
+        #Feed a point evicted from the previous level into this one
+        if level >= len(self.levels):
+            return
+
+        candidate = self.candidates[level]
+        if candidate is None:
+            #First point on the level is always kept
+            self._keep(level, point)
+            self.candidates[level] = point
+            return
+
+        step = point[:self.dim] - candidate[:self.dim]
+        length = np.linalg.norm(step)
+        if length == 0:
+            return
+        direction = step / length
+
+        #Turning angle at the candidate
+        previous = self.directions[level]
+        if previous is not None:
+            self.turns[level] += np.arccos(np.clip(previous @ direction, -1.0, 1.0))
+
+        if (self.turns[level] > self.max_turn * (2 ** level) or len(self.dropped[level]) >= MAX_DROPPED_RUN
+                or self._deviates(level, candidate, point)):
+            self._keep(level, candidate)
+            self.turns[level] = 0.0
+            self.dropped[level] = []
+        else:
+            self.dropped[level].append(candidate)
+
+        self.candidates[level] = point
+        self.directions[level] = direction
+
+    def _deviates(self, level, candidate, point):
+        #True when dropping the candidate puts it, or a point dropped before it, farther than
+        #max_deviation from the chord between the last kept point and the new point
+        if self.max_deviation is None:
+            return False
+        ring = self.levels[level]
+        anchor = ring.last()[:self.dim]
+        chord = point[:self.dim] - anchor
+        chord2 = chord @ chord
+        between = np.array(self.dropped[level] + [candidate])[:, :self.dim] - anchor
+        t = np.clip(between @ chord / chord2, 0.0, 1.0) if chord2 > 0 else np.zeros(len(between))
+        offset = between - t[:, np.newaxis] * chord
+        return np.max(np.einsum('ij,ij->i', offset, offset)) > self.max_deviation ** 2
+
+    def _keep(self, level, point):
+        ring = self.levels[level]
+        evicted = self._oldest(ring)
+        if evicted is not None and level == len(self.levels) - 1 and ring.view()[self.dim, 1] > self.samples - self.max_length:
+            #Nowhere further down, grow instead of losing a point the trail still draws
+            #(the oldest point stays while the next one is inside the span, it starts the first segment)
+            ring.resize(2 * ring.capacity)
+            evicted = None
+        ring.append(point)
+        if evicted is not None:
+            self._push(level + 1, evicted)
+
+    def view(self):
+        #Oldest to newest, shape (dim, count), covering the last max_length samples
+        #Starts at the newest point at or before the oldest covered sample, so no covered sample is left off
+        pieces = []
+        for level in reversed(range(len(self.levels))):
+            ring = self.levels[level]
+            pieces.append(ring.view())
+            candidate = self.candidates[level]
+            if candidate is not None and (ring.count == 0 or ring.last()[self.dim] != candidate[self.dim]):
+                pieces.append(candidate[:, np.newaxis])
+        pieces.append(self.head.view())
+
+        points = np.concatenate(pieces, axis=1)
+        start = max(0, np.searchsorted(points[self.dim], self.samples - self.max_length, side='right') - 1)
+        return points[:self.dim, start:]
+
+    def resize(self, max_length):
+        #Change the covered span, the head never grows past head_length
+        #Levels drop the points the new span no longer draws, and the last level goes back to
+        #level_length when what is left fits (a longer span grows it again as needed)
+        self.max_length = max(1, int(max_length))
+        self.head.resize(min(self.head_length, self.max_length))
+        oldest = self.samples - self.max_length
+        for level, ring in enumerate(self.levels):
+            points = ring.view()
+            points = points[:, max(0, np.searchsorted(points[self.dim], oldest, side='right') - 1):].copy()
+            capacity = max(self.level_length, points.shape[1]) if level == len(self.levels) - 1 else ring.capacity
+            ring.load(points, capacity)
+
+    def clear(self):
+        self.head.clear()
+        for ring in self.levels:
+            ring.clear()
+        self._reset_levels()
+
+    def get_state(self):
+        #Flat dictionary of arrays holding everything needed to continue the trail exactly
+        state = {'samples': np.array(self.samples), 'head': self.head.view().copy(), 'turns': np.array(self.turns)}
+        for level, ring in enumerate(self.levels):
+            state[f'level{level}'] = ring.view().copy()
+            state[f'candidate{level}'] = np.array([] if self.candidates[level] is None else self.candidates[level])
+            state[f'direction{level}'] = np.array([] if self.directions[level] is None else self.directions[level])
+            state[f'dropped{level}'] = np.array(self.dropped[level]).reshape(-1, self.dim + 1)
+        return state
+
+    def set_state(self, state):
+        #Inverse of get_state, thresholds stay as constructed and the last level grows to fit its points
+        self.samples = int(state['samples'])
+        self.head.load(state['head'])
+        self._reset_levels()
+        for level, ring in enumerate(self.levels):
+            points = state[f'level{level}']
+            ring.load(points, max(ring.capacity, points.shape[1]) if level == len(self.levels) - 1 else None)
+            candidate, direction = state[f'candidate{level}'], state[f'direction{level}']
+            self.candidates[level] = np.array(candidate, dtype=float) if len(candidate) else None
+            self.directions[level] = np.array(direction, dtype=float) if len(direction) else None
+            self.turns[level] = float(state['turns'][level])
+            self.dropped[level] = list(np.array(state.get(f'dropped{level}', np.empty((0, self.dim + 1))), dtype=float))
+
 
 class TrailManager:
-    def __init__(self, max_length=1000):
+    def __init__(self, max_length=1000, decimate=False, **lod_settings):
         #Max Length
-        self.max_length = max_length
+        self.max_length = max(1, int(max_length))
 
-        #Body Dictionary
+        #Level of detail mode, lod_settings are passed to DecimatedTrail
+        self.decimate = decimate
+        self.lod_settings = lod_settings
+
+        #Body Dictionary, one preallocated ring buffer per body
         self.trails = {}
 
     def add_body(self, body_id, initial_pos):
         #Add body to dictionary
-        self.trails[body_id] = [np.array(initial_pos, dtype=float)]
+        initial_pos = np.asarray(initial_pos, dtype=float)
+        if self.decimate:
+            self.trails[body_id] = DecimatedTrail(self.max_length, initial_pos.shape[0], **self.lod_settings)
+        else:
+            self.trails[body_id] = RingBuffer(self.max_length, initial_pos.shape[0])
+        self.trails[body_id].append(initial_pos)
 
     def update(self, body_id, new_pos):
-        #Add next position to trail
-        self.trails[body_id].append(np.array(new_pos, dtype=float))
-
-        #Remove positions beyond max length
-        self.trails[body_id] = self.trails[body_id][-self.max_length:]
+        #Add next position to trail, the oldest point is overwritten once full
+        self.trails[body_id].append(new_pos)
 
     def get_trail(self, body_id):
-        #Return Trail Data
-        return self.trails[body_id]
+        #Return Trail Data as a (dim, length) view, oldest point first
+        #Unpacks straight into x, y (, z) for set_data / setData, valid until the next update
+        #In decimate mode this is a fresh array of the bounded level of detail points
+        return self.trails[body_id].view()
 
     def set_max_length(self, length):
         #Change Max Length
         self.max_length = max(1, int(length))
 
-        #Update Current trail data with new max length
+        #Resize buffers, growing keeps every stored point
+        #Decimated trails also drop level points outside the new span and shrink their last level
         for key in self.trails:
-            self.trails[key] = self.trails[key][-self.max_length:]
+            self.trails[key].resize(self.max_length)
 
     def get_max_length(self):
         #Return Max Length
         return self.max_length
-    
+
+    def get_state(self):
+        #Every trail as a flat dictionary of arrays, keys are "body/field", for saving with np.savez
+        state = {'max_length': np.array(self.max_length), 'bodies': np.array([str(body_id) for body_id in self.trails])}
+        for body_id, trail in self.trails.items():
+            fields = trail.get_state() if self.decimate else {'points': trail.view().copy()}
+            for field, value in fields.items():
+                state[f'{body_id}/{field}'] = value
+        return state
+
+    def set_state(self, state):
+        #Rebuild the trails saved by get_state, using this manager's mode and level of detail settings
+        self.max_length = int(state['max_length'])
+        self.trails = {}
+        for body_id in state['bodies'].tolist():
+            prefix = f'{body_id}/'
+            fields = {key[len(prefix):]: value for key, value in state.items() if key.startswith(prefix)}
+            if self.decimate:
+                self.trails[body_id] = DecimatedTrail(self.max_length, len(fields['head']) - 1, **self.lod_settings)
+                self.trails[body_id].set_state(fields)
+            else:
+                self.trails[body_id] = RingBuffer(self.max_length, len(fields['points']))
+                self.trails[body_id].load(fields['points'])
+
     def clear(self, body_id=None):
         #Clear Trails
         if body_id is None:
             for key in self.trails:
-                self.trails[key] = []
+                self.trails[key].clear()
         else:
             if body_id in self.trails:
-                self.trails[body_id] = []
\ No newline at end of file
+                self.trails[body_id].clear()
+
+
+class BodyTrails:
+    #Trails of every body of a system in one ring buffer, for scenes with thousands of bodies
+    #Each update stores the whole (N, dim) position array as one column, so a frame costs one copy
+    #however many bodies there are. segments() flattens the trails into a single polyline with a
+    #connect array that breaks it between bodies, drawn with one setData call.
+    def __init__(self, max_length, positions):
+        positions = np.asarray(positions, dtype=float)
+        self.bodies, self.dim = positions.shape
+        self.buffer = RingBuffer(max_length, self.bodies * self.dim)
+        self._connect = None
+        self.update(positions)
+
+    def __len__(self):
+        return len(self.buffer)
+
+    @property
+    def max_length(self):
+        return self.buffer.capacity
+
+    def update(self, positions):
+        self.buffer.append(np.asarray(positions, dtype=float).reshape(-1))
+
+    def view(self):
+        #(N, dim, length) view, oldest point first, valid until the next update
+        return self.buffer.view().reshape(self.bodies, self.dim, -1)
+
+    def connect(self):
+        #True where a point joins the next one, False on the last point of every body
+        length = len(self.buffer)
+        if self._connect is None or self._connect.shape[0] != self.bodies * length:
+            self._connect = np.ones((self.bodies, length), dtype=bool)
+            self._connect[:, -1] = False
+            self._connect = self._connect.reshape(-1)
+        return self._connect
+
+    def segments(self, axes=(0, 1)):
+        #Flat coordinates of every trail (one array per axis) and the connect array for setData
+        trails = self.view()
+        return tuple(trails[:, axis, :].reshape(-1) for axis in axes) + (self.connect(),)
+
+    def set_max_length(self, length):
+        self.buffer.resize(length)
+
+    def compact(self, keep):
+        #Drop the trails of the bodies where keep is False (merged into another), the rest keep their history
+        trails = self.view()[np.asarray(keep, dtype=bool)]
+        self.bodies = trails.shape[0]
+        points = trails.reshape(self.bodies * self.dim, -1)
+        self.buffer = RingBuffer(self.buffer.capacity, self.bodies * self.dim)
+        self.buffer.load(points)
+        self._connect = None
+
+    def clear(self, positions=None):
+        #Empty the trails, starting again from positions when given
+        self.buffer.clear()
+        if positions is not None:
+            self.update(positions)
@@ -0,0 +1,269 @@
+import copy
+import queue
+import threading
+import time
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+from Utils.Scheduler import FixedStepScheduler
+
+#Physics off the GUI thread
+#A PhysicsWorker owns its own copy of an NBodySystem and steps it on a thread or in a separate
+#process, paced against the wall clock like the front ends' FixedStepScheduler. After every batch it
+#publishes (time, steps, positions, velocities, masses, body ids) to a SnapshotBuffer, and the GUI copies the newest
+#snapshot into its own system once per frame. Neither side ever waits on the other: the GUI draws
+#whatever was published last and the physics keeps stepping however slow the frames are.
+#Commands (pause, speed, dt, a new state) go the other way through a queue and apply between batches.
+#Process mode always starts the child with spawn, a fork of a process already running Qt (or any other
+#threads) can deadlock, so the script's top level must be guarded by if __name__ == '__main__' or the
+#child re-runs it. Thread mode only runs beside the GUI while the
+#force kernels release the GIL: the nogil Numba kernel does and NumPy's large array operations mostly
+#do, but Barnes-Hut builds and walks its tree in Python and holds it, so give it a process.
+
+WORKER_MODES = ('thread', 'process')
+
+
+class SnapshotBuffer:
+    #Double buffered state of one system, one writer and any number of readers, no locks
+    #The writer fills the slot readers are not pointed at and then flips 'published' to it. Each slot
+    #carries a version that is odd while it is being written, so a reader lapped by the writer (two
+    #publications during one copy) sees the version change and reads again.
+    #With shared=True the storage is a multiprocessing.shared_memory block that another process
+    #attaches to by name. bodies is the capacity, mergers may leave fewer bodies in a snapshot, and
+    #the ids of the bodies left (CollisionHandler.ids) come with it.
+    HEADER = 3      #Published slot, then the version of each slot
+
+    def __init__(self, bodies, dim, shared=False, name=None):
+        self.bodies = int(bodies)
+        self.dim = int(dim)
+        #time, steps, generation, body count, then positions, velocities, masses and ids at fixed offsets
+        self.size = 4 + self.bodies * (2 * self.dim + 2)
+        self.velocityStart = 4 + self.bodies * self.dim
+        self.massStart = 4 + 2 * self.bodies * self.dim
+        self.idStart = self.massStart + self.bodies
+        nbytes = 8 * (self.HEADER + 2 * self.size)
+
+        self.shm = None
+        self.owner = False
+        if name is not None:
+            self.shm = shared_memory.SharedMemory(name=name)
+        elif shared:
+            self.shm = shared_memory.SharedMemory(create=True, size=nbytes)
+            self.owner = True
+        buffer = self.shm.buf if self.shm is not None else bytearray(nbytes)
+
+        self.header = np.ndarray((self.HEADER,), dtype=np.int64, buffer=buffer)
+        self.slots = np.ndarray((2, self.size), dtype=np.float64, buffer=buffer, offset=8 * self.HEADER)
+        if name is None:
+            self.header[:] = 0
+
+    @property
+    def name(self):
+        return None if self.shm is None else self.shm.name
+
+    def write(self, system, steps, generation=0):
+        #Publish the system's state, steps is the worker's running step count and generation the
+        #number of states pushed to it so far
+        slot = 1 - int(self.header[0])
+        count = len(system)
+        n = count * self.dim
+        self.header[1 + slot] += 1                          #Odd, being written
+        data = self.slots[slot]
+        data[0] = system.sim_time
+        data[1] = steps
+        data[2] = generation
+        data[3] = count
+        data[4:4 + n] = system.positions.reshape(-1)
+        data[self.velocityStart:self.velocityStart + n] = system.velocities.reshape(-1)
+        data[self.massStart:self.massStart + count] = system.masses
+        ids = None if system.collisions is None else system.collisions.ids
+        data[self.idStart:self.idStart + count] = np.arange(count) if ids is None else ids
+        self.header[1 + slot] += 1                          #Even, complete
+        self.header[0] = slot
+
+    def read_into(self, system, generation=0):
+        #Copy the newest complete snapshot into system's state arrays, returns the step count
+        #Snapshots older than generation are skipped (None), so a state just pushed isn't overwritten
+        #by one published before the worker applied it
+        #Only the bodies and sim_time change, the cached accelerations are left alone (and are stale
+        #after the body count changed). After mergers the ids of the bodies left go to system's
+        #collision handler, as if it had merged them itself.
+        while True:
+            slot = int(self.header[0])
+            version = int(self.header[1 + slot])
+            if version % 2:
+                continue
+            data = self.slots[slot]
+            if data[2] < generation:
+                return None
+            count = int(data[3])
+            n = count * self.dim
+            positions = data[4:4 + n]
+            velocities = data[self.velocityStart:self.velocityStart + n]
+            masses = data[self.massStart:self.massStart + count]
+            if count == len(system):
+                system.positions.reshape(-1)[:] = positions
+                system.velocities.reshape(-1)[:] = velocities
+                system.masses[:] = masses
+            else:
+                system.set_bodies(positions.reshape(count, self.dim), velocities.reshape(count, self.dim), masses, refresh=False)
+                if system.collisions is not None:
+                    system.collisions.ids = data[self.idStart:self.idStart + count].astype(np.int64)
+            sim_time, steps = float(data[0]), int(data[1])
+            if int(self.header[1 + slot]) == version:
+                system.sim_time = sim_time
+                return steps
+
+    def close(self):
+        #Drop the views before closing, shared memory can't be released while they exist
+        self.header = self.slots = None
+        if self.shm is not None:
+            self.shm.close()
+            if self.owner:
+                self.shm.unlink()
+            self.shm = None
+
+
+#Worker loop, shared by both modes
+def run_worker(system, dt, speed, max_steps, snapshot, commands, errors):
+    try:
+        scheduler = FixedStepScheduler(dt, max_steps)
+        running = True
+        steps = 0
+        generation = 0
+        last = time.perf_counter()
+
+        while True:
+            #Commands from the GUI, applied between batches
+            while True:
+                try:
+                    command, value = commands.get_nowait()
+                except queue.Empty:
+                    break
+                if command == 'stop':
+                    return
+                if command == 'running':
+                    running = bool(value)
+                elif command == 'speed':
+                    speed = value
+                elif command == 'dt':
+                    scheduler.set_dt(value)
+                elif command == 'state':
+                    positions, velocities, masses, sim_time = value
+                    system.set_bodies(positions, velocities, masses, sim_time=sim_time)
+                    scheduler.reset()
+                    generation += 1
+                    snapshot.write(system, steps, generation)
+
+            now = time.perf_counter()
+            elapsed = now - last
+            last = now
+            if not running:
+                batch = 0
+            elif speed is None:
+                batch = scheduler.max_steps_per_frame          #As fast as possible
+            else:
+                batch = scheduler.advance(elapsed * speed)
+
+            if batch > 0:
+                taken = system.advance(scheduler.dt, batch)
+                steps += taken
+                snapshot.write(system, steps, generation)
+                if taken < batch:
+                    running = False         #A collision handler stopped the run, wait for a new state
+            else:
+                #Nothing due yet, sleep until the next step (or a command) instead of spinning
+                wait = (scheduler.dt - scheduler.accumulator) / speed if running and speed else 0.01
+                time.sleep(min(max(wait, 0.0), 0.01))
+    except Exception as error:
+        errors.put(f"{type(error).__name__}: {error}")
+
+#Process entry point, attaches to the snapshot the parent created
+def _process_main(system, dt, speed, max_steps, name, commands, errors):
+    snapshot = SnapshotBuffer(len(system), system.dim, name=name)
+    try:
+        run_worker(system, dt, speed, max_steps, snapshot, commands, errors)
+    finally:
+        snapshot.close()
+
+
+class PhysicsWorker:
+    #Steps a copy of system on a worker thread or process, speed is sim seconds per wall clock second
+    #(None runs flat out) and max_steps_per_batch caps the steps between two snapshots
+    def __init__(self, system, dt, speed=1.0, mode='thread', max_steps_per_batch=1000):
+        if mode not in WORKER_MODES:
+            raise ValueError(f"unknown worker mode '{mode}', expected one of {WORKER_MODES}")
+        self.mode = mode
+        self.bodies = len(system)
+        self.steps = 0          #Worker step count at the last read
+        self.generation = 0     #States pushed to the worker
+
+        self.snapshot = SnapshotBuffer(len(system), system.dim, shared=(mode == 'process'))
+        self.snapshot.write(system, 0)
+
+        if mode == 'thread':
+            self.commands = queue.Queue()
+            self.errors = queue.Queue()
+            self.worker = threading.Thread(target=run_worker, daemon=True,
+                                           args=(copy.deepcopy(system), dt, speed, max_steps_per_batch, self.snapshot, self.commands, self.errors))
+        else:
+            context = multiprocessing.get_context('spawn')
+            self.commands = context.Queue()
+            self.errors = context.Queue()
+            self.worker = context.Process(target=_process_main, daemon=True,
+                                          args=(system, dt, speed, max_steps_per_batch, self.snapshot.name, self.commands, self.errors))
+        self.worker.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def read_into(self, system):
+        #Copy the newest snapshot into system, returns the steps taken since the previous read
+        #Raises RuntimeError if the worker died
+        try:
+            error = self.errors.get_nowait()
+        except queue.Empty:
+            error = None
+        if error is not None:
+            raise RuntimeError(f"physics worker failed: {error}")
+
+        steps = self.snapshot.read_into(system, self.generation)
+        if steps is None:
+            return 0
+        taken = max(0, steps - self.steps)
+        self.steps = steps
+        return taken
+
+    ##### Commands #####
+    def push(self, system):
+        #Replace the worker's state with system's (after a reset or an edit in the GUI)
+        state = (system.positions.copy(), system.velocities.copy(), system.masses.copy(), system.sim_time)
+        self.commands.put(('state', state))
+        self.generation += 1
+
+    def set_running(self, running):
+        self.commands.put(('running', bool(running)))
+
+    def set_speed(self, speed):
+        self.commands.put(('speed', speed))
+
+    def set_dt(self, dt):
+        if dt <= 0:
+            raise ValueError("dt must be positive")
+        self.commands.put(('dt', float(dt)))
+
+    def close(self, timeout=5.0):
+        #Stop the worker and release the snapshot
+        if self.worker is None:
+            return
+        self.commands.put(('stop', None))
+        self.worker.join(timeout)
+        if self.mode == 'process' and self.worker.is_alive():
+            self.worker.terminate()
+            self.worker.join()
+        if not self.worker.is_alive():
+            self.snapshot.close()       #A thread still inside a long batch keeps its (unshared) buffer
+        self.worker = None
@@ -0,0 +1,71 @@
+import sys
+import os
+import time
+import numpy as np
+
+currentFilePath = os.path.dirname(__file__)
+animationsDir = os.path.join(currentFilePath, "..", "Animations")
+sys.path.append(
+    os.path.abspath(animationsDir)
+)
+
+from Utils.NBody import NBodySystem, direct_accelerations
+
+
+#Central mass with a disk of light bodies on circular orbits around it
+#Every light body forms a two body pair with the centre, so the specific energy E
+#printed by NewtonianOrbit_2Body.py applies to each of them
+def MakeDisk(N, dim, seed=0):
+    rng = np.random.default_rng(seed)
+    G, centralMass = 1.0, 1000.0
+
+    radius = rng.uniform(5.0, 50.0, N - 1)
+    angle = rng.uniform(0.0, 2 * np.pi, N - 1)
+    speed = np.sqrt(G * centralMass / radius)
+
+    positions = np.zeros((N, dim))
+    velocities = np.zeros((N, dim))
+    positions[1:, 0] = radius * np.cos(angle)
+    positions[1:, 1] = radius * np.sin(angle)
+    velocities[1:, 0] = -speed * np.sin(angle)
+    velocities[1:, 1] = speed * np.cos(angle)
+    if dim == 3:
+        positions[1:, 2] = rng.normal(0.0, 0.5, N - 1)
+
+    masses = np.concatenate([[centralMass], rng.uniform(0.01, 0.1, N - 1)])
+    return positions, velocities, masses, G
+
+#Force error of one Barnes-Hut evaluation against the direct sum
+def ForceError(system):
+    exact = direct_accelerations(system.positions, system.masses, system.G)
+    approx = system.compute_accelerations(system.positions)
+    relError = np.linalg.norm(approx - exact, axis=1) / np.linalg.norm(exact, axis=1)
+    return np.median(relError), np.max(relError)
+
+#Run one configuration and measure speed and specific energy drift
+def RunCase(N, dim, backend, theta, steps, dt):
+    positions, velocities, masses, G = MakeDisk(N, dim)
+    system = NBodySystem(positions, velocities, masses, G=G, backend=backend, theta=theta)
+    bodies = np.arange(1, N)
+
+    medianError, maxError = ForceError(system)
+    E0 = system.specific_energy(0, bodies)
+
+    start = time.perf_counter()
+    system.advance(dt, steps)
+    elapsed = time.perf_counter() - start
+
+    drift = np.abs((system.specific_energy(0, bodies) - E0) / E0)
+    return elapsed / steps, medianError, maxError, np.median(drift), np.max(drift)
+
+
+def BarnesHutBench(sizes=(256, 1024, 4096), thetas=(0.3, 0.5, 0.8, 1.0), dim=2, steps=20, dt=0.01):
+    print(f"{'N':>6} {'backend':>10} {'theta':>6} {'ms/step':>9} {'med |da|/|a|':>13} {'max |da|/|a|':>13} {'med |dE/E|':>11} {'max |dE/E|':>11}")
+    for N in sizes:
+        cases = [('direct', 0.0)] + [('barneshut', theta) for theta in thetas]
+        for backend, theta in cases:
+            stepTime, medianError, maxError, medianDrift, maxDrift = RunCase(N, dim, backend, theta, steps, dt)
+            print(f"{N:>6} {backend:>10} {theta:>6.2f} {stepTime * 1e3:>9.2f} {medianError:>13.2e} {maxError:>13.2e} {medianDrift:>11.2e} {maxDrift:>11.2e}")
+
+
+BarnesHutBench()
@@ -0,0 +1,66 @@
+import sys
+import os
+import time
+
+currentFilePath = os.path.dirname(__file__)
+animationsDir = os.path.join(currentFilePath, "..", "Animations")
+sys.path.append(
+    os.path.abspath(animationsDir)
+)
+
+from Utils import Scenarios
+from Utils.Integrators import SYMPLECTIC
+
+DAY = 86400.0
+
+
+#Integrate the Earth-Moon system for span seconds, returns (max |dE/E|, wall time of the stepping)
+#Every scheme goes through step() and the same force callback, so times compare like for like
+def RunCase(integrator, dt, span, samples=200):
+    system, _ = Scenarios.earth_moon(integrator=integrator)
+    E0 = system.total_energy()
+    totalSteps = int(round(span / dt))
+    stride = max(1, totalSteps // samples)
+
+    worst, elapsed, done = 0.0, 0.0, 0
+    while done < totalSteps:
+        steps = min(stride, totalSteps - done)
+        start = time.perf_counter()
+        for _ in range(steps):
+            system.step(dt)
+        elapsed += time.perf_counter() - start
+        done += steps
+        worst = max(worst, abs((system.total_energy() - E0) / E0))
+    return worst, elapsed
+
+#Largest step on a halving ladder that keeps the energy error under target, and what it costs
+def TimeToTarget(integrator, target, span, largestDt=DAY, halvings=10):
+    dt = largestDt
+    for _ in range(halvings + 1):
+        error, elapsed = RunCase(integrator, dt, span)
+        if error <= target:
+            return dt, error, elapsed
+        dt *= 0.5
+    return None
+
+
+def IntegratorBench():
+    span = 365 * DAY
+    targets = (1e-6, 1e-9, 1e-12)
+    print(f"Earth-Moon over {span / DAY:.0f} days, wall time to keep max |dE/E| under target")
+    for target in targets:
+        print(f"Target {target:.0e}")
+        results = []
+        for name in SYMPLECTIC:
+            found = TimeToTarget(name, target, span)
+            if found is None:
+                print(f"    {name:<12} not reached")
+                continue
+            dt, error, elapsed = found
+            results.append((elapsed, name))
+            print(f"    {name:<12} dt {dt / 3600:>8.3f} h | |dE/E| {error:.2e} | {elapsed:.3f} s")
+        if results:
+            print(f"    cheapest: {min(results)[1]}")
+
+
+IntegratorBench()
@@ -0,0 +1,55 @@
+import sys
+import os
+import time
+import numpy as np
+
+currentFilePath = os.path.dirname(__file__)
+animationsDir = os.path.join(currentFilePath, "..", "Animations")
+sys.path.append(
+    os.path.abspath(animationsDir)
+)
+
+from Utils.NBody import NBodySystem
+from Utils.Kernels import HAVE_NUMBA
+from Utils import Scenarios
+
+
+#Earth-Moon system of ExampleAnim.py
+def EarthMoon(use_numba):
+    system, _ = Scenarios.earth_moon(use_numba=use_numba)
+    return system
+
+#Random cluster of N bodies
+def Cluster(N, use_numba):
+    rng = np.random.default_rng(0)
+    return NBodySystem(rng.normal(size=(N, 2)) * 10, rng.normal(size=(N, 2)), np.ones(N), use_numba=use_numba)
+
+#Time per step for repeated step() calls and one advance() call
+def TimePerStep(makeSystem, steps, dt):
+    system = makeSystem(False)
+    start = time.perf_counter()
+    for _ in range(steps):
+        system.step(dt)
+    results = [("step() loop", (time.perf_counter() - start) / steps)]
+
+    modes = [("advance() NumPy buffers", False)] + ([("advance() Numba", True)] if HAVE_NUMBA else [])
+    for name, useNumba in modes:
+        system = makeSystem(useNumba)
+        system.advance(dt, 1)            #Compile / allocate outside the timing
+        start = time.perf_counter()
+        system.advance(dt, steps)
+        results.append((name, (time.perf_counter() - start) / steps))
+    return results
+
+
+def KernelBench():
+    cases = [("Earth-Moon", EarthMoon, 5000, Scenarios.earth_moon()[1]), ("Cluster N=64", lambda u: Cluster(64, u), 500, 1e-3)]
+    for label, makeSystem, steps, dt in cases:
+        print(f"{label} ({steps} steps)")
+        for name, perStep in TimePerStep(makeSystem, steps, dt):
+            print(f"    {name:<25} {perStep * 1e9:>12.0f} ns/step")
+    if not HAVE_NUMBA:
+        print("Numba not installed, compiled kernel skipped")
+
+
+KernelBench()
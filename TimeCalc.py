@@ -1,4 +1,6 @@
-from datetime import time
+from datetime import time, datetime, timezone
+from collections import namedtuple, OrderedDict
+import numpy as np
 
 #Compute days since Jan 1st 4713 BCE using the Meeus method
 #Note this is valid for positive and negative years, but wont work for negative Julian days
@@ -20,37 +22,108 @@ def ComputeJulianDate(year, month, day):
     JD = int(365.25 * (year + 4716)) + int(30.6001 * (month + 1)) + day + B - 1524.5
     return JD
 
-#Takes in a sidereal degrees, and returns in a time container
-#Note that using this in function can introduce computational error
-def MeanSiderealDegToHour(MST_deg):
-    MST_hr = MST_deg / 15.0
+#Array version of ComputeJulianDate, year/month/day can be NumPy arrays (or scalars) that broadcast together
+#Branches become masks and int() becomes np.trunc, so results are identical to the scalar version
+def ComputeJulianDateArray(year, month, day):
+    year = np.asarray(year, dtype=np.float64)
+    month = np.asarray(month, dtype=np.float64)
+    day = np.asarray(day, dtype=np.float64)
+
+    #Month Adjustment, jan and feb become months 13 and 14 of the previous year
+    earlyMonth = month <= 2
+    year = np.where(earlyMonth, year - 1, year)
+    month = np.where(earlyMonth, month + 12, month)
+
+    #Adjustment for switch to gregorian calander from julian calander in 1582
+    A = np.trunc(year / 100)
+    B = np.where(year > 1582, 2 - A + np.trunc(A / 4), 0.0)
+
+    JD = np.trunc(365.25 * (year + 4716)) + np.trunc(30.6001 * (month + 1)) + day + B - 1524.5
+    return JD
+
+#Two part Julian date, JD = day + fraction
+#day is the integer Julian day number (the day starting at noon), fraction is the offset from that noon in [-0.5, 0.5)
+#Keeping the two apart means a full JD around 2.45e6 is never formed in a single float64,
+#so the time of day keeps sub-microsecond resolution. Both fields can be NumPy arrays.
+JulianEpoch = namedtuple('JulianEpoch', ['day', 'fraction'])
+
+MICROSECONDS_PER_DAY = 86_400_000_000
+UNIX_EPOCH_JD_DAY = 2440588                                 #1970-01-01T00:00 UTC is JD 2440588 - 0.5
+
+#Epoch from a UTC calendar date and time of day, all arguments can be arrays (day must be whole)
+def ComputeJulianEpoch(year, month, day, hour=0, minute=0, second=0, microsecond=0):
+    #Julian day number of the noon that follows midnight on this date
+    jdDay = ComputeJulianDateArray(year, month, day) + 0.5
+
+    #Time of day in whole microseconds, then offset from noon
+    us = ((np.asarray(hour, dtype=np.int64) * 60 + minute) * 60 + second) * 1_000_000 + np.asarray(microsecond, dtype=np.int64)
+    fraction = (us - MICROSECONDS_PER_DAY // 2) / MICROSECONDS_PER_DAY
+    return JulianEpoch(jdDay, fraction)
+
+#Epoch from NumPy datetime64 UTC timestamps (any unit, scalar or array)
+def EpochFromDatetime64(timestamps):
+    us = np.asarray(timestamps, dtype='datetime64[us]').astype(np.int64)
+    days, us = np.divmod(us, MICROSECONDS_PER_DAY)
+    return JulianEpoch((UNIX_EPOCH_JD_DAY + days).astype(np.float64), (us - MICROSECONDS_PER_DAY // 2) / MICROSECONDS_PER_DAY)
+
+#Epoch from a datetime, naive datetimes are taken as UTC
+def EpochFromDatetime(timestamp):
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return EpochFromDatetime64(np.datetime64(timestamp, 'us'))
+
+MICROSECONDS_PER_DEGREE = 240_000_000                       #One degree of rotation is 4 minutes of sidereal time
 
-    #Containers
-    hourCont = int(MST_hr)
-    minuteCont = int((MST_hr - hourCont) * 60)
-    secondsCont = int(((MST_hr - hourCont) * 60 - minuteCont) * 60)
-    microsecondsCont = int(((((MST_hr - hourCont) * 60 - minuteCont) * 60 - secondsCont) * 1e6))
+#Sidereal degrees to float hours, works on arrays
+def MeanSiderealDegToFloatHours(MST_deg):
+    return np.asarray(MST_deg, dtype=np.float64) / 15.0
 
-    MST_time = time(hour=hourCont, minute=minuteCont, second=secondsCont, microsecond=microsecondsCont)
-    return MST_time
+#Sidereal float hours to degrees, works on arrays
+def FloatHoursToMeanSiderealDeg(MST_hr):
+    return (np.asarray(MST_hr, dtype=np.float64) * 15.0) % 360
+
+#Sidereal degrees to packed integer (hour, minute, second, microsecond), shape (..., 4) int64
+#Rounds once to the nearest microsecond and splits with integer division, so there is no
+#repeated float subtraction and degrees -> packed -> degrees -> packed is stable
+def MeanSiderealDegToPacked(MST_deg):
+    us = np.rint(np.asarray(MST_deg, dtype=np.float64) * MICROSECONDS_PER_DEGREE).astype(np.int64) % MICROSECONDS_PER_DAY
+    minutes, us = np.divmod(us, 60_000_000)
+    hours, minutes = np.divmod(minutes, 60)
+    seconds, us = np.divmod(us, 1_000_000)
+    return np.stack([hours, minutes, seconds, us], axis=-1)
+
+#Packed (hour, minute, second, microsecond) back to degrees, works on arrays
+def MeanSiderealPackedToDeg(packed):
+    packed = np.asarray(packed, dtype=np.int64)
+    us = ((packed[..., 0] * 60 + packed[..., 1]) * 60 + packed[..., 2]) * 1_000_000 + packed[..., 3]
+    return (us / MICROSECONDS_PER_DEGREE) % 360
+
+#Packed values to time containers, only for callers that really want the objects
+#A single (4,) row gives one time, anything larger gives a list
+def MeanSiderealPackedToTime(packed):
+    packed = np.asarray(packed, dtype=np.int64)
+    if packed.ndim == 1:
+        return time(*packed.tolist())
+    return [time(*row) for row in packed.reshape(-1, 4).tolist()]
+
+#Takes in a sidereal degrees, and returns in a time container
+#Rounded to the nearest microsecond through the packed path
+def MeanSiderealDegToHour(MST_deg):
+    return MeanSiderealPackedToTime(MeanSiderealDegToPacked(MST_deg))
 
 
 #Takes in a sidereal hour in a time container, and returns a degrees
-#Note that using this in function can introduce computational error
 def MeanSiderealHourToDeg(MST_Hour):
     #Break into components
-    MST_hr = MST_Hour.hour + MST_Hour.minute / 60.0 + MST_Hour.second / 3600.0 + MST_Hour.microsecond / 3_600_000_000.0
-    
+    packed = (MST_Hour.hour, MST_Hour.minute, MST_Hour.second, MST_Hour.microsecond)
+
     #Hours to degrees and normalize
-    MST_deg = (MST_hr * 15.0) % 360
+    MST_deg = float(MeanSiderealPackedToDeg(packed))
     
     return MST_deg
 
-def GetSiderealFromUTC(year, month, day, longitude):
-    #Calulate Julian Datetime
-    JD = ComputeJulianDate(year, month, day)
-
-    #Calulate Greenwich mean sidereal time (GMST)
+#Greenwich mean sidereal time in degrees for a Julian date, works on floats and arrays
+def ComputeGMST(JD):
     T = (JD - 2451545.0) / 36525                            #Julian centuries since epoch J2000.0 (reference epoch for positions of astrnomical objects) at 12:00
     
     GMST_deg = ((280.46061837                               #GMST since J2000.0
@@ -58,10 +131,122 @@ def GetSiderealFromUTC(year, month, day, longitude):
               + (0.000387933 * (T * T))                     #Precession correction
               - ((T * T * T) / 38710000.0))                 #More corrections
               % 360)                                        #Normalize to a single rotation
-    
-    #GMST_hr = GMST_deg / 15.0
+    return GMST_deg
+
+#Local mean sidereal time in degrees
+def GetSiderealDegFromUTC(year, month, day, longitude):
+    #Calulate Julian Datetime
+    JD = ComputeJulianDate(year, month, day)
+
+    #Calulate Greenwich mean sidereal time (GMST)
+    GMST_deg = ComputeGMST(JD)
 
     #Convert to local sidereal time
     LMST_deg = (GMST_deg + longitude) % 360
+    return LMST_deg
+
+#Array version of GetSiderealDegFromUTC, all inputs can be NumPy arrays that broadcast together
+#Returns float64 LMST degrees, identical to the scalar version
+def GetSiderealDegFromUTCArray(year, month, day, longitude):
+    JD = ComputeJulianDateArray(year, month, day)
+    GMST_deg = ComputeGMST(JD)
+    LMST_deg = (GMST_deg + np.asarray(longitude, dtype=np.float64)) % 360
+    return LMST_deg
+
+#Greenwich mean sidereal time in degrees from a two part epoch, same polynomial as ComputeGMST
+#The whole 360 degree turns per elapsed day are dropped before anything large is multiplied,
+#which keeps the result accurate to ~1e-12 degrees instead of ~1e-8
+def ComputeGMSTFromEpoch(epoch):
+    days = np.asarray(epoch.day, dtype=np.float64) - 2451545.0      #Whole days since J2000.0, exact
+    fraction = np.asarray(epoch.fraction, dtype=np.float64)
+    T = (days + fraction) / 36525                                  #Julian centuries, only used in small corrections
+
+    GMST_deg = ((280.46061837
+              + ((0.98564736629 * days) % 360)                     #360.98564736629 * days less the whole turns
+              + (360.98564736629 * fraction)
+              + (0.000387933 * (T * T))
+              - ((T * T * T) / 38710000.0))
+              % 360)
+    return GMST_deg
+
+#Local mean sidereal time in degrees from a two part epoch, works on arrays
+def GetSiderealDegFromEpoch(epoch, longitude):
+    return (ComputeGMSTFromEpoch(epoch) + np.asarray(longitude, dtype=np.float64)) % 360
+
+#Local mean sidereal time in degrees from UTC timestamps: a datetime, or datetime64 scalars/arrays
+def GetSiderealDegFromTimestamp(timestamp, longitude):
+    if isinstance(timestamp, datetime):
+        epoch = EpochFromDatetime(timestamp)
+    else:
+        epoch = EpochFromDatetime64(timestamp)
+    return GetSiderealDegFromEpoch(epoch, longitude)
+
+#Local mean sidereal time as float hours, no time object is built
+def GetSiderealHoursFromUTC(year, month, day, longitude):
+    return GetSiderealDegFromUTC(year, month, day, longitude) / 15.0
+
+def GetSiderealFromUTC(year, month, day, longitude):
+    #Calulate local sidereal time in degrees
+    LMST_deg = GetSiderealDegFromUTC(year, month, day, longitude)
  
-    return MeanSiderealDegToHour(LMST_deg)
\ No newline at end of file
+    return MeanSiderealDegToHour(LMST_deg)
+
+
+#Bounded LRU cache of GMST per date, for schedulers asking about the same dates again and again
+#A cached query is one addition and one modulo, and gives exactly GetSiderealDegFromUTC's result
+class SiderealCache:
+    def __init__(self, maxsize=4096):
+        self.maxsize = max(1, int(maxsize))
+        self.table = OrderedDict()          #(year, month, day) -> GMST degrees, oldest use first
+
+        #Counters
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.table)
+
+    def _store(self, key, GMST_deg):
+        self.table[key] = GMST_deg
+        self.table.move_to_end(key)
+        while len(self.table) > self.maxsize:
+            self.table.popitem(last=False)
+
+    def GetGMST(self, year, month, day):
+        #Greenwich mean sidereal time in degrees for a date
+        key = (year, month, day)
+        GMST_deg = self.table.get(key)
+        if GMST_deg is not None:
+            self.hits += 1
+            self.table.move_to_end(key)
+            return GMST_deg
+
+        self.misses += 1
+        GMST_deg = ComputeGMST(ComputeJulianDate(year, month, day))
+        self._store(key, GMST_deg)
+        return GMST_deg
+
+    def GetSiderealDeg(self, year, month, day, longitude):
+        #Same result as GetSiderealDegFromUTC
+        return (self.GetGMST(year, month, day) + longitude) % 360
+
+    def GetSidereal(self, year, month, day, longitude):
+        #Same result as GetSiderealFromUTC
+        return MeanSiderealDegToHour(self.GetSiderealDeg(year, month, day, longitude))
+
+    def Precompute(self, years, months, days):
+        #Fill the cache for many dates at once through the array path, e.g. a run of consecutive days
+        years, months, days = np.broadcast_arrays(years, months, days)
+        GMST_deg = ComputeGMST(ComputeJulianDateArray(years, months, days))
+        for year, month, day, value in zip(years.ravel().tolist(), months.ravel().tolist(), days.ravel().tolist(), GMST_deg.ravel().tolist()):
+            self._store((year, month, day), value)
+
+    def Stats(self):
+        total = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self.table), 'maxsize': self.maxsize,
+                'hit_rate': self.hits / total if total else 0.0}
+
+    def Clear(self):
+        self.table.clear()
+        self.hits = 0
+        self.misses = 0
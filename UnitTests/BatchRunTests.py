@@ -0,0 +1,120 @@
+import sys
+import os
+import tempfile
+import numpy as np
+
+currentFilePath = os.path.dirname(__file__)
+animationsDir = os.path.join(currentFilePath, "..", "Animations")
+sys.path.append(
+    os.path.abspath(animationsDir)
+)
+
+import BatchRun
+from Utils import Sweep
+from Utils.Checkpoint import load_checkpoint, restore_system, save_checkpoint
+from Utils.NBody import NBodySystem
+from Utils.Collisions import CollisionHandler
+
+
+#Test a headless run writes snapshots and never pulls in a GUI library
+def HeadlessRunTest():
+    with tempfile.TemporaryDirectory() as output:
+        BatchRun.main(['run', 'two_body', '--duration', '1.0', '--snapshot-every', '0.25', '--output', output, '--quiet'])
+        snapshots = sorted(os.listdir(output))
+        final = np.load(os.path.join(output, snapshots[-1]))
+        print(f"Headless run: {len(snapshots)} snapshots, final time {float(final['time']):.3f}")
+        assert len(snapshots) == 5
+        assert abs(float(final['time']) - 1.0) < 1e-9
+
+    guiModules = [name for name in sys.modules if name.split('.')[0] in ('matplotlib', 'PyQt6', 'pyqtgraph')]
+    print(f"GUI modules imported: {guiModules}")
+    assert not guiModules
+
+#Test a small sweep on a process pool, a fast enough body 1 must escape
+def SweepTest():
+    configs = Sweep.grid_configs({'v1x': [7.0, 60.0], 'm2': [500.0, 1000.0]})
+    rows = Sweep.run_sweep(configs, duration=20.0, dt=0.001, workers=2, escape_radius=200.0)
+    for row in rows:
+        print(f"Sweep: v1x={row['v1x']:.1f} m2={row['m2']:.1f} | E {row['E']:.2f} h {row['h']:.2f} | escaped {row['escaped']} | {row['runtime']:.3f} s")
+        assert row['escaped'] == (row['v1x'] == 60.0)
+
+    #The vectorized ensemble must agree with the per-run integration
+    for row, ensembleRow in zip(rows, Sweep.run_sweep_ensemble(configs, duration=20.0, dt=0.001, escape_radius=200.0)):
+        assert row['escaped'] == ensembleRow['escaped'] and row['collided'] == ensembleRow['collided']
+        assert abs(row['E'] - ensembleRow['E']) < 1e-6 * abs(row['E'])
+    print("Sweep: ensemble rows match process pool rows")
+
+    with tempfile.TemporaryDirectory() as output:
+        table = os.path.join(output, 'sweep.csv')
+        Sweep.write_table(rows, table)
+        with open(table) as file:
+            assert len(file.readlines()) == len(rows) + 1
+
+#Test ensemble members that collide report the state run_two_body stopped at, not what came after
+def SweepCollisionTest():
+    #Three of the four close in on the other body, one nearly head on
+    configs = Sweep.grid_configs({'v1x': [7.0, 10.0], 'v1y': [5.0, -10.0]}, base={'v2x': -1.0, 'v2y': 1.0})
+    rows = Sweep.run_sweep(configs, duration=10.0, dt=0.001, workers=1, collision_radius=3.0)
+    ensembleRows = Sweep.run_sweep_ensemble(configs, duration=10.0, dt=0.001, collision_radius=3.0)
+    assert sum(row['collided'] for row in rows) == 3
+    for row, ensembleRow in zip(rows, ensembleRows):
+        assert row['collided'] == ensembleRow['collided'] and row['escaped'] == ensembleRow['escaped']
+        for name in ('E', 'h', 'min_separation', 'final_separation'):
+            assert abs(row[name] - ensembleRow[name]) <= 1e-9 * max(1.0, abs(row[name]))
+    print(f"Sweep collisions: {sum(row['collided'] for row in rows)} collided members match run_two_body")
+
+#Test a run stopped at a checkpoint and resumed ends where an uninterrupted run does
+def CheckpointResumeTest():
+    with tempfile.TemporaryDirectory() as output:
+        full, cut = os.path.join(output, 'full'), os.path.join(output, 'cut')
+        checkpoint = os.path.join(output, 'cut.ckpt')
+        #Softened, so the resumed run only matches when the checkpoint carries the softening length
+        BatchRun.main(['run', 'two_body', '--duration', '1.0', '--snapshot-every', '0.25', '--output', full, '--softening', '2.0', '--quiet'])
+        BatchRun.main(['run', 'two_body', '--duration', '0.5', '--snapshot-every', '0.25', '--output', cut, '--softening', '2.0',
+                       '--checkpoint', checkpoint, '--checkpoint-every', '0.1', '--quiet'])
+        assert not os.path.exists(checkpoint + '.tmp')
+
+        BatchRun.main(['resume', checkpoint, '--duration', '1.0', '--quiet'])
+        assert sorted(os.listdir(cut))[-1] == sorted(os.listdir(full))[-1] == 'snapshot_000004.npz'
+        expected = np.load(os.path.join(full, 'snapshot_000004.npz'))
+        resumed = np.load(os.path.join(cut, 'snapshot_000004.npz'))
+        deviation = np.max(np.abs(expected['positions'] - resumed['positions']))
+        print(f"Resume: final time {float(resumed['time']):.3f}, max deviation from uninterrupted run {deviation:.3e}")
+        assert abs(float(resumed['time']) - 1.0) < 1e-9
+        assert deviation < 1e-9
+
+        #A version 1 checkpoint written before softening and the integrator were saved still restores
+        old = {key: value for key, value in load_checkpoint(checkpoint).items() if key not in ('softening', 'integrator')}
+        system = restore_system(old)
+        assert system.integrator.name == 'verlet' and system.softening == 0.0 and system.collisions is None
+
+        #After a merger the checkpoint carries the merged radii and the ids of the bodies left
+        positions = [[0.0, 0.0], [0.05, 0.0], [0.09, 0.0], [5.0, 0.0], [-5.0, 1.0], [0.0, 5.0]]
+        velocities = [[0.0, 1.0], [1.0, 0.0], [0.0, -2.0], [0.0, 0.3], [0.1, 0.0], [-0.3, 0.0]]
+        system = NBodySystem(positions, velocities, [1.0, 2.0, 3.0, 0.5, 0.5, 0.5], collisions=CollisionHandler([0.03, 0.03, 0.03, 0.1, 0.1, 0.1]))
+        system.advance(1e-3, 10)
+        assert len(system) == 4
+        merged = os.path.join(output, 'merged.ckpt')
+        save_checkpoint(merged, system)
+        restored = restore_system(load_checkpoint(merged))
+        assert np.array_equal(restored.collisions.radii, system.collisions.radii)
+        assert restored.collisions.ids.tolist() == system.collisions.ids.tolist() == [0, 3, 4, 5]
+        assert restored.collisions.merge and restored.collisions.cell_size is None
+
+        #Both keep merging the same way, the far bodies are set on a collision course
+        for run in (system, restored):
+            run.velocities[1:] = -run.positions[1:] / 2.0
+            run.refresh()
+            run.advance(1e-3, 3000)
+        assert len(restored) == len(system) < 4
+        assert restored.collisions.ids.tolist() == system.collisions.ids.tolist()
+        assert np.array_equal(restored.collisions.radii, system.collisions.radii)
+        assert np.allclose(restored.positions, system.positions, rtol=0.0, atol=1e-9)
+        print(f"Resume with collisions: {len(restored)} bodies left, ids {restored.collisions.ids.tolist()}")
+
+
+if __name__ == "__main__":
+    HeadlessRunTest()
+    SweepTest()
+    SweepCollisionTest()
+    CheckpointResumeTest()
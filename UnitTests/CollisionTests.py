@@ -0,0 +1,109 @@
+import sys
+import os
+import time
+import numpy as np
+
+currentFilePath = os.path.dirname(__file__)
+animationsDir = os.path.join(currentFilePath, "..", "Animations")
+sys.path.append(
+    os.path.abspath(animationsDir)
+)
+
+from Utils import Scenarios
+from Utils.NBody import NBodySystem
+from Utils.Collisions import CollisionHandler, find_collisions, collision_groups
+from Utils.Worker import PhysicsWorker
+
+
+#Test the spatial hash finds exactly the touching pairs a brute force check finds
+def FindCollisionsTest():
+    rng = np.random.default_rng(11)
+    for dim in (2, 3):
+        positions = rng.uniform(-1.0, 1.0, (1500, dim))
+        radii = rng.uniform(0.002, 0.03, 1500)
+        pairs = find_collisions(positions, radii)
+
+        distance = np.linalg.norm(positions[:, np.newaxis] - positions[np.newaxis], axis=-1)
+        touching = np.triu(distance < radii[:, np.newaxis] + radii[np.newaxis], k=1)
+        expected = np.stack(np.nonzero(touching), axis=1)
+        assert np.array_equal(pairs, expected)
+        print(f"Spatial hash ({dim}D): {len(pairs)} touching pairs, same as brute force")
+
+    #A few bodies skip the hash and test every pair, with the same result
+    positions = rng.uniform(-0.1, 0.1, (40, 2))
+    radii = rng.uniform(0.002, 0.03, 40)
+    distance = np.linalg.norm(positions[:, np.newaxis] - positions[np.newaxis], axis=-1)
+    expected = np.stack(np.nonzero(np.triu(distance < radii[:, np.newaxis] + radii[np.newaxis], k=1)), axis=1)
+    assert len(expected) > 0 and np.array_equal(find_collisions(positions, radii), expected)
+    assert find_collisions(positions[:1], radii[:1]).shape == (0, 2)
+
+    #Groups join chains of contacts
+    groups = collision_groups(np.array([[4, 9], [1, 2], [2, 7], [9, 12]]))
+    assert [group.tolist() for group in groups] == [[1, 2, 7], [4, 9, 12]]
+
+#Test mergers conserve mass, momentum and the centre of mass, and keep volume in the radii
+def MergerTest():
+    positions = [[0.0, 0.0], [0.05, 0.0], [0.09, 0.0], [5.0, 0.0], [-5.0, 1.0]]
+    velocities = [[0.0, 1.0], [1.0, 0.0], [0.0, -2.0], [0.0, 0.3], [0.1, 0.0]]
+    masses = [1.0, 2.0, 3.0, 0.5, 0.5]
+    handler = CollisionHandler([0.03, 0.03, 0.03, 0.1, 0.1])
+    system = NBodySystem(positions, velocities, masses, collisions=handler)
+    momentum, com, total = system.momentum(), system.masses @ system.positions, np.sum(system.masses)
+
+    taken = system.advance(1e-4, 10)
+    assert taken == 10 and len(system) == 3 and len(handler.events) == 1
+    assert handler.events[0][1].tolist() == [0, 1, 2]
+    assert np.isclose(np.sum(system.masses), total) and system.masses[0] == 6.0
+    assert np.allclose(system.momentum(), momentum)
+    assert np.allclose(system.masses @ system.positions, com + 10 * 1e-4 * momentum, atol=1e-9)
+    assert np.isclose(handler.radii[0], 0.03 * 3 ** (1.0 / 3.0)) and handler.radii.shape == (3,)
+    assert handler.ids.tolist() == [0, 3, 4]
+    print(f"Merger: 3 bodies into one of mass {system.masses[0]:.1f}, momentum kept to {np.max(np.abs(system.momentum() - momentum)):.1e}")
+
+    #The forces after a merger come from the step's own evaluation, only the merged body is evaluated again
+    system = NBodySystem(positions, velocities, masses, integrator='yoshida4', collisions=CollisionHandler([0.03, 0.03, 0.03, 0.1, 0.1]))
+    evaluated = []
+    compute = system.compute_accelerations
+    system.compute_accelerations = lambda positions, targets=None: evaluated.append(len(positions) if targets is None else len(targets)) or compute(positions, targets)
+    system.advance(1e-4, 1)
+    assert len(system) == 3 and evaluated == [5, 5, 5, 1]
+    assert np.allclose(system.accelerations, compute(system.positions), rtol=1e-12, atol=0.0)
+
+#Test merge=False stops the run at the step where the bodies first touch
+def StopAtContactTest():
+    system = NBodySystem([[-10.0, 0.0], [10.0, 0.0]], [[0.0, 0.0], [0.0, 0.0]], [100.0, 100.0], G=1.0,
+                         collisions=CollisionHandler([1.0, 1.0], merge=False))
+    taken = system.advance(1e-3, 100000)
+    separation = np.linalg.norm(system.positions[1] - system.positions[0])
+    assert taken < 100000 and separation < 2.0 and len(system) == 2
+    assert abs(system.sim_time - taken * 1e-3) < 1e-9
+
+    #One step back the bodies were still apart
+    check = NBodySystem([[-10.0, 0.0], [10.0, 0.0]], [[0.0, 0.0], [0.0, 0.0]], [100.0, 100.0], G=1.0)
+    check.advance(1e-3, taken - 1)
+    assert np.linalg.norm(check.positions[1] - check.positions[0]) >= 2.0
+    print(f"Contact: stopped after {taken} steps at separation {separation:.4f}")
+
+#Test a worker's mergers reach the GUI side, whose mirror system shrinks with them
+def WorkerMergerTest():
+    system, dt = Scenarios.cluster(300, dim=2, seed=4)
+    system.collisions = CollisionHandler(0.02)
+    with PhysicsWorker(system, dt, speed=None, mode='thread', max_steps_per_batch=10) as worker:
+        deadline = time.perf_counter() + 30
+        while len(system) == 300 and time.perf_counter() < deadline:
+            time.sleep(0.05)
+            worker.read_into(system)
+    assert len(system) < 300 and system.positions.shape == (len(system), 2)
+    assert np.isclose(np.sum(system.masses), 1.0)
+
+    #The ids of the bodies left come with the snapshot, in order, so trails can be compacted to match
+    ids = system.collisions.ids
+    assert ids.shape == (len(system),) and np.all(np.diff(ids) > 0) and ids[-1] < 300
+    print(f"Worker mergers: {len(system)} bodies left at time {system.sim_time:.3f}")
+
+
+if __name__ == "__main__":
+    FindCollisionsTest()
+    MergerTest()
+    StopAtContactTest()
+    WorkerMergerTest()
@@ -0,0 +1,90 @@
+import sys
+import os
+import tempfile
+import numpy as np
+
+currentFilePath = os.path.dirname(__file__)
+animationsDir = os.path.join(currentFilePath, "..", "Animations")
+sys.path.append(
+    os.path.abspath(animationsDir)
+)
+
+from Utils import Scenarios
+from Utils.Diagnostics import Diagnostics
+from Utils.Profiler import FrameProfiler
+
+
+#Test the history keeps the newest decimated rows and the drift matches the system's own diagnostics
+def DiagnosticsTest():
+    system, dt = Scenarios.two_body()
+    messages = []
+    diagnostics = Diagnostics(system.dim, capacity=50, every=3, pair=(0, 1), log_interval=1.0, log=messages.append)
+
+    E0 = diagnostics.sample(system)[1]
+    for frame in range(300):
+        system.advance(dt, 10)
+        diagnostics.sample(system)
+        diagnostics.maybe_log(now=0.1 * frame)
+
+    times = diagnostics.series('time')
+    assert len(diagnostics) == 50 and np.allclose(np.diff(times), 3 * 10 * dt)
+    assert np.isclose(times[-1], 300 * 10 * dt)
+    assert np.isclose(diagnostics.latest()['pair_E'], system.specific_energy(0, 1))
+    assert np.isclose(diagnostics.drift()['energy'], abs((system.total_energy() - E0) / E0))
+    print(f"Diagnostics: {len(diagnostics)} rows, drift {diagnostics.drift()}")
+
+    #After a rebase drift is measured from the next stored row
+    diagnostics.rebase()
+    assert diagnostics.drift() is None
+    while diagnostics.sample(system) is None:
+        pass
+    assert diagnostics.drift()['energy'] == 0.0 and len(diagnostics) == 50
+
+    #Logging is rate limited to one line per simulated wall clock second
+    assert len(messages) == 30
+    print(f"Diagnostics log: {messages[-1]}")
+
+    with tempfile.TemporaryDirectory() as output:
+        table = os.path.join(output, 'diagnostics.csv')
+        diagnostics.export(table)
+        with open(table) as file:
+            assert file.readline().strip().split(',') == diagnostics.columns
+        arrays = np.load(diagnostics.export(os.path.join(output, 'diagnostics.npz')))
+        assert np.array_equal(arrays['energy'], diagnostics.series('energy'))
+
+#Test frame intervals split into stages plus 'other', with hooks and summaries
+def ProfilerTest():
+    profiler = FrameProfiler(['physics', 'draw_prep', 'draw'], window=10)
+    frames = []
+    profiler.add_hook(frames.append)
+
+    for frame in range(25):
+        profiler.begin_frame(now=0.02 * frame)
+        with profiler.stage('physics'):
+            sum(range(1000))
+        with profiler.stage('draw_prep'):
+            pass
+        profiler.end_frame(steps=100, now=0.02 * frame + 0.005)
+        #The draw after the callback returned counts for this frame, only the first mark
+        profiler.mark('draw', now=0.02 * frame + 0.008)
+        profiler.mark('draw', now=0.02 * frame + 0.015)
+    profiler.begin_frame(now=0.5)
+
+    summary = profiler.summary()
+    print(f"Profiler: {summary['fps']:.1f} FPS, {summary['steps_per_second']:.0f} steps/s, physics {summary['physics_ms']:.3f} ms")
+    assert len(frames) == 25 and len(profiler) == 10
+    assert np.isclose(summary['fps'], 50.0) and np.isclose(summary['steps_per_second'], 5000.0)
+    for record in frames:
+        assert np.isclose(record['physics'] + record['draw_prep'] + record['draw'] + record['other'], record['interval'])
+        assert np.isclose(record['draw'], 0.003)
+    assert np.isclose(summary['draw_ms'], 3.0) and np.isclose(summary['interval_ms'], 20.0)
+    assert profiler.overlay_text().startswith("50 FPS")
+
+    with tempfile.TemporaryDirectory() as output:
+        with open(profiler.export(os.path.join(output, 'frames.csv'))) as file:
+            assert len(file.readlines()) == 11
+        profiler.export(os.path.join(output, 'summary.json'))
+
+
+DiagnosticsTest()
+ProfilerTest()
@@ -0,0 +1,58 @@
+import sys
+import os
+import numpy as np
+
+currentFilePath = os.path.dirname(__file__)
+animationsDir = os.path.join(currentFilePath, "..", "Animations")
+sys.path.append(
+    os.path.abspath(animationsDir)
+)
+
+from Utils import Scenarios
+from Utils.NBody import NBodySystem
+from Utils.Kepler import KeplerOrbit, TwoBodyPropagator, solve_kepler, solve_kepler_hyperbolic
+
+
+#Test Kepler's equation is solved for every eccentricity and many turns of mean anomaly
+def SolverTest():
+    M = np.linspace(-40.0, 40.0, 2001)
+    for e in (0.0, 0.3, 0.9, 0.999):
+        E = solve_kepler(M, e)
+        assert np.max(np.abs(E - e * np.sin(E) - M)) < 1e-12
+        assert np.all(np.diff(E) > 0)
+    for e in (1.001, 1.5, 10.0):
+        H = solve_kepler_hyperbolic(M, e)
+        assert np.max(np.abs((e * np.sinh(H) - H - M) / np.maximum(1.0, np.abs(M)))) < 1e-12
+    print("Kepler solver: residuals below 1e-12")
+
+#Test the propagator against a tight numerical integration for bound, unbound and 3D orbits
+def PropagatorTest():
+    cases = [
+        ("2D ellipse", Scenarios.two_body(integrator='yoshida6')[0]),
+        ("2D hyperbola", Scenarios.two_body(v1=(60.0, 0.0), integrator='yoshida6')[0]),
+        ("3D inclined", NBodySystem([[0.0, 0.0, 0.0], [1.0, 0.2, 0.1]], [[0.0, 0.0, 0.0], [0.1, 0.9, 0.4]], [1.0, 1e-3], integrator='yoshida6')),
+    ]
+    for label, system in cases:
+        propagator = TwoBodyPropagator.from_system(system)
+        E, h = system.specific_energy(0, 1), system.specific_angular_momentum(0, 1)
+        assert np.isclose(propagator.orbit.E, E) and np.allclose(propagator.orbit.h, np.linalg.norm(h) if np.ndim(h) else h)
+
+        times, expected = [], []
+        for _ in range(5):
+            system.advance(0.001, 1000)
+            times.append(system.sim_time)
+            expected.append(system.positions.copy())
+        positions, _ = propagator.state(np.array(times))
+        error = np.max(np.abs(positions - np.array(expected)))
+        print(f"Kepler {label}: e = {propagator.orbit.e:.3f}, max deviation from integration {error:.3e}")
+        assert positions.shape == (5, 2, system.dim)
+        assert error < 1e-9
+
+    #A circular orbit comes back to its start after one period
+    orbit = KeplerOrbit([1.0, 0.0], [0.0, 1.0], 1.0)
+    positions, velocities = orbit.state(orbit.period)
+    assert np.allclose(positions, [1.0, 0.0], atol=1e-12) and np.allclose(velocities, [0.0, 1.0], atol=1e-12)
+
+
+SolverTest()
+PropagatorTest()
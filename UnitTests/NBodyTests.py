@@ -0,0 +1,215 @@
+import sys
+import os
+import numpy as np
+
+currentFilePath = os.path.dirname(__file__)
+animationsDir = os.path.join(currentFilePath, "..", "Animations")
+sys.path.append(
+    os.path.abspath(animationsDir)
+)
+
+from Utils.NBody import NBodySystem, direct_accelerations
+from Utils.BarnesHut import barnes_hut_accelerations
+from Utils.Kernels import DirectVerletKernel, HAVE_NUMBA
+from Utils.Integrators import make_integrator
+from Utils import Scenarios
+
+
+#Reference two body velocity Verlet step, as it was written in NewtonianOrbit_2Body.UpdateFrame
+def ReferenceStep(r1, r2, v1, v2, m1, m2, G, dt):
+    r12 = r2 - r1
+    Fg = ((G * m1 * m2) * (r12)) / (np.linalg.norm(r12) ** 3)
+    a1 = Fg / m1
+    a2 = -Fg / m2
+
+    vHalf1 = v1 + 0.5 * a1 * dt
+    vHalf2 = v2 + 0.5 * a2 * dt
+    r1 = r1 + vHalf1 * dt
+    r2 = r2 + vHalf2 * dt
+
+    r12 = r2 - r1
+    newA1 = ((G * m2) * (r12)) / (np.linalg.norm(r12) ** 3)
+    newA2 = -((G * m1) * (r12)) / (np.linalg.norm(r12) ** 3)
+    v1 = vHalf1 + 0.5 * newA1 * dt
+    v2 = vHalf2 + 0.5 * newA2 * dt
+    return r1, r2, v1, v2
+
+#Test engine against the original two body integration
+def TwoBodyTest():
+    r1, v1, m1 = np.array([-20.0, 20.0]), np.array([7.0, 5.0]), 100.0
+    r2, v2, m2 = np.array([20.0, -20.0]), np.array([-10.0, -4.0]), 1000.0
+    G, dt = 50.0, 0.01
+
+    system = NBodySystem([r1, r2], [v1, v2], [m1, m2], G=G)
+    for i in range(1000):
+        r1, r2, v1, v2 = ReferenceStep(r1, r2, v1, v2, m1, m2, G, dt)
+        system.step(dt)
+
+    error = max(np.max(np.abs(system.positions - [r1, r2])), np.max(np.abs(system.velocities - [v1, v2])))
+    print(f"Two body: max deviation from reference after 1000 steps: {error:.3e}")
+    assert error < 1e-9
+
+#Jittered lattice of bodies so no pair starts in a close encounter
+def LatticeCluster(n, dim, rng):
+    axes = np.meshgrid(*[np.arange(n, dtype=float)] * dim)
+    positions = np.stack([a.ravel() for a in axes], axis=1)
+    positions += rng.uniform(-0.2, 0.2, positions.shape)
+    return positions, 0.05 * rng.normal(size=positions.shape), rng.uniform(0.5, 1.5, len(positions))
+
+#Test momentum and energy conservation for a random cluster
+def ClusterTest():
+    rng = np.random.default_rng(0)
+    for dim, n in ((2, 14), (3, 6)):
+        system = NBodySystem(*LatticeCluster(n, dim, rng), G=1.0)
+        system.velocities -= system.momentum() / np.sum(system.masses)
+
+        #Newton's third law: total force is zero
+        netForce = system.masses @ system.accelerations
+        E0 = system.total_energy()
+        system.advance(1e-3, 100)
+        drift = abs((system.total_energy() - E0) / E0)
+
+        print(f"Cluster {dim}D: net force {np.max(np.abs(netForce)):.3e}, momentum {np.max(np.abs(system.momentum())):.3e}, energy drift {drift:.3e}")
+        assert np.max(np.abs(netForce)) < 1e-9
+        assert drift < 1e-3
+
+#Test Barnes-Hut against the direct sum, theta = 0 opens every node and must match exactly
+def BarnesHutTest():
+    rng = np.random.default_rng(1)
+    for dim in (2, 3):
+        positions, masses = rng.normal(size=(500, dim)), rng.uniform(0.5, 1.5, 500)
+        exact = direct_accelerations(positions, masses, 1.0)
+        for theta in (0.0, 0.5):
+            approx = barnes_hut_accelerations(positions, masses, 1.0, theta)
+            error = np.median(np.linalg.norm(approx - exact, axis=1) / np.linalg.norm(exact, axis=1))
+            print(f"Barnes-Hut {dim}D theta={theta}: median relative force error {error:.3e}")
+            assert error < (1e-12 if theta == 0.0 else 5e-2)
+
+    #Bodies too close to separate by MAX_DEPTH share a leaf, each must feel only the others in it
+    positions = np.array([[0.0, 0.0], [1e-16, 0.0], [0.0, 1e-16], [1e-16, 1e-16], [1.0, 1.0], [-2.0, 0.5]])
+    masses = np.array([1.0, 2.0, 3.0, 4.0, 1.5, 0.5])
+    exact = direct_accelerations(positions, masses, 1.0)
+    for theta in (0.0, 0.5):
+        approx = barnes_hut_accelerations(positions, masses, 1.0, theta)
+        assert np.allclose(approx, exact, rtol=1e-9, atol=1e-12)
+    print(f"Barnes-Hut crowded leaf: {len(positions)} bodies, 4 in one leaf, match the direct sum")
+
+#Test the batch kernels against repeated single steps
+def BatchKernelTest():
+    rng = np.random.default_rng(2)
+    positions, velocities, masses = LatticeCluster(5, 3, rng)
+
+    reference = NBodySystem(positions, velocities, masses)
+    for _ in range(200):
+        reference.step(1e-3)
+
+    for useNumba in ([False, True] if HAVE_NUMBA else [False]):
+        system = NBodySystem(positions, velocities, masses, use_numba=useNumba)
+        system.advance(1e-3, 200)
+        error = np.max(np.abs(system.positions - reference.positions))
+        print(f"Batch kernel (numba={useNumba}): max deviation from step() loop {error:.3e}, time {system.sim_time:.3f}")
+        assert error < 1e-10
+        assert abs(system.sim_time - reference.sim_time) < 1e-12
+
+#Eccentric (e = 0.99) equal mass binary starting at periapsis, with its orbital period
+def EccentricBinary(integrator):
+    rp = 0.01
+    vp = np.sqrt(2.0 * 1.99 / rp)
+    system = NBodySystem([[-rp / 2, 0.0], [rp / 2, 0.0]], [[0.0, -vp / 2], [0.0, vp / 2]], [1.0, 1.0], G=1.0, integrator=integrator)
+    return system, 2.0 * np.pi * np.sqrt(0.5)
+
+#Test the adaptive integrators hold energy through close approaches where fixed step Verlet fails
+def IntegratorTest():
+    errors = {}
+    for name in ('verlet', 'rk45', 'block', 'logh'):
+        system, period = EccentricBinary(name)
+        E0 = system.total_energy()
+        system.advance(period / 500, 1000)
+        errors[name] = abs((system.total_energy() - E0) / E0)
+        print(f"Integrator {name}: |dE/E| after 2 periapsis passes {errors[name]:.3e}")
+    assert errors['verlet'] > 1e-1
+    assert errors['rk45'] < 1e-6
+    assert errors['block'] < 1e-2
+    assert errors['logh'] < 1e-10
+
+    #The time transformed substeps still end every step exactly on time, and their timing error
+    #along the orbit shrinks with the substep size
+    system, period = EccentricBinary(make_integrator('logh', substeps=32))
+    reference, _ = EccentricBinary('rk45')
+    system.advance(period / 50, 100)
+    reference.advance(period / 50, 100)
+    assert abs(system.sim_time - 2 * period) < 1e-12
+    assert np.linalg.norm(system.positions - reference.positions) < 1e-3
+
+    #Block steps with every body on the top level are plain Verlet
+    rng = np.random.default_rng(4)
+    positions, velocities, masses = LatticeCluster(3, 3, rng)
+    verlet = NBodySystem(positions, velocities, masses, G=1e-3)
+    block = NBodySystem(positions, velocities, masses, G=1e-3, integrator='block')
+    block.integrator.eta = 1e9
+    for _ in range(5):
+        verlet.step(0.01)
+        block.step(0.01)
+    assert np.allclose(verlet.positions, block.positions, rtol=0, atol=1e-13)
+
+    #Accelerations limited to some targets match the full evaluation
+    targets = np.array([3, 0, 26])
+    assert np.allclose(direct_accelerations(positions, masses, 1.0, targets), direct_accelerations(positions, masses, 1.0)[targets])
+
+#Test softening gives the same forces in every kernel, and a potential they conserve through a close pass
+def SofteningTest():
+    rng = np.random.default_rng(5)
+    positions, velocities, masses = LatticeCluster(4, 3, rng)
+    positions[1] = positions[0] + 1e-4                              #A very close pair
+    exact = direct_accelerations(positions, masses, 1.0, softening=0.05)
+    assert np.allclose(barnes_hut_accelerations(positions, masses, 1.0, 0.0, softening=0.05), exact, rtol=1e-12, atol=0)
+    for useNumba in ([False, True] if HAVE_NUMBA else [False]):
+        out = np.empty_like(positions)
+        DirectVerletKernel(len(masses), 3, useNumba).accelerations(positions, masses, 1.0, out, softening=0.05)
+        assert np.allclose(out, exact, rtol=1e-12, atol=0)
+
+    #Plummer force of a single pair, G m r / (r^2 + eps^2)^(3/2)
+    pair = direct_accelerations(np.array([[0.0, 0.0], [0.1, 0.0]]), np.array([1.0, 2.0]), 1.0, softening=0.1)
+    assert np.isclose(pair[0, 0], 2.0 * 0.1 / 0.02 ** 1.5)
+
+    #Head on pass straight through each other, unsoftened this is a singular collision
+    for backend in ('direct', 'barneshut'):
+        system = NBodySystem([[-1.0, 0.0], [1.0, 0.0]], [[0.5, 0.0], [-0.5, 0.0]], [1.0, 1.0], G=1.0, backend=backend, softening=0.05)
+        E0 = system.total_energy()
+        system.advance(1e-3, 4000)
+        drift = abs((system.total_energy() - E0) / E0)
+        print(f"Softening ({backend}): |dE/E| {drift:.2e} after a head on pass")
+        assert drift < 1e-3 and system.positions[0, 0] > 0.0
+
+#Test each symplectic scheme converges at its order on the Earth-Moon orbit
+def SymplecticOrderTest():
+    orders = {'verlet': 2, 'yoshida4': 4, 'forest_ruth': 4, 'yoshida6': 6}
+    for name, order in orders.items():
+        errors = []
+        for dt in (4 * 3600.0, 2 * 3600.0):
+            system, _ = Scenarios.earth_moon(integrator=name)
+            E0 = system.total_energy()
+            for _ in range(int(round(10 * 86400 / dt))):
+                system.step(dt)
+            errors.append(abs((system.total_energy() - E0) / E0))
+        measured = np.log2(errors[0] / errors[1])
+        print(f"Symplectic {name}: |dE/E| {errors[0]:.2e} -> {errors[1]:.2e}, measured order {measured:.2f}")
+        assert abs(measured - order) < 0.6
+
+    #Forest-Ruth carries the force at the end of a step over to the next, three evaluations per step
+    system, _ = Scenarios.earth_moon(integrator='forest_ruth')
+    calls = []
+    compute = system.compute_accelerations
+    system.compute_accelerations = lambda *args: calls.append(args) or compute(*args)
+    for _ in range(10):
+        system.step(3600.0)
+    assert len(calls) == 30
+
+
+TwoBodyTest()
+ClusterTest()
+BarnesHutTest()
+BatchKernelTest()
+IntegratorTest()
+SofteningTest()
+SymplecticOrderTest()
@@ -0,0 +1,93 @@
+import sys
+import os
+import tempfile
+import numpy as np
+
+currentFilePath = os.path.dirname(__file__)
+animationsDir = os.path.join(currentFilePath, "..", "Animations")
+sys.path.append(
+    os.path.abspath(animationsDir)
+)
+
+from Utils import Scenarios
+from Utils.NBody import NBodySystem
+from Utils.Collisions import CollisionHandler
+from Utils.Recorder import TrajectoryRecorder, TrajectoryPlayer
+
+
+#Test every recorded step plays back, including across chunk flushes and a torn last record
+def RecordPlaybackTest():
+    system, dt = Scenarios.two_body()
+    reference, _ = Scenarios.two_body()
+
+    with tempfile.TemporaryDirectory() as output:
+        path = os.path.join(output, 'two_body.traj')
+        with TrajectoryRecorder(path, system, chunk_records=100) as recorder:
+            recorder.record(system)
+            for steps in (7, 250, 43):
+                system.advance(dt, steps, recorder)
+
+        player = TrajectoryPlayer(path)
+        print(f"Recorder: {len(player)} records of {player.dtype.itemsize} bytes")
+        assert len(player) == 301 and isinstance(player.records, np.memmap)
+        assert np.array_equal(player.masses, system.masses) and player.G == system.G
+
+        for index in range(1, len(player)):
+            reference.step(dt)
+            t, positions, velocities = player.frame(index)
+            assert abs(t - reference.sim_time) < 1e-12
+            assert np.allclose(positions, reference.positions, rtol=1e-12, atol=1e-12)
+            assert np.allclose(velocities, reference.velocities, rtol=1e-12, atol=1e-12)
+
+        #Scrubbing by time and pulling one body's path
+        assert player.index_at(0.1005) == 100 and player.index_at(-1.0) == 0 and player.index_at(1e9) == 300
+        assert player.body(1, every=10).shape == (31, 2)
+
+        #A partly written record at the end is ignored
+        with open(path, 'ab') as file:
+            file.write(b'\0' * 10)
+        assert player.reload() == 301
+        player.close()
+
+    #Recording every n-th step
+    with tempfile.TemporaryDirectory() as output:
+        path = os.path.join(output, 'sparse.traj')
+        with TrajectoryRecorder(path, system, every=25) as recorder:
+            system.advance(dt, 110, recorder)
+            system.advance(dt, 90, recorder)
+        player = TrajectoryPlayer(path)
+        assert len(player) == 8 and np.allclose(np.diff(player.times), 25 * dt)
+        print(f"Sparse recorder: {len(player)} records")
+        player.close()
+
+    #A recording closed before its first record opens empty, and playing it back says why it can't
+    with tempfile.TemporaryDirectory() as output:
+        path = os.path.join(output, 'empty.traj')
+        TrajectoryRecorder(path, system).close()
+        player = TrajectoryPlayer(path)
+        assert len(player) == 0 and player.times.shape == (0,)
+        try:
+            player.frame(0)
+            assert False, "an empty recording must not play back"
+        except ValueError as error:
+            assert "no complete records" in str(error)
+        player.close()
+
+    #A merger changes the body count, recording stops there with a clear error and what came before plays back
+    with tempfile.TemporaryDirectory() as output:
+        path = os.path.join(output, 'merger.traj')
+        merging = NBodySystem([[-1.0, 0.0], [1.0, 0.0], [0.0, 5.0]], [[0.0, 0.0]] * 3, [1.0, 1.0, 1.0],
+                              collisions=CollisionHandler(0.1))
+        with TrajectoryRecorder(path, merging) as recorder:
+            try:
+                merging.advance(1e-3, 100000, recorder)
+                assert False, "recording past a merger must fail"
+            except ValueError as error:
+                assert "3 bodies" in str(error) and len(merging) == 2
+        player = TrajectoryPlayer(path)
+        assert len(player) > 0 and player.frame(len(player) - 1)[1].shape == (3, 2)
+        print(f"Merger recording: stopped after {len(player)} records of 3 bodies")
+        player.close()
+
+
+RecordPlaybackTest()
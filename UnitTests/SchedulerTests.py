@@ -0,0 +1,84 @@
+import sys
+import os
+import numpy as np
+
+currentFilePath = os.path.dirname(__file__)
+animationsDir = os.path.join(currentFilePath, "..", "Animations")
+sys.path.append(
+    os.path.abspath(animationsDir)
+)
+
+from Utils.Scheduler import FixedStepScheduler
+
+
+#Test frames that aren't whole steps carry their remainder over to the next frame
+def StepCountTest():
+    scheduler = FixedStepScheduler(0.25)
+    steps = [scheduler.advance(elapsed) for elapsed in (0.125, 0.0625, 0.125, 0.5625, 0.0, 0.125)]
+    assert steps == [0, 0, 1, 2, 0, 1]
+    assert scheduler.accumulator == 0.0 and scheduler.dropped_time == 0.0
+
+    #Negative elapsed time (a clock going backwards) is ignored
+    assert scheduler.advance(-1.0) == 0 and scheduler.accumulator == 0.0
+
+    #Over many uneven frames every requested step is taken, and the remainder stays below one step
+    rng = np.random.default_rng(0)
+    scheduler = FixedStepScheduler(1e-3)
+    frames = rng.uniform(0.0, 0.02, 10000)
+    total = sum(scheduler.advance(elapsed) for elapsed in frames)
+    assert abs(total - np.sum(frames) / 1e-3) < 1.0
+    assert 0.0 <= scheduler.accumulator < scheduler.dt
+    print(f"Scheduler: {total} steps over {np.sum(frames):.3f} sim s of uneven frames, remainder {scheduler.alpha():.3f} steps")
+
+#Test a frame past the step budget runs max_steps_per_frame steps and drops the rest, keeping the fraction
+def StepBudgetTest():
+    scheduler = FixedStepScheduler(0.25, max_steps_per_frame=4)
+    assert scheduler.advance(2.6) == 4
+    assert scheduler.dropped_time == 1.5 and np.isclose(scheduler.accumulator, 0.1)
+
+    #The next frame starts from the kept fraction only, the dropped time is never stepped
+    assert scheduler.advance(0.2) == 1
+    assert scheduler.dropped_time == 1.5
+    print(f"Scheduler budget: {scheduler.dropped_time:.2f} sim s dropped past 4 steps per frame")
+
+    #The budget is at least one step
+    assert FixedStepScheduler(0.25, max_steps_per_frame=0).advance(1.0) == 1
+
+#Test alpha is the fraction of a step left, for interpolating between the last two states
+def AlphaTest():
+    scheduler = FixedStepScheduler(0.5)
+    assert scheduler.alpha() == 0.0
+    scheduler.advance(0.125)
+    assert scheduler.alpha() == 0.25
+    scheduler.advance(0.5)
+    assert scheduler.alpha() == 0.25
+    scheduler.advance(0.25)
+    assert scheduler.alpha() == 0.75
+
+#Test changing dt keeps the pending remainder in simulated seconds, and reset clears everything
+def SetDtResetTest():
+    scheduler = FixedStepScheduler(0.5, max_steps_per_frame=2)
+    scheduler.advance(0.375)
+    scheduler.set_dt(0.125)
+    assert scheduler.accumulator == 0.375 and scheduler.alpha() == 3.0
+    assert scheduler.advance(0.0) == 2 and scheduler.accumulator == 0.0 and scheduler.dropped_time == 0.125
+
+    for bad in (0.0, -1.0):
+        try:
+            scheduler.set_dt(bad)
+            assert False, "dt must be positive"
+        except ValueError:
+            pass
+    assert scheduler.dt == 0.125
+
+    scheduler.advance(0.3)
+    scheduler.reset()
+    assert scheduler.accumulator == 0.0 and scheduler.dropped_time == 0.0 and scheduler.dt == 0.125
+    assert scheduler.advance(0.125) == 1
+    print("Scheduler set_dt / reset: remainder kept across a dt change, cleared by reset")
+
+
+StepCountTest()
+StepBudgetTest()
+AlphaTest()
+SetDtResetTest()
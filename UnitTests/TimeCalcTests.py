@@ -1,6 +1,8 @@
 import sys
 import os
 from datetime import datetime, timezone, timedelta
+from fractions import Fraction
+import numpy as np
 
 currentFilePath = os.path.dirname(__file__)
 topLevelDir = os.path.join(currentFilePath, "..")
@@ -11,26 +13,28 @@ sys.path.append(
 import TimeCalc
 
 
+#Known Julian dates (Meeus)
+testDates = [
+    (2000, 1, 1.5, 2451545.0),
+    (1999, 1, 1.0, 2451179.5),
+    (1987, 1, 27.0, 2446822.5),
+    (1987, 6, 19.5, 2446966.0),
+    (1988, 1, 27.0, 2447187.5),
+    (1988, 6, 19.5, 2447332.0),
+    (1900, 1, 1.0, 2415020.5),
+    (1600, 1, 1.0, 2305447.5),
+    (1600, 12, 31.0, 2305812.5),
+    (837, 4, 10.3, 2026871.8),
+    (-123, 12, 31.0, 1676496.5),
+    (-122, 1, 1.0, 1676497.5),
+    (-1000, 7, 12.5, 1356001.0),
+    (-1000, 2, 29.0, 1355866.5),
+    (-1001, 8, 17.9, 1355671.4),
+    (-4712, 1, 1.5, 0.0)
+]
+
 #Test Julian Calculations
 def JulianTest():
-    testDates = [
-        (2000, 1, 1.5, 2451545.0),
-        (1999, 1, 1.0, 2451179.5),
-        (1987, 1, 27.0, 2446822.5),
-        (1987, 6, 19.5, 2446966.0),
-        (1988, 1, 27.0, 2447187.5),
-        (1988, 6, 19.5, 2447332.0),
-        (1900, 1, 1.0, 2415020.5),
-        (1600, 1, 1.0, 2305447.5),
-        (1600, 12, 31.0, 2305812.5),
-        (837, 4, 10.3, 2026871.8),
-        (-123, 12, 31.0, 1676496.5),
-        (-122, 1, 1.0, 1676497.5),
-        (-1000, 7, 12.5, 1356001.0),
-        (-1000, 2, 29.0, 1355866.5),
-        (-1001, 8, 17.9, 1355671.4),
-        (-4712, 1, 1.5, 0.0)
-    ]
     for year, month, day, trueJD in testDates:
         calculatedJD = TimeCalc.ComputeJulianDate(year, month, day)
         error = calculatedJD - trueJD
@@ -57,5 +61,88 @@ def LST_Test():
         print(siderealTime)
 
 
+#Test the array versions against the table and the scalar functions, they must match exactly
+def ArrayTest():
+    years, months, days, trueJDs = (np.array(column) for column in zip(*testDates))
+    arrayJD = TimeCalc.ComputeJulianDateArray(years, months, days)
+    scalarJD = np.array([TimeCalc.ComputeJulianDate(int(y), int(m), d) for y, m, d in zip(years, months, days)])
+    print(f"Array JD: max error vs table {np.max(np.abs(arrayJD - trueJDs))}, exact match with scalar: {np.array_equal(arrayJD, scalarJD)}")
+    assert np.array_equal(arrayJD, scalarJD)
+
+    #Every table date at a spread of longitudes
+    longitudes = np.linspace(-180.0, 180.0, 7)
+    arrayDeg = TimeCalc.GetSiderealDegFromUTCArray(years[:, np.newaxis], months[:, np.newaxis], days[:, np.newaxis], longitudes)
+    scalarDeg = np.array([[TimeCalc.GetSiderealDegFromUTC(int(y), int(m), d, lon) for lon in longitudes] for y, m, d in zip(years, months, days)])
+    print(f"Array LMST: exact match with scalar: {np.array_equal(arrayDeg, scalarDeg)}")
+    assert np.array_equal(arrayDeg, scalarDeg)
+
+#Exact rational evaluation of the GMST polynomial, the reference for the epoch path
+def ExactSiderealDeg(timestamp, longitude):
+    midnight = Fraction(TimeCalc.ComputeJulianDate(timestamp.year, timestamp.month, timestamp.day))
+    microseconds = ((timestamp.hour * 60 + timestamp.minute) * 60 + timestamp.second) * 1_000_000 + timestamp.microsecond
+    days = midnight + Fraction(microseconds, 86_400_000_000) - 2451545
+    T = days / 36525
+    GMST = Fraction("280.46061837") + Fraction("360.98564736629") * days + Fraction("0.000387933") * T * T - T * T * T / 38710000
+    return float((GMST + Fraction(str(longitude))) % 360)
+
+#Test the two part epoch path at microsecond resolution
+def EpochTest():
+    longitude = -93.258133
+    timestamps = [datetime(2026, 10, 18, 13, 45, 12, 345678), datetime(1850, 3, 1, 0, 0, 0, 1), datetime(2200, 12, 31, 23, 59, 59, 999999)]
+    for timestamp in timestamps:
+        epochDeg = TimeCalc.GetSiderealDegFromTimestamp(timestamp, longitude)
+        exactDeg = ExactSiderealDeg(timestamp, longitude)
+        fractionalDay = timestamp.day + (timestamp.hour * 3600 + timestamp.minute * 60 + timestamp.second + timestamp.microsecond / 1e6) / 86400
+        floatDeg = TimeCalc.GetSiderealDegFromUTC(timestamp.year, timestamp.month, fractionalDay, longitude)
+        print(f"{timestamp}: epoch error {epochDeg - exactDeg:.3e} deg, single float JD error {floatDeg - exactDeg:.3e} deg")
+        assert abs(epochDeg - exactDeg) < 1e-10                #1 microsecond of time is 4.2e-9 degrees
+
+    #datetime64 arrays, aware datetimes and calendar components all give the same epoch
+    stamps = np.array(timestamps, dtype='datetime64[us]')
+    arrayDeg = TimeCalc.GetSiderealDegFromTimestamp(stamps, longitude)
+    scalarDeg = [TimeCalc.GetSiderealDegFromTimestamp(timestamp.replace(tzinfo=timezone(timedelta(hours=-5))) + timedelta(hours=-5), longitude) for timestamp in timestamps]
+    assert np.array_equal(arrayDeg, scalarDeg)
+    epoch = TimeCalc.ComputeJulianEpoch(2026, 10, 18, 13, 45, 12, 345678)
+    assert tuple(epoch) == tuple(TimeCalc.EpochFromDatetime(timestamps[0]))
+    print(f"datetime64 array LMST: {arrayDeg}")
+
+#Test the GMST cache gives the uncached results and counts hits and misses
+def CacheTest():
+    cache = TimeCalc.SiderealCache(maxsize=8)
+    longitudes = [-93.258133, 0.0, 151.2093]
+    for day in range(1, 5):
+        for longitude in longitudes:
+            assert cache.GetSiderealDeg(2026, 10, day, longitude) == TimeCalc.GetSiderealDegFromUTC(2026, 10, day, longitude)
+    assert (cache.hits, cache.misses) == (8, 4)
+
+    #Precomputed consecutive days, oldest dates are evicted past maxsize
+    cache.Precompute(2026, 11, np.arange(1, 11))
+    assert len(cache) == 8 and (2026, 11, 1) not in cache.table
+    assert cache.GetSidereal(2026, 11, 10, 151.2093) == TimeCalc.GetSiderealFromUTC(2026, 11, 10, 151.2093)
+    print(f"Sidereal cache: {cache.Stats()}")
+
+#Test the numeric sidereal outputs and that packing round trips without drift
+def PackedTest():
+    degrees = np.random.default_rng(0).uniform(0.0, 360.0, 100000)
+    packed = TimeCalc.MeanSiderealDegToPacked(degrees)
+    error = np.max(np.abs(TimeCalc.MeanSiderealPackedToDeg(packed) - degrees)) * TimeCalc.MICROSECONDS_PER_DEGREE
+    print(f"Packed sidereal: max error {error:.3f} us")
+    assert error <= 0.5 + 1e-6
+    assert np.array_equal(TimeCalc.MeanSiderealDegToPacked(TimeCalc.MeanSiderealPackedToDeg(packed)), packed)
+
+    #The time container path goes through the same packing
+    assert TimeCalc.MeanSiderealDegToHour(degrees[0]) == TimeCalc.MeanSiderealPackedToTime(packed[0])
+    assert TimeCalc.MeanSiderealPackedToTime(packed[:3]) == [TimeCalc.MeanSiderealDegToHour(d) for d in degrees[:3]]
+    assert TimeCalc.GetSiderealHoursFromUTC(2026, 10, 18.5, -93.258133) == TimeCalc.GetSiderealDegFromUTC(2026, 10, 18.5, -93.258133) / 15.0
+
+    #Float hours, unlike MeanSiderealDegToHour's time object
+    hours = TimeCalc.MeanSiderealDegToFloatHours(degrees)
+    assert hours.dtype == np.float64 and np.allclose(TimeCalc.FloatHoursToMeanSiderealDeg(hours), degrees, rtol=0, atol=1e-9)
+
+
 #JulianTest()
-LST_Test()
\ No newline at end of file
+LST_Test()
+ArrayTest()
+EpochTest()
+CacheTest()
+PackedTest()
\ No newline at end of file
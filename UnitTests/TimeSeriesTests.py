@@ -0,0 +1,42 @@
+import sys
+import os
+import time
+import numpy as np
+
+currentFilePath = os.path.dirname(__file__)
+animationsDir = os.path.join(currentFilePath, "..", "Animations")
+sys.path.append(
+    os.path.abspath(animationsDir)
+)
+
+from Utils.TimeSeries import TimeSeriesBuffer
+
+
+#Test the time series window and its running max / min against brute force over the same window
+def TimeSeriesTest():
+    rng = np.random.default_rng(3)
+    series = TimeSeriesBuffer(100, channels=2)
+    values = rng.normal(size=(1000, 2))
+    for i, (a, b) in enumerate(values):
+        series.append(0.1 * i, a, b)
+        window = values[max(0, i - 99):i + 1]
+        assert np.array_equal(series.values(0), window[:, 0])
+        assert series.max(0) == window[:, 0].max() and series.min(1) == window[:, 1].min()
+        assert series.max() == window.max()
+    assert series.last_time() == 0.1 * 999
+    assert np.shares_memory(series.times(), series.buffer.data)
+
+    series.resize(30)
+    assert np.array_equal(series.values(1), values[-30:, 1]) and series.max(1) == values[-30:, 1].max()
+
+    #A 100k sample window stays O(1) per append and query
+    series = TimeSeriesBuffer(100000, channels=2)
+    start = time.perf_counter()
+    for i in range(200000):
+        series.append(i, np.sin(1e-3 * i), np.cos(1e-3 * i))
+        series.max()
+    elapsed = time.perf_counter() - start
+    print(f"Time series: 200k appends + max queries on a 100k window in {elapsed:.2f} s")
+
+
+TimeSeriesTest()
@@ -0,0 +1,153 @@
+import sys
+import os
+import numpy as np
+
+currentFilePath = os.path.dirname(__file__)
+animationsDir = os.path.join(currentFilePath, "..", "Animations")
+sys.path.append(
+    os.path.abspath(animationsDir)
+)
+
+from Utils.Trails import TrailManager, BodyTrails
+
+
+#Test the ring buffer trail against a plain list of the last max_length points
+def RingTrailTest():
+    trailManager = TrailManager(max_length=50)
+    trailManager.add_body('body', [0.0, 0.0])
+    reference = [np.array([0.0, 0.0])]
+
+    for i in range(1, 237):
+        point = np.array([i, -2.0 * i])
+        trailManager.update('body', point)
+        reference = (reference + [point])[-50:]
+
+        x, y = trailManager.get_trail('body')
+        assert np.array_equal(x, [p[0] for p in reference]) and np.array_equal(y, [p[1] for p in reference])
+        assert x.flags['C_CONTIGUOUS'] and y.flags['C_CONTIGUOUS']
+    print(f"Ring trail: {len(x)} points, newest {x[-1]:.1f}, {y[-1]:.1f}")
+
+    #Growing keeps every stored point, shrinking keeps the newest ones
+    trailManager.set_max_length(80)
+    x, y = trailManager.get_trail('body')
+    assert len(x) == 50 and x[-1] == 236
+    for i in range(237, 277):
+        trailManager.update('body', [i, -2.0 * i])
+    x, y = trailManager.get_trail('body')
+    assert len(x) == 80 and np.array_equal(x, np.arange(197, 277))
+
+    trailManager.set_max_length(10)
+    x, y = trailManager.get_trail('body')
+    assert np.array_equal(x, np.arange(267, 277))
+    print(f"Resized trail: {len(x)} points, {x[0]:.1f} to {x[-1]:.1f}")
+
+    trailManager.clear()
+    assert trailManager.get_trail('body').shape == (2, 0)
+
+#Distance from each point to the nearest segment of the polyline
+def PolylineDistances(points, polyline):
+    start, segment = polyline[:-1], polyline[1:] - polyline[:-1]
+    lengths = np.maximum(np.einsum('ij,ij->i', segment, segment), 1e-300)
+    distances = np.empty(len(points))
+    for i, point in enumerate(points):
+        t = np.clip(np.einsum('ij,ij->i', point - start, segment) / lengths, 0, 1)
+        distances[i] = np.min(np.linalg.norm(start + t[:, np.newaxis] * segment - point, axis=1))
+    return distances
+
+#Test that a decimated trail stays within its deviation bound of a path that never repeats,
+#and still covers exactly the last max_length samples
+def DecimatedTrailTest():
+    #Precessing ellipse on a slow outward spiral, no lap retraces another
+    theta = np.linspace(0, 40 * np.pi, 200000)
+    scale, precession = 1 + 0.01 * theta, 0.05 * theta
+    x, y = 50 * np.cos(theta) * (1 + 0.3 * np.cos(theta)) * scale, 30 * np.sin(theta) * scale
+    path = np.stack([x * np.cos(precession) - y * np.sin(precession), x * np.sin(precession) + y * np.cos(precession)], axis=1)
+
+    maxLength, maxDeviation, levels = 150000, 0.02, 4
+    #Small levels, so the last one has to grow to keep the whole window
+    trailManager = TrailManager(max_length=maxLength, decimate=True, head_length=1000, levels=levels, level_length=200, max_deviation=maxDeviation)
+    trailManager.add_body('body', path[0])
+    for point in path[1:]:
+        trailManager.update('body', point)
+    trail = trailManager.get_trail('body').T
+
+    window = path[-maxLength:]
+    worst = np.max(PolylineDistances(window[::7], trail))
+    print(f"Decimated trail: last {maxLength} of {len(path)} samples drawn with {len(trail)} points, max deviation {worst:.3e}")
+    assert len(trail) <= 5000
+    assert worst <= levels * maxDeviation
+    assert np.array_equal(trail[-1000:], path[-1000:])
+
+    #Covered span: the first segment starts at or before the oldest sample of the window and ends inside it
+    first, second = (np.flatnonzero((path == point).all(axis=1))[0] for point in trail[:2])
+    assert first <= len(path) - maxLength < second
+
+    #Shrinking drops the levels' older points, the trail covers the new window
+    trailManager.set_max_length(50000)
+    trail = trailManager.get_trail('body').T
+    first, second = (np.flatnonzero((path == point).all(axis=1))[0] for point in trail[:2])
+    assert first <= len(path) - 50000 < second and np.array_equal(trail[-1], path[-1])
+    assert np.max(PolylineDistances(path[-50000::7], trail)) <= levels * maxDeviation
+    assert all(ring.capacity == 200 for ring in trailManager.trails['body'].levels[:-1])
+    print(f"Decimated trail resized: last 50000 samples drawn with {len(trail)} points")
+
+#Test trails saved with get_state and loaded into a new manager continue exactly like the originals
+def TrailStateTest():
+    for decimate in (False, True):
+        original = TrailManager(max_length=3000, decimate=decimate, head_length=200, level_length=100)
+        original.add_body('body', [1.0, 0.0])
+        angles = np.linspace(0.0, 40.0 * np.pi, 6000)
+        for angle in angles[:4000]:
+            original.update('body', [np.cos(angle), 0.3 * np.sin(angle)])
+
+        copy = TrailManager(max_length=10, decimate=decimate, head_length=200, level_length=100)
+        copy.set_state(original.get_state())
+        assert copy.get_max_length() == 3000
+        for angle in angles[4000:]:
+            original.update('body', [np.cos(angle), 0.3 * np.sin(angle)])
+            copy.update('body', [np.cos(angle), 0.3 * np.sin(angle)])
+        assert np.array_equal(original.get_trail('body'), copy.get_trail('body'))
+        print(f"Trail state (decimate={decimate}): {copy.get_trail('body').shape[1]} points after restore")
+
+#Test the all body trails against one ring buffer trail per body, and the connect array breaks between bodies
+def BodyTrailsTest():
+    rng = np.random.default_rng(5)
+    positions = rng.normal(size=(300, 2))
+    trails = BodyTrails(8, positions)
+    trailManager = TrailManager(max_length=8)
+    for i, point in enumerate(positions):
+        trailManager.add_body(i, point)
+
+    for _ in range(20):
+        positions += 0.1 * rng.normal(size=positions.shape)
+        trails.update(positions)
+        for i, point in enumerate(positions):
+            trailManager.update(i, point)
+
+    view = trails.view()
+    assert view.shape == (300, 2, 8)
+    for i in (0, 123, 299):
+        assert np.array_equal(view[i], trailManager.get_trail(i))
+
+    x, y, connect = trails.segments()
+    assert x.shape == y.shape == connect.shape == (300 * 8,)
+    assert np.array_equal(x[8:16], view[1, 0]) and np.array_equal(y[8:16], view[1, 1])
+    assert np.flatnonzero(~connect).tolist() == list(range(7, 300 * 8, 8))
+
+    trails.set_max_length(3)
+    assert np.array_equal(trails.view()[5], view[5, :, -3:]) and trails.segments()[2].shape == (900,)
+
+    #Compacting after a merger keeps the history of the bodies left
+    before = trails.view().copy()
+    keep = np.ones(300, dtype=bool)
+    keep[[4, 17, 250]] = False
+    trails.compact(keep)
+    assert trails.bodies == 297 and np.array_equal(trails.view(), before[keep])
+    assert trails.segments()[2].shape == (297 * 3,) and trails.max_length == 3
+    print(f"Body trails: {len(trails)} points for each of {trails.bodies} bodies")
+
+
+RingTrailTest()
+DecimatedTrailTest()
+TrailStateTest()
+BodyTrailsTest()
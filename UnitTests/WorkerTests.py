@@ -0,0 +1,99 @@
+import sys
+import os
+import time
+import threading
+import numpy as np
+
+currentFilePath = os.path.dirname(__file__)
+animationsDir = os.path.join(currentFilePath, "..", "Animations")
+sys.path.append(
+    os.path.abspath(animationsDir)
+)
+
+from Utils import Scenarios
+from Utils.Worker import PhysicsWorker, SnapshotBuffer
+
+
+#Test a reader never sees a torn snapshot while a writer publishes as fast as it can
+def SnapshotTest():
+    writer, _ = Scenarios.cluster(200, dim=2)
+    reader, _ = Scenarios.cluster(200, dim=2, seed=1)
+    snapshot = SnapshotBuffer(len(writer), writer.dim)
+    writer.positions[:] = writer.velocities[:] = 0.0
+    writer.sim_time = 0.0
+    snapshot.write(writer, 0)
+
+    #Every published state has all positions equal to its step count
+    done = threading.Event()
+    def publish():
+        step = 0
+        while not done.is_set():
+            step += 1
+            writer.positions[:] = step
+            writer.velocities[:] = -step
+            writer.sim_time = step
+            snapshot.write(writer, step)
+    thread = threading.Thread(target=publish)
+    thread.start()
+
+    reads = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < 1.0:
+        steps = snapshot.read_into(reader)
+        assert np.all(reader.positions == steps) and np.all(reader.velocities == -steps) and reader.sim_time == steps
+        reads += 1
+    done.set()
+    thread.join()
+
+    #Snapshots from before a pushed state are skipped
+    snapshot.write(writer, 5, generation=1)
+    assert snapshot.read_into(reader, generation=2) is None and snapshot.read_into(reader, generation=1) == 5
+    print(f"Snapshot: {reads} consistent reads while the writer published")
+
+#Test the worker in both modes steps exactly like the same system stepped inline, and obeys its commands
+def WorkerTest():
+    for mode in ('thread', 'process'):
+        system, dt = Scenarios.two_body()
+        reference, _ = Scenarios.two_body()
+        with PhysicsWorker(system, dt, speed=None, mode=mode, max_steps_per_batch=100) as worker:
+            #The first batch may wait for the Numba kernel to compile
+            deadline = time.perf_counter() + 60
+            while worker.read_into(system) == 0 and time.perf_counter() < deadline:
+                time.sleep(0.1)
+            time.sleep(0.2)
+            worker.read_into(system)
+            taken = worker.steps
+            assert taken > 0 and taken % 100 == 0
+            reference.advance(dt, taken)
+            assert np.array_equal(system.positions, reference.positions) and abs(system.sim_time - reference.sim_time) < 1e-9
+
+            #Paused, nothing moves
+            worker.set_running(False)
+            time.sleep(0.2)
+            worker.read_into(system)
+            time.sleep(0.2)
+            assert worker.read_into(system) == 0
+
+            #A pushed state is picked up and never overwritten by an older snapshot
+            fresh, _ = Scenarios.two_body()
+            fresh.sim_time = 123.0
+            worker.push(fresh)
+            worker.read_into(system)
+            time.sleep(0.2)
+            worker.read_into(system)
+            assert np.array_equal(system.positions, fresh.positions) and system.sim_time == 123.0
+
+            #Paced at speed sim seconds per wall second
+            worker.set_speed(0.5)
+            worker.set_running(True)
+            start = time.perf_counter()
+            time.sleep(1.0)
+            worker.read_into(system)
+            rate = (system.sim_time - 123.0) / (time.perf_counter() - start)
+            assert 0.3 < rate < 0.6
+        print(f"Worker ({mode}): {taken} steps match inline stepping, paced at {rate:.2f} sim s per s")
+
+
+if __name__ == "__main__":
+    SnapshotTest()
+    WorkerTest()